@@ -0,0 +1,223 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Iterator, Optional, Set, Tuple
+
+Coords = Tuple[float, float]
+Tour = Tuple[str, Coords, Coords]
+
+DEFAULT_NDJSON = "output/batch/routes.ndjson"
+
+
+def _reprojector(src_crs: Optional[str], dst_crs):
+    if not src_crs:
+        return lambda xy: xy
+    from pyproj import CRS
+    from .path_export import _transformer
+    if CRS.from_user_input(src_crs) == CRS.from_user_input(dst_crs):
+        return lambda xy: xy
+    tf = _transformer(CRS.from_user_input(src_crs).to_wkt(), CRS.from_user_input(dst_crs).to_wkt())
+    return lambda xy: tuple(tf.transform(*xy))
+
+
+def _read_csv(path: str) -> Iterator[Tuple[str, Coords, Coords]]:
+    with open(path, newline="") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            name = row.get("name") or row.get("tour") or f"tour_{i}"
+            yield name, (float(row["start_x"]), float(row["start_y"])), (float(row["end_x"]), float(row["end_y"]))
+
+
+def _read_geojson(path: str) -> Iterator[Tuple[str, Coords, Coords]]:
+    with open(path) as f:
+        collection = json.load(f)
+    for i, feature in enumerate(collection.get("features", [])):
+        props = feature.get("properties") or {}
+        name = str(props.get("name") or props.get("tour") or feature.get("id") or f"tour_{i}")
+        geom = feature.get("geometry") or {}
+        if geom.get("type") in ("LineString", "MultiPoint"):
+            coords = geom["coordinates"]
+            start, end = coords[0], coords[-1]
+        elif "start" in props and "end" in props:
+            start, end = props["start"], props["end"]
+        else:
+            raise ValueError(f"Feature '{name}' needs a LineString/MultiPoint geometry or start/end properties")
+        yield name, (float(start[0]), float(start[1])), (float(end[0]), float(end[1]))
+
+
+def read_tours(path: str, target_crs, input_crs: Optional[str] = None) -> Iterator[Tour]:
+    """
+    Stream (name, start, end) tours from a CSV (name,start_x,start_y,end_x,end_y) or a GeoJSON
+    (LineString/MultiPoint from start to end, or start/end properties), reprojected to target_crs.
+    GeoJSON coordinates default to EPSG:4326 (RFC 7946), CSV coordinates to target_crs.
+    Tour names key the resume log and the GeoPackage rows, so duplicates raise ValueError
+    (checked in a first pass, before any tour is routed).
+    """
+    if path.lower().endswith(".csv"):
+        reader = _read_csv
+    else:
+        input_crs = input_crs or "EPSG:4326"
+        reader = _read_geojson
+    seen, duplicates = set(), set()
+    for name, _, _ in reader(path):
+        (duplicates if name in seen else seen).add(name)
+    if duplicates:
+        raise ValueError(f"Duplicate tour names in {path}: {', '.join(sorted(duplicates))}")
+    reproject = _reprojector(input_crs, target_crs)
+    for name, start, end in reader(path):
+        yield name, reproject(start), reproject(end)
+
+
+def finished_tours(ndjson_path: str, retry_failed: bool = False) -> Set[str]:
+    """Names already in the NDJSON log (failed ones too, unless retry_failed); a torn last line is ignored."""
+    done = set()
+    if not os.path.exists(ndjson_path):
+        return done
+    with open(ndjson_path) as f:
+        for line in f:
+            try:
+                props = json.loads(line)["properties"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if props.get("status") == "ok" or not retry_failed:
+                done.add(props["tour"])
+    return done
+
+
+def _open_log(ndjson_path: str):
+    """Open the NDJSON log for appending, terminating a line torn by a crash first."""
+    os.makedirs(os.path.dirname(ndjson_path) or ".", exist_ok=True)
+    if os.path.exists(ndjson_path) and os.path.getsize(ndjson_path) > 0:
+        with open(ndjson_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+        if torn:
+            with open(ndjson_path, "a") as f:
+                f.write("\n")
+    return open(ndjson_path, "a")
+
+
+def run_batch(
+    tours_path: str,
+    *,
+    dem_path: str,
+    cost_surface_path: str,
+    ndjson_path: str = DEFAULT_NDJSON,
+    gpkg_path: Optional[str] = None,
+    input_crs: Optional[str] = None,
+    lambda_weight: float = 0.7,
+    smooth_threshold: float = 7.5,
+    solver: str = "r.walk",
+    path_method: str = "gradient",
+    use_cache: bool = True,
+    retry_failed: bool = False,
+    cost_band=1,
+    tile_root: Optional[str] = None
+) -> dict:
+    """
+    Route every tour of a CSV/GeoJSON file and append each result to an NDJSON log (one WGS84
+    GeoJSON Feature per line, flushed as it completes) and optionally to a GeoPackage.
+    Tours already in the log are skipped, so a crashed batch resumes where it stopped.
+    Only one route is held in memory at a time. cost_band selects a scenario band of a cost surface stack.
+    With tile_root, tours are routed on that tiled store instead (tiled Dijkstra, see route_line_tiled);
+    solver, path_method and cost_band do not apply there and raise ValueError unless left at their defaults.
+    """
+    if tile_root:
+        ignored = [f"{flag}={value!r}" for flag, value, default in (
+            ("solver", solver, "r.walk"), ("path_method", path_method, "gradient"), ("cost_band", str(cost_band), "1"))
+            if value != default]
+        if ignored:
+            raise ValueError(f"tile_root routes with the tiled Dijkstra only; not supported with {', '.join(ignored)}")
+    # Routing backends are imported here, not at module load (GRASS only on the first r.walk)
+    from shapely.geometry import mapping
+    from .cost_cache import CostFieldCache
+    from .path_export import to_wgs84, write_path_outputs
+    from .routing import FieldSource, route_line, route_line_tiled
+
+    if tile_root:
+        from .tile_store import TileStore
+        store = TileStore(tile_root)
+        crs = store.crs
+        route = lambda name, start, end: route_line_tiled(name, start, end, store, lambda_weight=lambda_weight,
+                                                          smooth_threshold=smooth_threshold)
+    else:
+        fields = FieldSource(dem_path, cost_surface_path, lambda_weight, solver=solver,
+                             cache=CostFieldCache() if use_cache else None, grass_prefix="batch", cost_band=cost_band)
+        crs = fields.profile["crs"]
+        route = lambda name, start, end: route_line(name, start, end, fields, smooth_threshold=smooth_threshold,
+                                                    path_method=path_method)
+    done = finished_tours(ndjson_path, retry_failed)
+    counts = {"routed": 0, "failed": 0, "skipped": 0}
+    t0 = time.perf_counter()
+    if done:
+        print(f"[batch] Resuming: {len(done)} tours already in {ndjson_path}")
+
+    with _open_log(ndjson_path) as log:
+        for name, start, end in read_tours(tours_path, crs, input_crs):
+            if name in done:
+                counts["skipped"] += 1
+                continue
+            feature = {"type": "Feature", "geometry": None, "properties": {"tour": name}}
+            try:
+                line, cost = route(name, start, end)
+                if gpkg_path:
+                    write_path_outputs(line, crs, tour_name=name, gpkg_path=gpkg_path)
+                feature["geometry"] = mapping(to_wgs84(line, crs))
+                feature["properties"].update(status="ok", cost=cost, length_m=float(line.length))
+                counts["routed"] += 1
+            except Exception as e:
+                feature["properties"].update(status="error", error=str(e))
+                counts["failed"] += 1
+                print(f"[batch] {name} failed: {e}")
+            log.write(json.dumps(feature) + "\n")
+            log.flush()
+            done.add(name)
+
+    elapsed = time.perf_counter() - t0
+    print(f"[batch] {counts['routed']} routed, {counts['failed']} failed, {counts['skipped']} skipped "
+          f"in {elapsed:.1f} s -> {ndjson_path}")
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Route many tours from a GeoJSON/CSV file, streaming results to NDJSON/GeoPackage.")
+    parser.add_argument("tours", help="GeoJSON (start->end LineString/MultiPoint or start/end properties) or CSV (name,start_x,start_y,end_x,end_y)")
+    parser.add_argument("--ndjson", default=DEFAULT_NDJSON, help="append-only result log, also used to resume")
+    parser.add_argument("--gpkg", default=None, help="also append routes to this GeoPackage")
+    parser.add_argument("--input-crs", default=None, help="CRS of the tour coordinates (default: EPSG:4326 for GeoJSON, cost surface CRS for CSV)")
+    parser.add_argument("--dem", default=None, help="DEM (default: config.INPUT_RASTERS['dem'])")
+    parser.add_argument("--cost-surface", default=None, help="cost surface (default: config.OUTPUT_COST)")
+    parser.add_argument("--cost-band", default="1", help="band number or scenario name of a multi-band cost surface")
+    parser.add_argument("--tiles", default=None, metavar="DIR", help="route on this tiled store (see cost_surface --tiles)")
+    parser.add_argument("--solver", choices=("r.walk", "eikonal", "planes", "dial"), default="r.walk")
+    parser.add_argument("--path-method", choices=("r.drain", "gradient"), default="gradient")
+    parser.add_argument("--lambda-weight", type=float, default=0.7)
+    parser.add_argument("--smooth-threshold", type=float, default=7.5)
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk cost field cache")
+    parser.add_argument("--retry-failed", action="store_true", help="route tours logged as failed again")
+    args = parser.parse_args(argv)
+
+    from .cost_surface import config
+    counts = run_batch(
+        args.tours,
+        dem_path=args.dem or config.INPUT_RASTERS["dem"],
+        cost_surface_path=args.cost_surface or config.OUTPUT_COST,
+        ndjson_path=args.ndjson,
+        gpkg_path=args.gpkg,
+        input_crs=args.input_crs,
+        lambda_weight=args.lambda_weight,
+        smooth_threshold=args.smooth_threshold,
+        solver=args.solver,
+        path_method=args.path_method,
+        use_cache=not args.no_cache,
+        retry_failed=args.retry_failed,
+        cost_band=args.cost_band,
+        tile_root=args.tiles,
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import psutil
+
+from ..cost_surface import config
+from .synthetic import generate_dataset
+
+DATA_DIR = "output/bench/data"
+OUT_JSON = "output/bench/results.json"
+BASELINE_JSON = "output/bench/baseline.json"
+
+DEFAULT_SIZES = [1000, 2000, 5000]
+REGRESSION_TOLERANCE = 0.20     # flag if > 20 % slower / more memory than baseline
+NOISE_FLOOR_S = 0.05            # ignore differences below this (timer noise)
+VALIDATE_CELLS = 1_000_000      # stage_dial checks against the float Dijkstra (CSR graph, ~100 B/cell) up to this size
+
+
+@contextlib.contextmanager
+def use_inputs(manifest: dict):
+    """Temporarily point cost_surface.config at a synthetic dataset."""
+    saved = (dict(config.INPUT_RASTERS), dict(config.MASK_RASTERS), config.REF_RASTER)
+    config.INPUT_RASTERS.update(manifest["inputs"])
+    config.MASK_RASTERS.update(manifest["masks"])
+    config.REF_RASTER = manifest["inputs"]["slope"]
+    try:
+        yield
+    finally:
+        config.INPUT_RASTERS.clear()
+        config.INPUT_RASTERS.update(saved[0])
+        config.MASK_RASTERS.clear()
+        config.MASK_RASTERS.update(saved[1])
+        config.REF_RASTER = saved[2]
+
+
+class StageSkipped(Exception):
+    """Raised by a stage whose backend is not available on this machine."""
+
+
+# --- Stages: fn(manifest, work_dir) -> dict of extra info ---
+
+def stage_cost_surface(manifest: dict, work_dir: str) -> dict:
+    from ..cost_surface.cost_surface import create_cost_surface
+    out = os.path.join(work_dir, "cost_surface.tif")
+    with use_inputs(manifest):
+        create_cost_surface(out, debug_mode=False)
+    return {"output_bytes": os.path.getsize(out)}
+
+
+def stage_cost_surface_parallel(manifest: dict, work_dir: str) -> dict:
+    from ..cost_surface.cost_surface import create_cost_surface
+    out = os.path.join(work_dir, "cost_surface_parallel.tif")
+    with use_inputs(manifest):
+        create_cost_surface(out, debug_mode=False, workers=0)
+    return {"output_bytes": os.path.getsize(out), "workers": os.cpu_count()}
+
+
+def stage_drain(manifest: dict, work_dir: str) -> dict:
+    import rasterio
+    from rasterio.transform import rowcol
+    from ..pathfinding.drain import drain_path
+
+    with rasterio.open(manifest["inputs"]["dem"]) as src:
+        transform, shape = src.transform, src.shape
+    steps = 0
+    for pair in manifest["pairs"]:
+        r0, c0 = rowcol(transform, *pair["start"])
+        rows, cols = np.ogrid[:shape[0], :shape[1]]
+        cum = np.hypot(rows - r0, cols - c0).astype(np.float32)   # stand-in cost field
+        steps += len(drain_path(cum, rowcol(transform, *pair["end"])))
+    return {"cells_drained": steps}
+
+
+def stage_routing(manifest: dict, work_dir: str) -> dict:
+    from ..routing import init_grass, run_routing_for_tour
+    try:
+        init_grass()
+    except ImportError as e:
+        raise StageSkipped(f"GRASS not available: {e}")
+    cost = os.path.join(work_dir, "cost_surface.tif")
+    if not os.path.exists(cost):
+        stage_cost_surface(manifest, work_dir)
+    for pair in manifest["pairs"]:
+        run_routing_for_tour(
+            pair["name"], tuple(pair["start"]), tuple(pair["end"]),
+            dem_path=manifest["inputs"]["dem"],
+            cost_surface_path=cost,
+            lambda_weight=0.7,
+            smooth_threshold=7.5,
+            output_dir=os.path.join(work_dir, "routing"),
+            corridor_mode="near_optimal",
+        )
+    return {"tours": len(manifest["pairs"])}
+
+
+def stage_eikonal(manifest: dict, work_dir: str) -> dict:
+    """The routing stage with the NumPy fast-sweeping solver instead of r.walk (no GRASS)."""
+    import rasterio
+    from rasterio.transform import rowcol
+    from ..pathfinding.eikonal import fast_sweep
+    from ..pathfinding.trace import trace_paths
+    from ..pathfinding.walk import isotropic_walk_cost, read_on_grid
+
+    cost = os.path.join(work_dir, "cost_surface.tif")
+    if not os.path.exists(cost):
+        stage_cost_surface(manifest, work_dir)
+    with rasterio.open(cost) as src:
+        profile = src.profile
+    transform = profile["transform"]
+    cellsize = (transform.a, transform.e)
+    local_cost = isotropic_walk_cost(read_on_grid(manifest["inputs"]["dem"], profile),
+                                     read_on_grid(cost, profile), cellsize, lambda_weight=0.7)
+    steps, iterations, unconverged = 0, 0, 0
+    for pair in manifest["pairs"]:
+        cum, stats = fast_sweep(local_cost, [rowcol(transform, *pair["start"])], cellsize)
+        iterations += stats.iterations
+        unconverged += not stats.converged
+        steps += len(trace_paths(cum, [rowcol(transform, *pair["end"])])[0])
+    return {"tours": len(manifest["pairs"]), "trace_steps": steps, "sweep_iterations": iterations,
+            "unconverged": unconverged}
+
+
+def stage_dial(manifest: dict, work_dir: str) -> dict:
+    """
+    Bucket-queue solver on quantised edge planes (no GRASS): planes, quantisation and one full
+    field per tour. On grids up to VALIDATE_CELLS the first field is checked against the float
+    Dijkstra on the same planes (max_rel_diff); routing.FieldSource / buckets.validate compares to r.walk.
+    """
+    import rasterio
+    from rasterio.transform import rowcol
+    from ..pathfinding.buckets import compare_fields, dial_field, quantise_planes
+    from ..pathfinding.planes import cost_field, load_planes
+
+    cost = os.path.join(work_dir, "cost_surface.tif")
+    if not os.path.exists(cost):
+        stage_cost_surface(manifest, work_dir)
+    with rasterio.open(cost) as src:
+        transform, cells = src.transform, src.width * src.height
+    planes = load_planes(manifest["inputs"]["dem"], cost, 0.7, plane_dir=os.path.join(work_dir, "edge_planes"))
+    qplanes = quantise_planes(planes)
+    settled, info = 0, {}
+    for i, pair in enumerate(manifest["pairs"]):
+        source = rowcol(transform, *pair["start"])
+        cum, _, stats = dial_field(qplanes, source)
+        settled += stats.settled
+        if i == 0 and cells <= VALIDATE_CELLS:
+            info = compare_fields(cum, cost_field(planes, source)[0])
+    return {"tours": len(manifest["pairs"]), "cells_settled": settled, **info}
+
+
+def _wiggly_line(start, end, seed: int, step_m: float = 10.0):
+    from shapely.geometry import LineString
+    rng = np.random.default_rng(seed)
+    start, end = np.asarray(start), np.asarray(end)
+    n = max(2, int(np.linalg.norm(end - start) / step_m))
+    t = np.linspace(0.0, 1.0, n)[:, None]
+    normal = np.array([-(end - start)[1], (end - start)[0]]) / np.linalg.norm(end - start)
+    offset = np.cumsum(rng.normal(0.0, 3.0, n)) * np.sin(np.pi * t[:, 0])
+    return LineString(start + t * (end - start) + offset[:, None] * normal)
+
+
+def stage_evaluation(manifest: dict, work_dir: str) -> dict:
+    from ..evaluation.evaluator import _auto_coarsen, BUFFER_M, SAMPLE_M
+    from ..evaluation.geometry import sample_points
+    from ..evaluation.metrics import discrete_frechet, hausdorff_undirected, overlap_percentage, point_line_stats
+
+    cells = 0
+    for i, pair in enumerate(manifest["pairs"]):
+        auto = _wiggly_line(pair["start"], pair["end"], seed=2 * i)
+        expert = _wiggly_line(pair["start"], pair["end"], seed=2 * i + 1)
+        a_d, e_d, step = _auto_coarsen(auto, expert, SAMPLE_M)
+        overlap_percentage(a_d, e_d, BUFFER_M)
+        discrete_frechet(list(a_d.coords), list(e_d.coords))
+        hausdorff_undirected(a_d, e_d)
+        point_line_stats(sample_points(a_d, step), e_d)
+        cells += len(a_d.coords) * len(e_d.coords)
+    return {"frechet_cells": cells}
+
+
+STAGES: Dict[str, Callable[[dict, str], dict]] = {
+    "cost_surface": stage_cost_surface,
+    "cost_surface_parallel": stage_cost_surface_parallel,
+    "drain": stage_drain,
+    "routing": stage_routing,
+    "eikonal": stage_eikonal,
+    "dial": stage_dial,
+    "evaluation": stage_evaluation,
+}
+
+
+def _measure(fn: Callable[[], dict], memory: bool = False) -> dict:
+    """
+    Wall/CPU time and RSS growth of one untraced stage run. With memory, the stage runs a
+    second time under tracemalloc for the peak traced allocation (tracing slows NumPy-heavy
+    stages several-fold, so it never overlaps the timed run).
+    """
+    gc.collect()
+    proc = psutil.Process()
+    rss_before = proc.memory_info().rss
+    t0, c0 = time.perf_counter(), time.process_time()
+    info = fn() or {}
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+    row = {
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_alloc_mb": None,
+        "rss_delta_mb": (proc.memory_info().rss - rss_before) / 1e6,
+        **info,
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            row["peak_alloc_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return row
+
+
+def run_benchmarks(
+    sizes: List[int],
+    stages: List[str],
+    *,
+    n_pairs: int = 5,
+    seed: int = 0,
+    data_dir: str = DATA_DIR,
+    memory: bool = False
+) -> dict:
+    results = []
+    for size in sizes:
+        size_dir = os.path.join(data_dir, f"{size}")
+        print(f"=== Synthetic dataset {size}x{size} ===")
+        manifest = generate_dataset(size_dir, size, seed=seed, n_pairs=n_pairs)
+        for name in stages:
+            print(f"--- {name} ({size}x{size}) ---")
+            row = {"stage": name, "size": size}
+            try:
+                row.update(_measure(lambda: STAGES[name](manifest, size_dir), memory=memory))
+                print(f"    {row['wall_s']:.3f} s wall, {row['cpu_s']:.3f} s CPU")
+            except StageSkipped as e:
+                row["skipped"] = str(e)
+                print(f"    skipped: {e}")
+            results.append(row)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": seed,
+            "pairs": n_pairs,
+            "memory": memory,
+        },
+        "results": results,
+    }
+
+
+def check_baseline_mode(baseline: dict, memory: bool):
+    """Refuse a baseline from another measurement mode (older baselines were timed under tracemalloc)."""
+    mode = baseline.get("meta", {}).get("memory")
+    if mode != memory:
+        raise ValueError(f"Baseline was measured with memory={mode}, this run uses memory={memory}; "
+                         f"re-run in the same mode or save a new baseline")
+
+
+def compare_to_baseline(current: dict, baseline: dict, tolerance: float = REGRESSION_TOLERANCE) -> List[dict]:
+    """
+    Return one entry per (stage, size, metric) that got worse than baseline by more than tolerance.
+    Raises ValueError if the baseline was measured in another mode (see check_baseline_mode).
+    """
+    check_baseline_mode(baseline, current["meta"]["memory"])
+    base = {(r["stage"], r["size"]): r for r in baseline.get("results", []) if "skipped" not in r}
+    regressions = []
+    for r in current["results"]:
+        b = base.get((r["stage"], r["size"]))
+        if b is None or "skipped" in r:
+            continue
+        for metric, floor in (("wall_s", NOISE_FLOOR_S), ("peak_alloc_mb", 1.0)):
+            now, before = r.get(metric), b.get(metric)
+            if now is None or before is None:
+                continue
+            if now > before * (1 + tolerance) and now - before > floor:
+                regressions.append({"stage": r["stage"], "size": r["size"], "metric": metric,
+                                    "baseline": before, "current": now, "ratio": now / max(before, 1e-12)})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Synthetic-terrain benchmarks for cost surface, routing and evaluation.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="raster edge lengths in cells (e.g. 1000 ... 20000)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--pairs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", default=OUT_JSON)
+    parser.add_argument("--baseline", default=BASELINE_JSON)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--memory", action="store_true",
+                        help="also measure the peak traced allocation (in a second, tracemalloc run per stage)")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        try:
+            check_baseline_mode(baseline, args.memory)
+        except ValueError as e:
+            parser.error(str(e))
+
+    current = run_benchmarks(args.sizes, args.stages, n_pairs=args.pairs, seed=args.seed,
+                             data_dir=args.data_dir, memory=args.memory)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        regressions = compare_to_baseline(current, baseline, args.tolerance)
+    current["regressions"] = regressions
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(current, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+
+    print(f"\n{'stage':<14}{'size':>8}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}")
+    for r in current["results"]:
+        if "skipped" in r:
+            print(f"{r['stage']:<14}{r['size']:>8}{'skipped':>10}")
+            continue
+        peak = f"{r['peak_alloc_mb']:.1f}" if r.get("peak_alloc_mb") is not None else "-"
+        print(f"{r['stage']:<14}{r['size']:>8}{r['wall_s']:>10.3f}{r['cpu_s']:>10.3f}{peak:>10}")
+    for reg in regressions:
+        print(f"[REGRESSION] {reg['stage']} @ {reg['size']}: {reg['metric']} {reg['baseline']:.3f} -> {reg['current']:.3f} (x{reg['ratio']:.2f})")
+    print(f"\nResults written to {args.out}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
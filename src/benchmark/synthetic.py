@@ -0,0 +1,160 @@
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+# Same UTM zone as the study area so GRASS locations accept the rasters
+CRS = "EPSG:25833"
+ORIGIN = (120000.0, 6990000.0)   # upper-left corner
+CELL_SIZE = 10.0
+BLOCK = 512
+PRA_NODATA = -9999.0
+
+_LAYERS = {
+    # name: (dtype, nodata)
+    "dem": ("float32", None),
+    "slope": ("float32", None),
+    "curvature": ("float32", None),
+    "pra_runout_combined": ("float32", PRA_NODATA),
+    "roads": ("uint8", None),
+    "tractorroads_trails": ("uint8", None),
+    "rivers": ("uint8", None),
+    "bridges": ("uint8", None),
+    "fake_bridge": ("uint8", None),
+}
+_MASKS = ("roads", "tractorroads_trails", "rivers", "bridges", "fake_bridge")
+
+
+def _terrain_spec(size: int, seed: int) -> Dict[str, np.ndarray]:
+    """Random sum-of-cosines terrain; analytic, so any window can be evaluated independently."""
+    rng = np.random.default_rng(seed)
+    n = 16
+    extent = size * CELL_SIZE
+    wavelength = rng.uniform(600.0, max(1500.0, extent / 2), n)
+    theta = rng.uniform(0, np.pi, n)
+    return {
+        "amp": rng.uniform(8.0, 50.0, n) * wavelength / 2000.0,
+        "kx": 2 * np.pi / wavelength * np.cos(theta),
+        "ky": 2 * np.pi / wavelength * np.sin(theta),
+        "phase": rng.uniform(0, 2 * np.pi, n),
+        "road_y": ORIGIN[1] - rng.uniform(0.1, 0.9, 3) * extent,
+        "road_x": ORIGIN[0] + rng.uniform(0.1, 0.9, 2) * extent,
+        "river_x": ORIGIN[0] + rng.uniform(0.2, 0.8) * extent,
+    }
+
+
+def _window_layers(spec: Dict[str, np.ndarray], win: Window) -> Dict[str, np.ndarray]:
+    """Evaluate all synthetic layers for one window."""
+    rows = np.arange(win.row_off, win.row_off + win.height, dtype=np.float64)
+    cols = np.arange(win.col_off, win.col_off + win.width, dtype=np.float64)
+    y = (ORIGIN[1] - (rows + 0.5) * CELL_SIZE)[:, None]
+    x = (ORIGIN[0] + (cols + 0.5) * CELL_SIZE)[None, :]
+
+    dem = np.full((win.height, win.width), 800.0)
+    gx = np.zeros_like(dem)
+    gy = np.zeros_like(dem)
+    lap = np.zeros_like(dem)
+    for a, kx, ky, ph in zip(spec["amp"], spec["kx"], spec["ky"], spec["phase"]):
+        arg = kx * x + ky * y + ph
+        c, s = np.cos(arg), np.sin(arg)
+        dem += a * c
+        gx -= a * kx * s
+        gy -= a * ky * s
+        lap -= a * (kx * kx + ky * ky) * c
+
+    slope = np.degrees(np.arctan(np.hypot(gx, gy)))
+    curvature = np.tanh(lap * 300.0)   # positive in bowls, negative on ridges (like windshelter)
+
+    pra = np.full(dem.shape, PRA_NODATA)
+    release = slope >= 30
+    runout = (slope >= 18) & ~release
+    pra[release] = np.clip(7.2 + (slope[release] - 30.0) / 25.0 * 91.8, 7.2, 99.0)
+    pra[runout] = 1.0 + (slope[runout] - 18.0) / 12.0 * 6.2
+
+    half = CELL_SIZE
+    roads = np.zeros(dem.shape, dtype=bool)
+    for ry in spec["road_y"]:
+        roads |= np.abs(y - ry) < half
+    for rx in spec["road_x"]:
+        roads |= np.abs(x - rx) < half
+    river_centre = spec["river_x"] + 400.0 * np.sin(y / 900.0)
+    rivers = np.abs(x - river_centre) < 1.5 * half
+    bridges = rivers & np.broadcast_to(np.any([np.abs(y - ry) < 2 * half for ry in spec["road_y"]], axis=0), rivers.shape)
+    trails = np.abs((x - ORIGIN[0]) - (ORIGIN[1] - y)) < half
+
+    return {
+        "dem": dem.astype(np.float32),
+        "slope": slope.astype(np.float32),
+        "curvature": curvature.astype(np.float32),
+        "pra_runout_combined": pra.astype(np.float32),
+        "roads": roads.astype(np.uint8),
+        "tractorroads_trails": trails.astype(np.uint8),
+        "rivers": rivers.astype(np.uint8),
+        "bridges": bridges.astype(np.uint8),
+        "fake_bridge": np.zeros(dem.shape, dtype=np.uint8),
+    }
+
+
+def _route_pairs(size: int, n_pairs: int, seed: int) -> List[dict]:
+    """Random start/end pairs at least a quarter of the raster apart (native coordinates)."""
+    rng = np.random.default_rng(seed + 1)
+    pairs = []
+    margin = max(1, size // 20)
+    while len(pairs) < n_pairs:
+        (r0, c0), (r1, c1) = rng.integers(margin, size - margin, (2, 2))
+        if np.hypot(r1 - r0, c1 - c0) < size / 4:
+            continue
+        to_xy = lambda r, c: (ORIGIN[0] + (c + 0.5) * CELL_SIZE, ORIGIN[1] - (r + 0.5) * CELL_SIZE)
+        pairs.append({"name": f"pair_{len(pairs)}", "start": to_xy(r0, c0), "end": to_xy(r1, c1)})
+    return pairs
+
+
+def generate_dataset(out_dir: str, size: int, *, seed: int = 0, n_pairs: int = 5) -> dict:
+    """
+    Write an aligned synthetic input set (DEM, slope, curvature, PRA/runout and masks)
+    of size x size cells plus route pairs to out_dir. Reuses an existing dataset with
+    the same size and seed. Layers are evaluated window by window, so memory stays flat.
+    """
+    manifest_path = os.path.join(out_dir, "dataset.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("size") == size and manifest.get("seed") == seed and len(manifest.get("pairs", [])) == n_pairs:
+            return manifest
+
+    os.makedirs(out_dir, exist_ok=True)
+    spec = _terrain_spec(size, seed)
+    transform = from_origin(ORIGIN[0], ORIGIN[1], CELL_SIZE, CELL_SIZE)
+    paths = {name: os.path.join(out_dir, f"{name}.tif") for name in _LAYERS}
+
+    datasets = {}
+    try:
+        for name, (dtype, nodata) in _LAYERS.items():
+            datasets[name] = rasterio.open(
+                paths[name], "w", driver="GTiff", width=size, height=size, count=1,
+                dtype=dtype, nodata=nodata, crs=CRS, transform=transform,
+                tiled=True, blockxsize=BLOCK, blockysize=BLOCK, compress="lzw",
+            )
+        for r in range(0, size, BLOCK):
+            for c in range(0, size, BLOCK):
+                win = Window(c, r, min(BLOCK, size - c), min(BLOCK, size - r))
+                for name, arr in _window_layers(spec, win).items():
+                    datasets[name].write(arr, 1, window=win)
+    finally:
+        for ds in datasets.values():
+            ds.close()
+
+    manifest = {
+        "size": size,
+        "seed": seed,
+        "inputs": {k: paths[k] for k in _LAYERS if k not in _MASKS},
+        "masks": {k: paths[k] for k in _MASKS},
+        "pairs": _route_pairs(size, n_pairs, seed),
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,120 @@
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window, transform as window_transform
+
+# Quantisation of the excess cost: dtype -> (max stored value, nodata)
+QUANTIZE_LEVELS = {
+    "uint8": (254, 255),
+    "uint16": (65534, 65535),
+}
+
+
+class Corridor(NamedTuple):
+    data: np.ndarray        # excess cost inside the band, cropped to 'window'
+    window: Window           # position of 'data' in the full raster
+    optimum: float           # minimum of cum_start + cum_end (= cost of the optimal route)
+    limit: float             # optimum * (1 + slack), cells above are dropped
+    scale: float             # stored value * scale = excess cost above the optimum
+    nodata: float
+
+
+def near_optimal_corridor(
+    cum_start: np.ndarray,
+    cum_end: np.ndarray,
+    slack: float = 0.05,
+    dtype: Optional[str] = "uint8"
+) -> Corridor:
+    """
+    Keep only cells whose corridor cost (cum_start + cum_end) is within 'slack'
+    of the optimum, cropped to the bounding box of that band.
+    The excess cost is stored as float32, or quantised to uint8/uint16.
+    """
+    if slack < 0:
+        raise ValueError("slack must be >= 0")
+    if dtype is not None and dtype not in QUANTIZE_LEVELS:
+        raise ValueError(f"Unknown corridor dtype '{dtype}', expected one of {list(QUANTIZE_LEVELS)} or None")
+
+    total = cum_start.astype(np.float64, copy=False) + cum_end.astype(np.float64, copy=False)
+    valid = np.isfinite(total)
+    if not np.any(valid):
+        raise ValueError("Corridor is empty: no cell is reachable from both start and end")
+
+    optimum = float(total[valid].min())
+    limit = optimum * (1.0 + slack)
+    keep = valid & (total <= limit)
+
+    # Crop to the band
+    rows = np.flatnonzero(keep.any(axis=1))
+    cols = np.flatnonzero(keep.any(axis=0))
+    r0, r1 = int(rows[0]), int(rows[-1]) + 1
+    c0, c1 = int(cols[0]), int(cols[-1]) + 1
+    window = Window(c0, r0, c1 - c0, r1 - r0)
+    excess = total[r0:r1, c0:c1] - optimum
+    keep = keep[r0:r1, c0:c1]
+
+    if dtype is None:
+        data = np.where(keep, excess, np.nan).astype(np.float32)
+        return Corridor(data, window, optimum, limit, 1.0, float("nan"))
+
+    qmax, nodata = QUANTIZE_LEVELS[dtype]
+    span = limit - optimum
+    scale = span / qmax if span > 0 else 1.0
+    q = np.clip(np.round(excess / scale), 0, qmax)
+    data = np.where(keep, q, nodata).astype(dtype)
+    return Corridor(data, window, optimum, limit, scale, float(nodata))
+
+
+def write_corridor(corridor: Corridor, output_path: str, profile: dict) -> str:
+    """Write a cropped corridor band as a compressed GeoTIFF; the decoding scale is stored as tags."""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    height, width = corridor.data.shape
+    prof = profile.copy()
+    prof.update(
+        driver="GTiff",
+        dtype=corridor.data.dtype.name,
+        count=1,
+        width=width,
+        height=height,
+        transform=window_transform(corridor.window, profile["transform"]),
+        nodata=corridor.nodata,
+        compress="lzw",
+        predictor=2 if corridor.data.dtype.kind == "u" else 3,
+    )
+    for key in ("blockxsize", "blockysize", "tiled"):
+        prof.pop(key, None)
+    with rasterio.open(output_path, "w", **prof) as dst:
+        dst.write(corridor.data, 1)
+        dst.update_tags(
+            OPTIMUM=repr(corridor.optimum),
+            LIMIT=repr(corridor.limit),
+            EXCESS_SCALE=repr(corridor.scale),
+        )
+    return output_path
+
+
+def write_corridor_polygon(corridor: Corridor, output_path: str, profile: dict) -> str:
+    """Polygonise the corridor band (cells kept) and save it as GeoJSON in the raster CRS."""
+    import geopandas as gpd
+    from rasterio.features import shapes
+    from shapely.geometry import shape
+    from shapely.ops import unary_union
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if np.isnan(corridor.nodata):
+        keep = np.isfinite(corridor.data)
+    else:
+        keep = corridor.data != corridor.nodata
+    transform = window_transform(corridor.window, profile["transform"])
+    polygons = [shape(geom) for geom, _ in shapes(keep.astype(np.uint8), mask=keep, transform=transform)]
+    band = unary_union(polygons)
+
+    gdf = gpd.GeoDataFrame(
+        {"optimum": [corridor.optimum], "limit": [corridor.limit]},
+        geometry=[band],
+        crs=profile.get("crs"),
+    )
+    gdf.to_file(output_path, driver="GeoJSON")
+    return output_path
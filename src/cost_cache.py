@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = "output/cache/cost_fields"
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3   # 4 GB
+
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, memoized per (path, size, mtime) so unchanged rasters are hashed once."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _hash_memo:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+        _hash_memo[memo_key] = h.hexdigest()
+    return _hash_memo[memo_key]
+
+
+def field_key(
+    dem_path: str,
+    cost_surface_path: str,
+    lambda_weight: float,
+    walk_coeffs: Sequence[float],
+    source_cell: Tuple[int, int],
+    **extra
+) -> str:
+    """Cache key of a cost-distance field: input hashes, solver coefficients and snapped source cell."""
+    payload = {
+        "dem": file_hash(dem_path),
+        "cost": file_hash(cost_surface_path),
+        "lambda": float(lambda_weight),
+        "walk_coeffs": [float(v) for v in walk_coeffs],
+        "source_cell": [int(source_cell[0]), int(source_cell[1])],
+        **extra,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+
+class CostFieldCache:
+    """
+    Disk cache of cumulative cost + direction fields stored as .npy files.
+    Fields are returned memory-mapped (read-only); the least recently used
+    entries are evicted when the cache grows beyond max_bytes.
+    The files are the index: an entry exists once its _cum.npy is in place (written after
+    _dir.npy) and its mtime, touched on every hit, is its last use. Nothing shared is rewritten,
+    so several processes (service, batch runs) can use one cache directory at the same time.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (os.path.join(self.cache_dir, f"{key}_cum.npy"),
+                os.path.join(self.cache_dir, f"{key}_dir.npy"))
+
+    def _entries(self) -> Dict[str, Tuple[float, int]]:
+        """key -> (last use, bytes) of every complete entry."""
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith("_cum.npy") or ".tmp" in name:
+                continue
+            key = name[:-len("_cum.npy")]
+            try:
+                st_cum, st_dir = (os.stat(p) for p in self._paths(key))
+            except FileNotFoundError:   # half-written or being evicted by another process
+                continue
+            entries[key] = (st_cum.st_mtime, st_cum.st_size + st_dir.st_size)
+        return entries
+
+    # --- public API ---
+    def __contains__(self, key: str) -> bool:
+        return all(os.path.exists(p) for p in self._paths(key))
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Return memory-mapped (cum, direction) for key, or None on a miss."""
+        cum_path, dir_path = self._paths(key)
+        try:
+            cum = np.load(cum_path, mmap_mode="r")
+            direction = np.load(dir_path, mmap_mode="r")
+            os.utime(cum_path)   # mark as recently used
+        except (FileNotFoundError, ValueError):
+            return None
+        return cum, direction
+
+    def put(self, key: str, cum: np.ndarray, direction: np.ndarray):
+        """Store a field pair and evict least recently used entries beyond the size budget."""
+        with self._lock:
+            for path, arr in zip(self._paths(key)[::-1], (direction, cum)):   # _cum.npy last: marks the entry complete
+                tmp = f"{path}.{os.getpid()}.tmp.npy"
+                np.save(tmp, np.ascontiguousarray(arr))
+                os.replace(tmp, path)
+            self._evict(keep=key)
+
+    def size_bytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._entries().values())
+
+    def _evict(self, keep: Optional[str] = None):
+        entries = self._entries()
+        total = sum(nbytes for _, nbytes in entries.values())
+        for key, (_, nbytes) in sorted(entries.items(), key=lambda kv: kv[1][0]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in self._paths(key):   # _cum.npy first, so readers see a miss, not half an entry
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= nbytes
@@ -42,5 +42,20 @@ BARRIER_VALUE = 99.0
 ROADS_MIN_VALUE = 2.0
 # ROADS_ELSEWHERE_VALUE = 99.0
 
+# --- Where roads/trails may lower the cost (safe terrain only) ---
+REDUCTION_MAX_SLOPE = 30       # degrees
+REDUCTION_MAX_PRA = 5.0        # PRA-runout cost
+
+# --- Scenarios for the multi-band cost surface (one band each) ---
+# Keys: name, weights, transform_params, reduction_max_slope, reduction_max_pra, barrier_value, roads_min_value.
+# Missing keys fall back to the values above.
+SCENARIOS = [
+    {"name": "low", "reduction_max_slope": 35, "reduction_max_pra": 7.2},
+    {"name": "moderate"},
+    {"name": "considerable", "reduction_max_slope": 25, "reduction_max_pra": 1.0,
+     "weights": {"slope": 6, "curvature": 1, "pra_runout_combined": 8}},
+]
+
 OUTPUT_COST = "output/cost_surface.tif"
+OUTPUT_COST_SCENARIOS = "output/cost_surface_scenarios.tif"
 NODATA_VALUE = 255
\ No newline at end of file
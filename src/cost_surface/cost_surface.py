@@ -1,6 +1,11 @@
+import contextlib
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import rasterio
 import numpy as np
 import os
+from rasterio.windows import Window
 
 from . import config                              
 from .transforms import (                       
@@ -10,12 +15,14 @@ from .transforms import (
     reduction_layer_from_mask,
 )
 from .combine import clip_round, weighted_sum, min_combine, max_combine
+from .writer import BackgroundWriter, _decimate
+from ..instrumentation import span, traced
 np.seterr(all='ignore')  # ignore warnings for NaNs
 
-def _read_raster(path: str) -> tuple[np.ndarray, dict]:
-    """Read raster as float32, propagate nodata as np.nan."""
-    with rasterio.open(path) as src:
-        arr = src.read(1)
+def _read_raster(path: str, window: Window = None) -> tuple[np.ndarray, dict]:
+    """Read raster (or one window of it) as float32, propagate nodata as np.nan."""
+    with span("cost_surface.read", path=path), rasterio.open(path) as src:
+        arr = src.read(1, window=window)
         profile = src.profile
         nodata = src.nodata
     arr = arr.astype(np.float32, copy=False)
@@ -23,42 +30,70 @@ def _read_raster(path: str) -> tuple[np.ndarray, dict]:
         arr = np.where(arr == nodata, np.nan, arr)
     return arr, profile
 
-def _read_mask(path: str) -> np.ndarray:
+def _read_mask(path: str, window: Window = None) -> np.ndarray:
     """Return boolean mask (True where feature exists)."""
-    with rasterio.open(path) as src:
-        band = src.read(1)
+    with span("cost_surface.read", path=path), rasterio.open(path) as src:
+        band = src.read(1, window=window)
         nodata = src.nodata
     if nodata is not None:
         band = np.where(band == nodata, 0, band)
     return (band != 0)
 
-def _debug_layer_save(arr: np.ndarray, filename: str, profile: dict):
-    """Save an intermediate array for debugging and visualization."""
+def _debug_layer_save(arr: np.ndarray, filename: str, profile: dict, writer: BackgroundWriter = None, sample: int = 1):
+    """
+    Save an intermediate array for debugging and visualization.
+    With a writer the save runs in the background; sample > 1 saves a decimated overview.
+    """
     debug_dir = "output/debug_cost_layer"
     os.makedirs(debug_dir, exist_ok=True)
     output_path = os.path.join(debug_dir, filename)
 
     prof = profile.copy()
     prof.update(dtype=arr.dtype, count=1, compress='lzw', nodata=None)
-    with rasterio.open(output_path, 'w', **prof) as dst:
+    if writer is not None:
+        writer.submit(arr, output_path, prof, decimate=sample, label="Debug layer")
+        return
+    if sample > 1:
+        arr, prof = _decimate(arr, prof, sample)
+    with span("cost_surface.debug_write", layer=filename), rasterio.open(output_path, 'w', **prof) as dst:
         dst.write(arr, 1)
     print(f"Debug layer saved to {output_path}")
 
-def create_cost_surface(output_path: str, debug_mode: bool = True):
-    """
-    Creates and saves a cost surface from input rasters and masks.
-    In debug mode, it saves intermediate layers for tuning.
-    """
-    # Reference profile
-    with rasterio.open(config.REF_RASTER) as ref:
-        ref_profile = ref.profile
+MASK_NAMES = ("rivers", "roads", "tractorroads_trails", "bridges", "fake_bridge")
+
 
-    # Load input rasters
-    dem_arr, _ = _read_raster(config.INPUT_RASTERS["dem"])
-    slope_arr, _ = _read_raster(config.INPUT_RASTERS["slope"])
-    curvature_arr, _ = _read_raster(config.INPUT_RASTERS["curvature"])
-    pra_runout_combined_arr, _ = _read_raster(config.INPUT_RASTERS["pra_runout_combined"])
+def scenario_params(scenario: dict = None) -> dict:
+    """Full parameter set of a scenario; missing keys fall back to the config values."""
+    scenario = scenario or {}
+    params = {
+        "name": "default",
+        "weights": config.WEIGHTS_TERRAIN,
+        "transform_params": config.TRANSFORM_PARAMS,
+        "reduction_max_slope": config.REDUCTION_MAX_SLOPE,
+        "reduction_max_pra": config.REDUCTION_MAX_PRA,
+        "barrier_value": config.BARRIER_VALUE,
+        "roads_min_value": config.ROADS_MIN_VALUE,
+    }
+    unknown = set(scenario) - set(params)
+    if unknown:
+        raise ValueError(f"Unknown scenario keys: {sorted(unknown)}")
+    params.update(scenario)
+    return params
 
+
+def _load_inputs(window: Window = None) -> dict:
+    """Read all input rasters and masks (or one window of them) once (shared by every scenario)."""
+    slope_arr, _ = _read_raster(config.INPUT_RASTERS["slope"], window)
+    curvature_arr, _ = _read_raster(config.INPUT_RASTERS["curvature"], window)
+    pra_runout_combined_arr, _ = _read_raster(config.INPUT_RASTERS["pra_runout_combined"], window)
+    masks = {name: _read_mask(config.MASK_RASTERS[name], window) if config.MASK_RASTERS.get(name) else None
+             for name in MASK_NAMES}
+    return _prepare_inputs(slope_arr, curvature_arr, pra_runout_combined_arr, masks)
+
+
+def _prepare_inputs(slope_arr: np.ndarray, curvature_arr: np.ndarray, pra_runout_combined_arr: np.ndarray,
+                    masks: dict) -> dict:
+    """Shape check and NODATA policies of the raw inputs (float32 with NaN, boolean masks or None)."""
     # Verify shapes
     for arr in [curvature_arr, pra_runout_combined_arr]:
         if arr.shape != slope_arr.shape:
@@ -68,69 +103,260 @@ def create_cost_surface(output_path: str, debug_mode: bool = True):
     pra_runout_combined_arr = np.where(
     np.isnan(pra_runout_combined_arr), 1, pra_runout_combined_arr).astype(np.float32, copy=False) # treat NoData (neither release nor runout) as low cost (1)
 
-    # Terrain transforms using generalized Cauchy
-    slope_cost_arr = slope_cost_logistic(slope_arr, **config.TRANSFORM_PARAMS["slope"])
-    curvature_cost_arr = curvature_cost_logistic(curvature_arr, **config.TRANSFORM_PARAMS["curvature"])
-    pra_runout_combined_cost_arr = pra_runout_combined_arr  # direct use, already in [1,99]
+    # Propagate nodata
+    nodata_mask = np.isnan(slope_arr) | np.isnan(curvature_arr) | np.isnan(pra_runout_combined_arr)
+
+    return dict(slope=slope_arr, curvature=curvature_arr, pra_runout_combined=pra_runout_combined_arr,
+                nodata_mask=nodata_mask, masks=masks)
 
-    if debug_mode:
-        _debug_layer_save(slope_cost_arr, "01_slope_cost.tif", ref_profile)
-        _debug_layer_save(curvature_cost_arr, "02_curvature_cost.tif", ref_profile)
-        _debug_layer_save(pra_runout_combined_cost_arr, "03_pra_runout_combined_cost.tif", ref_profile)
 
-    # Combine layers: weighted sum
-    layers = {"slope": slope_cost_arr, "curvature": curvature_cost_arr, "pra_runout_combined": pra_runout_combined_cost_arr}
-    surface_sum = weighted_sum(layers, config.WEIGHTS_TERRAIN)
+# Input layers with a parametrised transform (keys of config.TRANSFORM_PARAMS)
+TRANSFORMS = {"slope": slope_cost_logistic, "curvature": curvature_cost_logistic}
+
+
+def _transform_layer(inputs: dict, layer: str, params: dict) -> np.ndarray:
+    """One terrain transform (config.TRANSFORM_PARAMS[layer]-style params) -> cost layer."""
+    return TRANSFORMS[layer](inputs[layer], **params)
 
-    if debug_mode:
-        _debug_layer_save(surface_sum, "04_weighted_sum.tif", ref_profile)
+
+def _transform_layers(inputs: dict, transform_params: dict) -> dict:
+    """Terrain transforms using generalized Cauchy -> cost layers for the weighted sum."""
+    with span("cost_surface.transforms"):
+        slope_cost_arr = _transform_layer(inputs, "slope", transform_params["slope"])
+        curvature_cost_arr = _transform_layer(inputs, "curvature", transform_params["curvature"])
+    pra_runout_combined_cost_arr = inputs["pra_runout_combined"]  # direct use, already in [1,99]
+    return {"slope": slope_cost_arr, "curvature": curvature_cost_arr, "pra_runout_combined": pra_runout_combined_cost_arr}
+
+
+def _combine_surface(inputs: dict, layers: dict, params: dict, save=None) -> np.ndarray:
+    """
+    Weighted sum, barriers (MAX) and reductions (MIN) for one scenario -> uint8 cost surface.
+    save(arr, filename), if given, receives the intermediate layers.
+    """
+    with span("cost_surface.combine", step="weighted_sum"):
+        surface_sum = weighted_sum(layers, params["weights"])
+
+    if save:
+        save(surface_sum, "04_weighted_sum.tif")
 
     # Validity mask (safe mask): where reductions are allowed
-    reduction_validity_mask = ((slope_arr <= 30) & (pra_runout_combined_cost_arr <= 5.0))   # only allow reductions where slope <= 30 degrees and PRA-runout-cost <= 5
+    reduction_validity_mask = ((inputs["slope"] <= params["reduction_max_slope"])
+                               & (layers["pra_runout_combined"] <= params["reduction_max_pra"]))
 
     # Barrier / reduction layers
-    rivers_mask = _read_mask(config.MASK_RASTERS["rivers"]) if config.MASK_RASTERS.get("rivers") else None
-    roads_mask = _read_mask(config.MASK_RASTERS["roads"]) if config.MASK_RASTERS.get("roads") else None
-    tractorroads_trails_mask = _read_mask(config.MASK_RASTERS.get("tractorroads_trails")) if config.MASK_RASTERS.get("tractorroads_trails") else None
-    bridges_mask = _read_mask(config.MASK_RASTERS.get("bridges")) if config.MASK_RASTERS.get("bridges") else None
-    fake_bridge_mask = _read_mask(config.MASK_RASTERS.get("fake_bridge")) if config.MASK_RASTERS.get("fake_bridge") else None
-
-    rivers_barrier = barrier_layer_from_mask(rivers_mask, barrier_value=config.BARRIER_VALUE) if rivers_mask is not None else None
-    roads_reduction = reduction_layer_from_mask(roads_mask, reduction_validity_mask, low_value=config.ROADS_MIN_VALUE, elsewhere_value=config.BARRIER_VALUE) if roads_mask is not None else None
-    tractorroads_trails_reduction = reduction_layer_from_mask(tractorroads_trails_mask, reduction_validity_mask, low_value=config.ROADS_MIN_VALUE, elsewhere_value=config.BARRIER_VALUE) if tractorroads_trails_mask is not None else None
-    bridges_reduction = reduction_layer_from_mask(bridges_mask, low_value=config.ROADS_MIN_VALUE, elsewhere_value=config.BARRIER_VALUE) if bridges_mask is not None else None                   # bridges always valid
-    fake_bridge_reduction = reduction_layer_from_mask(fake_bridge_mask, low_value=config.ROADS_MIN_VALUE, elsewhere_value=config.BARRIER_VALUE) if fake_bridge_mask is not None else None       # fake bridges always valid
+    masks = inputs["masks"]
+    barrier, low = params["barrier_value"], params["roads_min_value"]
+    with span("cost_surface.mask_layers"):
+        rivers_barrier = barrier_layer_from_mask(masks["rivers"], barrier_value=barrier) if masks["rivers"] is not None else None
+        roads_reduction = reduction_layer_from_mask(masks["roads"], reduction_validity_mask, low_value=low, elsewhere_value=barrier) if masks["roads"] is not None else None
+        tractorroads_trails_reduction = reduction_layer_from_mask(masks["tractorroads_trails"], reduction_validity_mask, low_value=low, elsewhere_value=barrier) if masks["tractorroads_trails"] is not None else None
+        bridges_reduction = reduction_layer_from_mask(masks["bridges"], low_value=low, elsewhere_value=barrier) if masks["bridges"] is not None else None                   # bridges always valid
+        fake_bridge_reduction = reduction_layer_from_mask(masks["fake_bridge"], low_value=low, elsewhere_value=barrier) if masks["fake_bridge"] is not None else None       # fake bridges always valid
 
     # Pipeline: MAX for barriers, MIN for reductions
     with_barriers = surface_sum
     if rivers_barrier is not None:
-        with_barriers = max_combine(with_barriers, rivers_barrier)
-    
-    if debug_mode:
-        _debug_layer_save(with_barriers, "05_with_barriers.tif", ref_profile)
+        with span("cost_surface.combine", step="barriers"):
+            with_barriers = max_combine(with_barriers, rivers_barrier)
+
+    if save:
+        save(with_barriers, "05_with_barriers.tif")
 
     reduction_layers = [arr for arr in [roads_reduction, tractorroads_trails_reduction, bridges_reduction, fake_bridge_reduction] if arr is not None]
     with_reductions = with_barriers
     if reduction_layers:
-        with_reductions = min_combine(with_barriers, *reduction_layers)
+        with span("cost_surface.combine", step="reductions"):
+            with_reductions = min_combine(with_barriers, *reduction_layers)
 
-    if debug_mode:
-        _debug_layer_save(with_reductions, "06_with_reductions.tif", ref_profile)
+    if save:
+        save(with_reductions, "06_with_reductions.tif")
 
-    # Propagate nodata
-    nodata_mask = np.isnan(slope_arr) | np.isnan(curvature_arr) | np.isnan(pra_runout_combined_arr)
     surface_u8 = clip_round(with_reductions, min_cost=1.0, max_cost=99.0)
-    surface_u8[nodata_mask] = config.NODATA_VALUE
+    surface_u8[inputs["nodata_mask"]] = config.NODATA_VALUE
+    return surface_u8
+
+
+def _compute_window(window: Window, params: dict) -> np.ndarray:
+    """Cost surface of one window; every step is per cell, so windows match the full-raster result."""
+    inputs = _load_inputs(window)
+    return _combine_surface(inputs, _transform_layers(inputs, params["transform_params"]), params)
+
+
+@traced("create_cost_surface")
+def create_cost_surface(
+    output_path: str,
+    debug_mode: bool = True,
+    debug_sample: int = 1,
+    background_writes: bool = True,
+    workers: int = 1,
+    scenario: dict = None
+):
+    """
+    Creates and saves a cost surface from input rasters and masks.
+    In debug mode, it saves intermediate layers for tuning (every debug_sample-th cell if > 1).
+    With background_writes, debug layers and the output are compressed/written on
+    worker threads while the computation continues.
+    workers > 1 (or 0 for all cores) builds block-parallel (see _create_cost_surface_blocks);
+    the file is byte-identical to the single-threaded one. It writes no debug layers, so it
+    needs debug_mode=False (ValueError otherwise).
+    scenario (config.SCENARIOS-style dict) overrides weights / transform parameters / constants.
+    """
+    if workers != 1 and debug_mode:
+        raise ValueError("workers != 1 builds block-parallel without debug layers; pass debug_mode=False")
+    if workers != 1:
+        _create_cost_surface_blocks(output_path, workers or os.cpu_count() or 1, scenario)
+    else:
+        with BackgroundWriter() if background_writes else contextlib.nullcontext() as writer:
+            _create_cost_surface(output_path, debug_mode, debug_sample, writer, scenario)
+    print(f"Cost surface written to {output_path}")
+
+
+def _block_windows(profile: dict, cells: int = 1 << 20):
+    """Full-width strips of whole output blocks (rows of tiles or strips), about 'cells' cells each."""
+    block_h = profile.get("blockysize") or 1
+    rows = max(block_h, (cells // profile["width"]) // block_h * block_h)
+    for r0 in range(0, profile["height"], rows):
+        yield Window(0, r0, profile["width"], min(rows, profile["height"] - r0))
+
+
+def _create_cost_surface_blocks(output_path: str, workers: int, scenario: dict = None):
+    """
+    Read -> transform -> combine per window on a thread pool (NumPy and GDAL decoding release
+    the GIL), while the main thread writes finished windows in raster order with GDAL
+    compressing on all cores. At most 2 * workers windows are in flight.
+    """
+    with rasterio.open(config.REF_RASTER) as ref:
+        ref_profile = ref.profile
+    params = scenario_params(scenario)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    prof = ref_profile.copy()
+    prof.update(dtype=rasterio.uint8, count=1, compress='lzw', nodata=config.NODATA_VALUE, num_threads="ALL_CPUS")
+    windows = list(_block_windows(prof))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cost-block") as pool, \
+            span("cost_surface.blocks", windows=len(windows), workers=workers), \
+            rasterio.open(output_path, 'w', **prof) as dst:
+        pending = deque()
+        for win in windows:
+            pending.append((win, pool.submit(_compute_window, win, params)))
+            if len(pending) >= 2 * workers:
+                done, future = pending.popleft()
+                dst.write(future.result(), 1, window=done)
+        while pending:
+            done, future = pending.popleft()
+            dst.write(future.result(), 1, window=done)
+
+
+def _create_cost_surface(output_path: str, debug_mode: bool, debug_sample: int, writer, scenario: dict = None):
+    # Reference profile
+    with rasterio.open(config.REF_RASTER) as ref:
+        ref_profile = ref.profile
+
+    save = None
+    if debug_mode:
+        save = lambda arr, filename: _debug_layer_save(arr, filename, ref_profile, writer, debug_sample)
+
+    inputs = _load_inputs()
+    params = scenario_params(scenario)
+    layers = _transform_layers(inputs, params["transform_params"])
+
+    if save:
+        save(layers["slope"], "01_slope_cost.tif")
+        save(layers["curvature"], "02_curvature_cost.tif")
+        save(layers["pra_runout_combined"], "03_pra_runout_combined_cost.tif")
+
+    surface_u8 = _combine_surface(inputs, layers, params, save)
 
     # Write final output raster
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     prof = ref_profile.copy()
     prof.update(dtype=rasterio.uint8, count=1, compress='lzw', nodata=config.NODATA_VALUE)
-    with rasterio.open(output_path, 'w', **prof) as dst:
+    if writer is not None:
+        writer.submit(surface_u8, output_path, prof, label=None)   # create_cost_surface reports it
+        return
+    with span("cost_surface.write", path=output_path), rasterio.open(output_path, 'w', **prof) as dst:
         dst.write(surface_u8, 1) 
 
-    print(f"Cost surface written to {output_path}")
+
+@traced("create_cost_surface_stack")
+def create_cost_surface_stack(output_path: str, scenarios: list = None) -> str:
+    """
+    Build one cost surface per scenario (see config.SCENARIOS) as the bands of one uint8 raster.
+    Inputs are read and transformed once; only the combine step runs per scenario
+    (transforms are redone only for scenarios with their own transform_params).
+    Bands are named after the scenarios and carry their parameters as JSON tags.
+    """
+    scenarios = [scenario_params(s) for s in (config.SCENARIOS if scenarios is None else scenarios)]
+    names = [s["name"] for s in scenarios]
+    if not scenarios or len(set(names)) != len(names):
+        raise ValueError(f"Scenarios need unique names, got {names}")
+
+    with rasterio.open(config.REF_RASTER) as ref:
+        ref_profile = ref.profile
+    inputs = _load_inputs()
+    transformed = {}
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    prof = ref_profile.copy()
+    prof.update(dtype=rasterio.uint8, count=len(scenarios), compress='lzw', nodata=config.NODATA_VALUE)
+    with rasterio.open(output_path, 'w', **prof) as dst:
+        for band, params in enumerate(scenarios, start=1):
+            key = json.dumps(params["transform_params"], sort_keys=True)
+            if key not in transformed:
+                transformed[key] = _transform_layers(inputs, params["transform_params"])
+            with span("cost_surface.scenario", scenario=params["name"]):
+                surface_u8 = _combine_surface(inputs, transformed[key], params)
+            with span("cost_surface.write", path=output_path, band=band):
+                dst.write(surface_u8, band)
+            dst.set_band_description(band, params["name"])
+            dst.update_tags(band, SCENARIO=json.dumps(params, sort_keys=True))
+            print(f"Scenario '{params['name']}' -> band {band}")
+    print(f"Cost surface stack ({len(scenarios)} scenarios) written to {output_path}")
+    return output_path
+
+
+@traced("create_cost_surface_tiles")
+def create_cost_surface_tiles(
+    tile_root: str,
+    *,
+    tile_size: int = 1024,
+    halo: int = 8,
+    workers: int = None,
+    scenario: dict = None,
+    dem_path: str = None
+):
+    """
+    Build the cost surface as a tiled store (see TileStore): every tile (core + halo) is read,
+    transformed and combined from windows of the inputs on its own, so tiles are built in
+    parallel and memory depends on the tile size, not on the region. The DEM is tiled into
+    the same store (layer 'dem') for tiled routing. The cost is per cell, so the tiles match
+    the monolithic surface exactly.
+    """
+    from ..tile_store import TileStore
+
+    with rasterio.open(config.REF_RASTER) as ref:
+        ref_profile = ref.profile
+    store = TileStore.create(tile_root, ref_profile, tile_size, halo)
+    params = scenario_params(scenario)
+
+    store.build_layer("cost", lambda window: _compute_window(window, params), nodata=config.NODATA_VALUE, workers=workers)
+    store.tile_raster(dem_path or config.INPUT_RASTERS["dem"], "dem", workers=workers)
+    return store
 
 
 if __name__ == "__main__":
-    create_cost_surface(config.OUTPUT_COST, debug_mode=True)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the cost surface (or one band per scenario with --scenarios).")
+    parser.add_argument("--scenarios", action="store_true", help=f"write config.SCENARIOS to {config.OUTPUT_COST_SCENARIOS}")
+    parser.add_argument("--tiles", default=None, metavar="DIR", help="write a tiled store (cost + dem) to DIR instead")
+    parser.add_argument("--tile-size", type=int, default=1024)
+    parser.add_argument("--halo", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="block-parallel build on N threads (0: all cores; no debug layers)")
+    args = parser.parse_args()
+    if args.tiles:
+        create_cost_surface_tiles(args.tiles, tile_size=args.tile_size, halo=args.halo)
+    elif args.scenarios:
+        create_cost_surface_stack(config.OUTPUT_COST_SCENARIOS)
+    else:
+        create_cost_surface(config.OUTPUT_COST, debug_mode=args.workers == 1, workers=args.workers)
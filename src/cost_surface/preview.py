@@ -0,0 +1,154 @@
+import argparse
+import os
+import time
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import Affine
+from rasterio.windows import Window, from_bounds
+
+from . import config
+from .cost_surface import (MASK_NAMES, _combine_surface, _prepare_inputs, _transform_layers,
+                           create_cost_surface, scenario_params)
+from ..instrumentation import span
+
+PREVIEW_DIR = "output/cache/preview"
+LEVELS = (1, 2, 4, 8, 16, 32)        # decimation factors of the overview levels (1 = full resolution)
+MAX_PREVIEW_CELLS = 512 * 512        # a viewport is rendered at the finest level with at most this many cells
+
+Bounds = Tuple[float, float, float, float]
+
+
+class PreviewResult(NamedTuple):
+    cost: np.ndarray      # uint8 cost surface of the viewport, config.NODATA_VALUE where nodata
+    transform: Affine     # georeference of cost (cells are 'level' times the input cell size)
+    level: int            # decimation factor used
+
+
+def _mask_any(src, factor: int, shape: Tuple[int, int]) -> np.ndarray:
+    """Mask decimated by 'any cell set' per factor x factor block (GDAL reads have no max resampling)."""
+    out = np.zeros(shape, dtype=bool)
+    step = max(1, (1 << 22) // (src.width * factor)) * factor     # row strips of ~4M cells
+    for r0 in range(0, src.height, step):
+        band = src.read(1, window=Window(0, r0, src.width, min(step, src.height - r0)))
+        on = band != 0 if src.nodata is None else (band != 0) & (band != src.nodata)
+        h, w = -(-on.shape[0] // factor) * factor, shape[1] * factor
+        padded = np.zeros((h, w), dtype=bool)
+        padded[:on.shape[0], :on.shape[1]] = on
+        out[r0 // factor:r0 // factor + h // factor] = padded.reshape(h // factor, factor, shape[1], factor).any(axis=(1, 3))
+    return out
+
+
+class CostPreview:
+    """
+    Live preview of the cost surface for parameter tuning (e.g. transforms_tuning.ipynb widgets).
+    Every input and mask is decimated once per level (average for continuous layers, max for
+    masks so thin roads and rivers survive) and cached as .npy under cache_dir, keyed by the
+    input file hashes. render() cuts the viewport out of the right level and runs the exact
+    _transform_layers / _combine_surface of the full build on it; promote() runs that build.
+    """
+
+    def __init__(self, levels: Sequence[int] = LEVELS, cache_dir: str = PREVIEW_DIR,
+                 max_cells: int = MAX_PREVIEW_CELLS):
+        self.levels = tuple(sorted(levels))
+        self.cache_dir = cache_dir
+        self.max_cells = max_cells
+        with rasterio.open(config.REF_RASTER) as ref:
+            self.profile = ref.profile
+        self.transform = self.profile["transform"]
+        self._cache: Dict[int, dict] = {}
+
+    def _overview(self, path: str, factor: int, mask: bool) -> np.ndarray:
+        from ..cost_cache import file_hash
+        out = os.path.join(self.cache_dir, f"{file_hash(path)}_{factor}.npy")
+        if not os.path.exists(out):
+            shape = (-(-self.profile["height"] // factor), -(-self.profile["width"] // factor))
+            with span("preview.overview", path=path, level=factor), rasterio.open(path) as src:
+                if (src.height, src.width) != (self.profile["height"], self.profile["width"]):
+                    raise ValueError(f"{path} is not on the grid of {config.REF_RASTER}")
+                if mask:
+                    arr = _mask_any(src, factor, shape)
+                else:
+                    data = src.read(1, out_shape=shape, resampling=Resampling.average, masked=True)
+                    arr = data.astype(np.float32).filled(np.nan)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = out + ".tmp.npy"
+            np.save(tmp, arr)
+            os.replace(tmp, out)
+        return np.load(out, mmap_mode="r")
+
+    def level_arrays(self, factor: int) -> dict:
+        """Raw inputs (float32 with NaN) and masks (bool or None) at one decimation level."""
+        if factor not in self._cache:
+            if factor not in self.levels:
+                raise ValueError(f"Unknown level {factor}, expected one of {self.levels}")
+            arrays = {name: self._overview(config.INPUT_RASTERS[name], factor, mask=False)
+                      for name in ("slope", "curvature", "pra_runout_combined")}
+            arrays["masks"] = {name: self._overview(config.MASK_RASTERS[name], factor, mask=True)
+                               if config.MASK_RASTERS.get(name) else None for name in MASK_NAMES}
+            self._cache[factor] = arrays
+        return self._cache[factor]
+
+    def build(self):
+        """Build (or load) every overview level up front, so the first render is fast too."""
+        for factor in self.levels:
+            self.level_arrays(factor)
+        print(f"[preview] Overview levels {self.levels} ready in {self.cache_dir}")
+
+    def level_for(self, rows: int, cols: int) -> int:
+        """Finest level at which a rows x cols (full-resolution) viewport has at most max_cells cells."""
+        for factor in self.levels:
+            if -(-rows // factor) * -(-cols // factor) <= self.max_cells:
+                return factor
+        return self.levels[-1]
+
+    def render(self, params: Optional[dict] = None, bounds: Optional[Bounds] = None, *,
+               level: Optional[int] = None) -> PreviewResult:
+        """
+        Cost surface of the viewport 'bounds' (left, bottom, right, top in the raster CRS; default:
+        the whole raster) for a scenario-style parameter dict (see scenario_params), at 'level'
+        or the finest level that fits max_cells.
+        """
+        params = scenario_params(params)
+        rows, cols = self.profile["height"], self.profile["width"]
+        if bounds is None:
+            r0, c0, r1, c1 = 0, 0, rows, cols
+        else:
+            win = from_bounds(*bounds, transform=self.transform).round_offsets().round_lengths()
+            r0, c0 = max(0, int(win.row_off)), max(0, int(win.col_off))
+            r1, c1 = min(rows, int(win.row_off + win.height)), min(cols, int(win.col_off + win.width))
+            if r1 <= r0 or c1 <= c0:
+                raise ValueError(f"Viewport {bounds} does not overlap the raster")
+        factor = level or self.level_for(r1 - r0, c1 - c0)
+        arrays = self.level_arrays(factor)
+        sl = (slice(r0 // factor, -(-r1 // factor)), slice(c0 // factor, -(-c1 // factor)))
+
+        with span("preview.render", level=factor):
+            masks = {name: (m[sl] if m is not None else None) for name, m in arrays["masks"].items()}
+            inputs = _prepare_inputs(np.asarray(arrays["slope"][sl]), np.asarray(arrays["curvature"][sl]),
+                                     np.asarray(arrays["pra_runout_combined"][sl]), masks)
+            cost = _combine_surface(inputs, _transform_layers(inputs, params["transform_params"]), params)
+        transform = self.transform * Affine.translation(sl[1].start * factor, sl[0].start * factor) * Affine.scale(factor)
+        return PreviewResult(cost, transform, factor)
+
+    def promote(self, params: Optional[dict] = None, output_path: str = config.OUTPUT_COST, workers: int = 1) -> str:
+        """Full-resolution build with the previewed parameters (create_cost_surface, no debug layers)."""
+        create_cost_surface(output_path, debug_mode=False, workers=workers, scenario=params)
+        return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the preview overview cache and time a few renders.")
+    parser.add_argument("--cache-dir", default=PREVIEW_DIR)
+    parser.add_argument("--max-cells", type=int, default=MAX_PREVIEW_CELLS)
+    args = parser.parse_args()
+
+    preview = CostPreview(cache_dir=args.cache_dir, max_cells=args.max_cells)
+    preview.build()
+    for factor in preview.levels:
+        t0 = time.perf_counter()
+        result = preview.render(level=factor)
+        print(f"[preview] Level {factor}: {result.cost.shape[1]}x{result.cost.shape[0]} cells "
+              f"in {1000 * (time.perf_counter() - t0):.1f} ms")
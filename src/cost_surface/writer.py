@@ -0,0 +1,109 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+
+from ..instrumentation import span
+
+
+def _decimate(arr: np.ndarray, profile: dict, factor: int) -> tuple[np.ndarray, dict]:
+    """Every factor-th cell in both directions, with the transform scaled to match."""
+    prof = profile.copy()
+    out = arr[::factor, ::factor]
+    prof.update(
+        width=out.shape[1],
+        height=out.shape[0],
+        transform=profile["transform"] * Affine.scale(factor),
+    )
+    for key in ("blockxsize", "blockysize", "tiled"):
+        prof.pop(key, None)
+    return out, prof
+
+
+def _write(arr: np.ndarray, path: str, profile: dict, label: Optional[str]):
+    with span("writer.write", path=path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with rasterio.open(path, "w", **profile) as dst:
+            dst.write(arr, 1)
+    if label:
+        print(f"{label} saved to {path}")
+
+
+class BackgroundWriter:
+    """
+    Writes (compresses + encodes) GeoTIFFs on worker threads while the caller keeps computing.
+    GDAL releases the GIL while encoding, so writes overlap with NumPy work.
+    At most max_pending arrays are in flight; submit() blocks beyond that (backpressure).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 4):
+        if max_workers is None:
+            max_workers = min(4, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="raster-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures: List[Future] = []
+
+    def submit(
+        self,
+        arr: np.ndarray,
+        path: str,
+        profile: dict,
+        *,
+        copy: bool = False,
+        decimate: int = 1,
+        label: Optional[str] = "Raster"
+    ) -> Future:
+        """
+        Queue arr for writing. With copy=False a read-only view is handed over and the
+        caller must not modify arr until flush(); copy=True snapshots it instead.
+        decimate > 1 writes a sampled overview (every n-th cell) instead of full resolution.
+        label=None writes silently (for callers that report the file themselves).
+        """
+        if decimate > 1:
+            arr, profile = _decimate(arr, profile, decimate)
+        if copy:
+            arr = arr.copy()
+        else:
+            arr = arr.view()
+            arr.flags.writeable = False
+
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(_write, arr, path, profile, label)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        return future
+
+    def flush(self):
+        """Wait for all queued writes; re-raise the first failure."""
+        futures, self._futures = self._futures, []
+        error: Optional[BaseException] = None
+        for f in futures:
+            exc = f.exception()
+            if exc is not None and error is None:
+                error = exc
+        if error is not None:
+            raise error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True)
+        return False
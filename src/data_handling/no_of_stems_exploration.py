@@ -1,34 +1,41 @@
-import rasterio
-import numpy as np
-import matplotlib.pyplot as plt
-
-forest_path = "data/tif/number_of_stems_ha.tif"
-
-with rasterio.open(forest_path) as src:
-    data = src.read(1, masked=True)  # read first band
-    print("Shape:", data.shape)
-    print("Data type:", data.dtype)
-    print("Min:", data.min())
-    print("Max:", data.max())
-    print("Unique values:", np.unique(data.compressed())[:20])  # first 20 unique
+import argparse
+import json
 
-hist, bin_edges = np.histogram(data.compressed(), bins=20)
-print("Histogram counts:", hist)
-print("Bin edges:", bin_edges)
-
-print("CRS:", src.crs)
-print("Transform:", src.transform)
-print("NoData value:", src.nodata)
-print("Driver:", src.driver)
+import rasterio
 
+from .raster_profile import profile_raster
 
-plt.imshow(data, cmap="Greens")
-plt.colorbar(label="Forest value")
-plt.show()
+forest_path = "data/tif/number_of_stems_ha.tif"
 
-from rasterio.plot import show
-from rasterio.sample import sample
 
-coords = [(500000, 6789000)]  # your coordinate (x, y in CRS of raster)
-for val in sample(src, coords):
-    print("Value at", coords[0], ":", val)
+def explore(path: str = forest_path, coords=((500000, 6789000),), plot_path: str = None) -> dict:
+    """Statistics of the stems raster (streamed, see raster_profile), values at coords and an optional PNG preview."""
+    report = profile_raster(path)
+    print(json.dumps({k: report.get(k) for k in ("width", "height", "dtype", "min", "max", "mean",
+                                                 "n_unique", "quantiles", "histogram", "crs", "nodata", "driver")}, indent=2))
+
+    with rasterio.open(path) as src:
+        print("Transform:", src.transform)
+        for xy, val in zip(coords, src.sample(coords)):   # x, y in the CRS of the raster
+            print("Value at", xy, ":", val)
+
+        if plot_path:
+            import matplotlib
+            matplotlib.use("Agg")   # no display needed
+            import matplotlib.pyplot as plt
+            factor = max(1, max(src.width, src.height) // 2000)   # decimated overview for large rasters
+            data = src.read(1, masked=True, out_shape=(src.height // factor, src.width // factor))
+            plt.imshow(data, cmap="Greens")
+            plt.colorbar(label="Forest value")
+            plt.savefig(plot_path, dpi=150)
+            plt.close()
+            print("Plot saved:", plot_path)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explore the number-of-stems raster.")
+    parser.add_argument("--path", default=forest_path)
+    parser.add_argument("--plot", default=None, help="save a PNG preview here")
+    args = parser.parse_args()
+    explore(args.path, plot_path=args.plot)
@@ -0,0 +1,207 @@
+import argparse
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from ..instrumentation import span
+
+OUT_JSON = "output/raster_profile.json"
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+QUANTILE_BINS = 4096     # resolution of the approximate quantiles (fraction of the value range)
+MAX_UNIQUE = 256         # unique values are counted up to this many distinct values
+CHUNK_CELLS = 1 << 22    # ~4M cells per window
+
+
+def _windows(src, chunk_cells: int = CHUNK_CELLS) -> Iterator[Window]:
+    """Full-width row strips aligned to the block height, about chunk_cells cells each."""
+    block_h = src.block_shapes[0][0]
+    rows = max(block_h, (chunk_cells // max(src.width, 1)) // block_h * block_h)
+    for r0 in range(0, src.height, rows):
+        yield Window(0, r0, src.width, min(rows, src.height - r0))
+
+
+def _map_blocks(path: str, func, workers: int, band: int = 1) -> List:
+    """func(valid values as float64) for every window, read on a thread pool (one dataset handle per thread)."""
+    local = threading.local()
+    handles = []
+
+    def read(window: Window):
+        if not hasattr(local, "src"):
+            local.src = rasterio.open(path)
+            handles.append(local.src)
+        data = local.src.read(band, window=window, masked=True)
+        values = data.compressed().astype(np.float64)
+        return func(values[np.isfinite(values)], data.size)
+
+    with rasterio.open(path) as src:
+        windows = list(_windows(src))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:   # GDAL releases the GIL while decoding
+            return list(pool.map(read, windows))
+    finally:
+        for h in handles:
+            h.close()
+
+
+def _summary(values: np.ndarray, size: int) -> dict:
+    uniq = None
+    # Cheap probe first: continuous data is not sorted in full just to find out it has too many values
+    if values.size and len(np.unique(values[:4096])) <= MAX_UNIQUE:
+        u, c = np.unique(values, return_counts=True)
+        if len(u) <= MAX_UNIQUE:
+            uniq = dict(zip(u.tolist(), c.tolist()))
+    return dict(
+        n=values.size,
+        masked=size - values.size,
+        min=float(values.min()) if values.size else math.inf,
+        max=float(values.max()) if values.size else -math.inf,
+        sum=float(values.sum()),
+        uniq=uniq,
+    )
+
+
+def _merge_unique(parts: Sequence[Optional[dict]]) -> Optional[Dict[float, int]]:
+    merged: Dict[float, int] = {}
+    for part in parts:
+        if part is None:
+            return None
+        for v, c in part.items():
+            merged[v] = merged.get(v, 0) + c
+        if len(merged) > MAX_UNIQUE:
+            return None
+    return merged
+
+
+def _quantiles_from_counts(values: np.ndarray, counts: np.ndarray, qs: Sequence[float]) -> List[float]:
+    """Exact quantiles (lower value) from a sorted value -> count table."""
+    cum = np.cumsum(counts)
+    return [float(values[np.searchsorted(cum, q * (cum[-1] - 1), side="right")]) for q in qs]
+
+
+def _quantiles_from_histogram(counts: np.ndarray, edges: np.ndarray, qs: Sequence[float]) -> List[float]:
+    """Quantiles interpolated linearly inside the histogram bin; error below one bin width."""
+    cum = np.concatenate([[0], np.cumsum(counts)])
+    out = []
+    for q in qs:
+        target = q * cum[-1]
+        i = min(int(np.searchsorted(cum, target, side="right")) - 1, len(counts) - 1)
+        frac = (target - cum[i]) / counts[i] if counts[i] else 0.0
+        out.append(float(edges[i] + frac * (edges[i + 1] - edges[i])))
+    return out
+
+
+def profile_raster(path: str, *, bins: int = 20, workers: Optional[int] = None, band: int = 1) -> dict:
+    """
+    Streaming statistics of one raster band: exact min/max/mean/std, a histogram with 'bins'
+    equal bins over [min, max], approximate quantiles (exact when there are few distinct values)
+    and unique-value counts (up to MAX_UNIQUE distinct values). Windows are read and reduced on
+    a thread pool and the partial results merged, so the raster is never fully in memory.
+    Takes two passes: min/max/sum/uniques first, then histograms and the deviation sum.
+    """
+    workers = workers or min(8, os.cpu_count() or 1)
+    with rasterio.open(path) as src:
+        report = dict(
+            path=path,
+            driver=src.driver,
+            dtype=src.dtypes[band - 1],
+            crs=src.crs.to_string() if src.crs else None,
+            width=src.width,
+            height=src.height,
+            pixel_size=[src.transform.a, src.transform.e],
+            nodata=src.nodata,
+        )
+
+    with span("raster_profile.pass1", path=path):
+        parts = _map_blocks(path, _summary, workers, band)
+    n = sum(p["n"] for p in parts)
+    report.update(cells=sum(p["n"] + p["masked"] for p in parts), valid=n, nodata_count=sum(p["masked"] for p in parts))
+    if n == 0:
+        return report
+
+    lo, hi = min(p["min"] for p in parts), max(p["max"] for p in parts)
+    mean = math.fsum(p["sum"] for p in parts) / n
+    uniq = _merge_unique([p["uniq"] for p in parts])
+    hist_range = (lo, hi) if hi > lo else (lo - 0.5, hi + 0.5)
+
+    def second_pass(values: np.ndarray, size: int):
+        return (np.histogram(values, bins=bins, range=hist_range)[0],
+                np.histogram(values, bins=QUANTILE_BINS, range=hist_range)[0],
+                float(np.sum((values - mean) ** 2)))
+
+    with span("raster_profile.pass2", path=path):
+        parts2 = _map_blocks(path, second_pass, workers, band)
+    hist = np.sum([p[0] for p in parts2], axis=0)
+    fine = np.sum([p[1] for p in parts2], axis=0)
+    std = math.sqrt(math.fsum(p[2] for p in parts2) / n)
+
+    if uniq is not None:
+        values = np.array(sorted(uniq))
+        quantiles = _quantiles_from_counts(values, np.array([uniq[v] for v in values]), QUANTILES)
+    else:
+        quantiles = _quantiles_from_histogram(fine, np.linspace(*hist_range, QUANTILE_BINS + 1), QUANTILES)
+
+    report.update(
+        min=lo,
+        max=hi,
+        mean=mean,
+        std=std,
+        quantiles={f"p{round(q * 100)}": v for q, v in zip(QUANTILES, quantiles)},
+        quantiles_exact=uniq is not None,
+        histogram=dict(counts=hist.tolist(), edges=np.linspace(*hist_range, bins + 1).tolist()),
+        n_unique=len(uniq) if uniq is not None else f">{MAX_UNIQUE}",
+        unique_counts={repr(v): c for v, c in sorted(uniq.items())} if uniq is not None else None,
+    )
+    return report
+
+
+def profile_layers(layers: Dict[str, str], *, bins: int = 20, workers: Optional[int] = None) -> Dict[str, dict]:
+    """profile_raster for every named layer; missing or unreadable files are reported, not raised."""
+    reports = {}
+    for name, path in layers.items():
+        if not path or not os.path.exists(path):
+            reports[name] = {"path": path, "error": "missing"}
+            print(f"[raster_profile] {name}: missing ({path})")
+            continue
+        try:
+            reports[name] = profile_raster(path, bins=bins, workers=workers)
+        except rasterio.errors.RasterioIOError as e:
+            reports[name] = {"path": path, "error": str(e)}
+            print(f"[raster_profile] {name}: {e}")
+            continue
+        r = reports[name]
+        print(f"[raster_profile] {name}: {r['valid']} valid cells, min {r.get('min')}, max {r.get('max')}, "
+              f"mean {r.get('mean', float('nan')):.4g}")
+    return reports
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Block-streamed statistics (min/max/mean, histogram, quantiles, unique values) of raster layers.")
+    parser.add_argument("rasters", nargs="*", help="raster files (default: config.INPUT_RASTERS and MASK_RASTERS)")
+    parser.add_argument("--out", default=OUT_JSON)
+    parser.add_argument("--bins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.rasters:
+        layers = {os.path.splitext(os.path.basename(p))[0]: p for p in args.rasters}
+    else:
+        from ..cost_surface import config
+        layers = {**config.INPUT_RASTERS, **config.MASK_RASTERS}
+
+    reports = profile_layers(layers, bins=args.bins, workers=args.workers)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(reports, f, indent=2)
+    print(f"[raster_profile] Report written to {args.out}")
+    return 1 if any("error" in r for r in reports.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
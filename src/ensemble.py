@@ -0,0 +1,201 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.transform import rowcol
+
+from .cost_surface import config
+from .cost_surface.cost_surface import _combine_surface, _load_inputs, _transform_layer, scenario_params
+from .pathfinding.buckets import dial_field, quantise_planes
+from .pathfinding.drain import drain_path
+from .pathfinding.planes import edge_planes
+from .pathfinding.walk import read_on_grid
+from .instrumentation import span
+
+Coords = Tuple[float, float]
+
+OUT_DIR = "output/ensemble"
+WEIGHT_SD = 0.25            # log-normal spread of every terrain weight
+X0_SD = {"slope": 3.0, "curvature": 0.1}   # spread of the logistic midpoints (layer units)
+K_SD = 0.2                  # log-normal spread of the logistic steepness
+TRANSFORM_VARIANTS = 4      # perturbed transforms per layer (variant 0 = config); members pick one each
+FIELDS = ["tour", "members", "reached", "stability", "mean_cost", "cost_cv"]
+
+
+class EnsembleResult(NamedTuple):
+    frequency: Dict[str, np.ndarray]   # tour -> fraction of members whose route crosses each cell
+    stability: Dict[str, dict]         # tour -> row of the stability table (see FIELDS)
+    members: List[dict]                # the perturbed scenarios
+
+
+def sample_members(
+    m: int,
+    *,
+    seed: int = 0,
+    weight_sd: float = WEIGHT_SD,
+    x0_sd: Dict[str, float] = X0_SD,
+    k_sd: float = K_SD,
+    variants: int = TRANSFORM_VARIANTS
+) -> List[dict]:
+    """
+    m perturbed scenarios (config.SCENARIOS-style dicts): terrain weights are scaled by
+    independent log-normal factors; transform parameters come from 'variants' perturbed sets
+    per layer (x0 shifted, k scaled), so transforms are shared by many members.
+    """
+    rng = np.random.default_rng(seed)
+    transform_variants = {}
+    for layer, p in config.TRANSFORM_PARAMS.items():
+        transform_variants[layer] = [dict(p)] + [
+            {"x0": float(p["x0"] + x0_sd.get(layer, 0.0) * rng.standard_normal()),
+             "k": float(p["k"] * np.exp(k_sd * rng.standard_normal()))}
+            for _ in range(variants - 1)]
+    members = []
+    for i in range(m):
+        members.append({
+            "name": f"member_{i:03d}",
+            "weights": {name: float(w * np.exp(weight_sd * rng.standard_normal()))
+                        for name, w in config.WEIGHTS_TERRAIN.items()},
+            "transform_params": {layer: v[rng.integers(len(v))] for layer, v in transform_variants.items()},
+        })
+    return members
+
+
+def _route_member(inputs: dict, layers: dict, member: dict, dem: np.ndarray, cellsize, cells: dict,
+                  lambda_weight: float) -> Dict[str, Tuple[Optional[np.ndarray], float]]:
+    """One combine, one set of edge planes, then a bucket-queue solve per tour (stops at the end cell)."""
+    with span("ensemble.combine", member=member["name"]):
+        surface = _combine_surface(inputs, layers, scenario_params(member))
+    friction = np.where(surface == config.NODATA_VALUE, np.nan, surface.astype(np.float32))
+    with span("ensemble.planes", member=member["name"]):
+        qplanes = quantise_planes(edge_planes(dem, friction, cellsize, lambda_weight))
+    routes = {}
+    for tour, (start, end) in cells.items():
+        with span("ensemble.route", member=member["name"], tour=tour):
+            cum, direction, _ = dial_field(qplanes, start, target=end)
+            if not np.isfinite(cum[end]):
+                routes[tour] = (None, float("nan"))
+                continue
+            routes[tour] = (drain_path(cum, end, direction), float(cum[end]))
+    return routes
+
+
+def run_ensemble(
+    tours: Dict[str, dict],
+    members: List[dict],
+    *,
+    dem_path: str = config.INPUT_RASTERS["dem"],
+    lambda_weight: float = 0.7,
+    workers: Optional[int] = None
+) -> EnsembleResult:
+    """
+    Route every tour on every member's cost surface. Inputs are read once and each distinct
+    layer transform is computed once, so a member costs one combine plus its solves; members
+    run on a thread pool. Returns the route frequency per tour and cell, and per tour a
+    stability score: the mean route frequency along the members' routes (1 = every member
+    takes the same route), with the mean and coefficient of variation of the route cost.
+    """
+    workers = workers or min(4, os.cpu_count() or 1)
+    with rasterio.open(config.REF_RASTER) as ref:
+        profile = ref.profile
+    transform = profile["transform"]
+    cellsize = (transform.a, transform.e)
+    cells = {name: (rowcol(transform, *t["start"]), rowcol(transform, *t["end"])) for name, t in tours.items()}
+    for name, pair in cells.items():
+        if not all(0 <= r < profile["height"] and 0 <= c < profile["width"] for r, c in pair):
+            raise ValueError(f"Tour '{name}' has a point outside the cost surface")
+
+    with span("ensemble.inputs"):
+        inputs = _load_inputs()
+        dem = read_on_grid(dem_path, profile)
+    transformed = {}
+    with span("ensemble.transforms"):
+        for member in members:
+            for layer, p in member["transform_params"].items():
+                key = (layer, json.dumps(p, sort_keys=True))
+                if key not in transformed:
+                    transformed[key] = _transform_layer(inputs, layer, p)
+    print(f"[ensemble] {len(members)} members, {len(transformed)} layer transforms, {len(tours)} tours")
+
+    def layers_of(member: dict) -> dict:
+        layers = {"pra_runout_combined": inputs["pra_runout_combined"]}
+        for layer, p in member["transform_params"].items():
+            layers[layer] = transformed[(layer, json.dumps(p, sort_keys=True))]
+        return layers
+
+    counts = {tour: np.zeros((profile["height"], profile["width"]), dtype=np.uint16) for tour in tours}
+    routes: Dict[str, List[np.ndarray]] = {tour: [] for tour in tours}
+    costs: Dict[str, List[float]] = {tour: [] for tour in tours}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ensemble") as pool:
+        futures = [pool.submit(_route_member, inputs, layers_of(m), m, dem, cellsize, cells, lambda_weight)
+                   for m in members]
+        for done, future in enumerate(as_completed(futures), start=1):
+            for tour, (path, cost) in future.result().items():
+                if path is None:
+                    continue
+                counts[tour][path[:, 0], path[:, 1]] += 1
+                routes[tour].append(path)
+                costs[tour].append(cost)
+            if done % 10 == 0 or done == len(members):
+                print(f"[ensemble] {done}/{len(members)} members routed")
+
+    frequency = {tour: c.astype(np.float32) / max(len(members), 1) for tour, c in counts.items()}
+    stability = {}
+    for tour in tours:
+        c = np.array(costs[tour])
+        along = [float(frequency[tour][p[:, 0], p[:, 1]].mean()) for p in routes[tour]]
+        stability[tour] = dict(
+            tour=tour,
+            members=len(members),
+            reached=len(routes[tour]),
+            stability=float(np.mean(along)) if along else float("nan"),
+            mean_cost=float(c.mean()) if c.size else float("nan"),
+            cost_cv=float(c.std() / c.mean()) if c.size and c.mean() > 0 else float("nan"),
+        )
+    return EnsembleResult(frequency, stability, members)
+
+
+def write_ensemble(result: EnsembleResult, out_dir: str = OUT_DIR) -> Dict[str, str]:
+    """route_frequency.tif (one float32 band per tour, named after it), stability.csv and members.json."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, name) for name in ("route_frequency.tif", "stability.csv", "members.json")}
+    with rasterio.open(config.REF_RASTER) as ref:
+        prof = ref.profile.copy()
+    prof.update(dtype="float32", count=len(result.frequency), compress="lzw", nodata=None)
+    with rasterio.open(paths["route_frequency.tif"], "w", **prof) as dst:
+        for band, (tour, freq) in enumerate(result.frequency.items(), start=1):
+            dst.write(freq, band)
+            dst.set_band_description(band, tour)
+    with open(paths["stability.csv"], "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(result.stability.values())
+    with open(paths["members.json"], "w") as f:
+        json.dump(result.members, f, indent=1)
+    for row in result.stability.values():
+        print(f"[ensemble] {row['tour']}: stability {row['stability']:.3f}, "
+              f"cost {row['mean_cost']:.1f} (cv {row['cost_cv']:.3f}), {row['reached']}/{row['members']} reached")
+    print(f"[ensemble] Outputs written to {out_dir}")
+    return paths
+
+
+if __name__ == "__main__":
+    from .main import SKITOURS
+
+    parser = argparse.ArgumentParser(description="Route all tours on an ensemble of perturbed cost surfaces.")
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--weight-sd", type=float, default=WEIGHT_SD)
+    parser.add_argument("--variants", type=int, default=TRANSFORM_VARIANTS, help="perturbed transforms per layer")
+    parser.add_argument("--lambda-weight", type=float, default=0.7)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out-dir", default=OUT_DIR)
+    args = parser.parse_args()
+
+    members = sample_members(args.members, seed=args.seed, weight_sd=args.weight_sd, variants=args.variants)
+    write_ensemble(run_ensemble(SKITOURS, members, lambda_weight=args.lambda_weight, workers=args.workers),
+                   args.out_dir)
@@ -9,6 +9,9 @@ from .pairing import list_auto_files, list_expert_files
 from .geometry import ensure_single_line, densify, sample_points
 from .metrics import (discrete_frechet, hausdorff_undirected, overlap_percentage, point_line_stats, match_score)
 from .plotting import plot_pair  
+from .profile import OUT_CSV as PROFILE_CSV, run_profiles
+from .. import instrumentation
+from ..instrumentation import span
 
 EXPERT_DIR = "data/geojson/evaluation_paths"
 AUTO_DIR   = "output/path_geojson/wgs84"
@@ -82,17 +85,23 @@ def _save_csv_row(path: str, data: Dict[str, Any], header_written: bool):
 
 def evaluate_one(auto_path: str, expert_path: str) -> Dict[str, Any]:
     # Load inputs (must be 4326), project to metric CRS
-    line_auto   = _assert_4326_and_project(auto_path, FORCE_CRS)
-    line_expert = _assert_4326_and_project(expert_path, FORCE_CRS)
+    with span("evaluation.load"):
+        line_auto   = _assert_4326_and_project(auto_path, FORCE_CRS)
+        line_expert = _assert_4326_and_project(expert_path, FORCE_CRS)
 
     # Densify + auto-coarsen if needed
-    auto_d, expt_d, used_step = _auto_coarsen(line_auto, line_expert, SAMPLE_M)
+    with span("evaluation.densify"):
+        auto_d, expt_d, used_step = _auto_coarsen(line_auto, line_expert, SAMPLE_M)
 
     # Metrics
-    a_in_b, b_in_a, mean_ov = overlap_percentage(auto_d, expt_d, BUFFER_M)
-    dF = discrete_frechet(list(auto_d.coords), list(expt_d.coords))
-    dH = hausdorff_undirected(auto_d, expt_d)
-    stats = point_line_stats(sample_points(auto_d, used_step), expt_d)
+    with span("evaluation.overlap"):
+        a_in_b, b_in_a, mean_ov = overlap_percentage(auto_d, expt_d, BUFFER_M)
+    with span("evaluation.frechet", cells=len(auto_d.coords) * len(expt_d.coords)):
+        dF = discrete_frechet(list(auto_d.coords), list(expt_d.coords))
+    with span("evaluation.hausdorff"):
+        dH = hausdorff_undirected(auto_d, expt_d)
+    with span("evaluation.pt2line"):
+        stats = point_line_stats(sample_points(auto_d, used_step), expt_d)
     score = match_score(mean_ov, dF, dH, stats["p95"], norm_scale_m=NORM_SCALE_M)
 
     return dict(
@@ -141,7 +150,8 @@ def main():
             print(f"[SKIP] No auto route for '{key}'.")
             continue
 
-        metrics = evaluate_one(auto_path, expert_path)
+        with span("evaluation.mountain", mountain=key):
+            metrics = evaluate_one(auto_path, expert_path)
 
         row = dict(
             mountain=key,
@@ -156,14 +166,22 @@ def main():
         plot_path = os.path.join(PLOT_DIR, f"{key}.png")
         auto_line_full   = _assert_4326_and_project(auto_path, FORCE_CRS)
         expert_line_full = _assert_4326_and_project(expert_path, FORCE_CRS)
-        plot_pair(plot_path, auto_line_full, expert_line_full, sample_m=metrics["sample_m"])
+        with span("evaluation.plot", mountain=key):
+            plot_pair(plot_path, auto_line_full, expert_line_full, sample_m=metrics["sample_m"])
+
+    # Terrain / avalanche exposure of every auto route, batched in one pass over the rasters
+    with span("evaluation.profiles", routes=len(autos)):
+        profile_csv = run_profiles(sorted(autos.values()), PROFILE_CSV, SAMPLE_M)
 
     print(json.dumps({
         "mountains_evaluated": n_rows,
         "csv": OUT_CSV,
+        "profiles_csv": profile_csv,
         "plot_dir": PLOT_DIR
     }, indent=2))
 
+    instrumentation.finish("evaluation")  # only when ROUTING_TRACE=1
+
 
 if __name__ == "__main__":
     main()
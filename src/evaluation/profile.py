@@ -0,0 +1,216 @@
+# src/evaluation/profile.py
+from __future__ import annotations
+import argparse
+import csv
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import geopandas as gpd
+import rasterio
+import shapely
+from rasterio.windows import Window
+from shapely.geometry import LineString, shape
+
+from ..cost_surface import config
+from ..instrumentation import span
+from .geometry import ensure_single_line
+
+SAMPLE_M = 10.0
+OUT_CSV = "output/eval/route_profiles.csv"
+
+# pra_runout_combined.tif: runout 1-7.2, release above 7.2, NoData elsewhere
+RUNOUT_RANGE = (1.0, 7.2)
+
+FIELDS = [
+    "route", "length_m",
+    "elev_start_m", "elev_end_m", "elev_min_m", "elev_max_m", "gain_m", "loss_m",
+    "max_slope_deg", "mean_slope_deg",
+    "release_m", "runout_m", "release_pct", "runout_pct",
+]
+
+
+def densify_all(lines: Sequence[LineString], step_m: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Evenly spaced stations along all lines at once (NumPy interpolation over the concatenated
+    vertex arrays, no per-line Python loop).
+    Returns station x/y (n, 2), the line index of every station and the distance along its line.
+    """
+    coords, vidx = shapely.get_coordinates(np.asarray(lines, dtype=object), return_index=True)
+    same = vidx[1:] == vidx[:-1]
+    seg = np.where(same, np.hypot(*np.diff(coords, axis=0).T), 0.0)
+    along = np.concatenate([[0.0], np.cumsum(seg)])      # monotonic over all lines
+    first = np.searchsorted(vidx, np.arange(len(lines)))
+    last = np.searchsorted(vidx, np.arange(len(lines)), side="right") - 1
+    lengths = along[last] - along[first]
+
+    counts = np.maximum(2, np.ceil(lengths / step_m).astype(np.int64) + 1)
+    idx = np.repeat(np.arange(len(lines)), counts)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    dist = (np.arange(counts.sum()) - starts[idx]) / (counts[idx] - 1) * lengths[idx]
+    pos = along[first[idx]] + dist
+    j = np.clip(np.searchsorted(along, pos, side="right") - 1, first[idx], np.maximum(last[idx] - 1, first[idx]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.nan_to_num((pos - along[j]) / seg[np.minimum(j, len(seg) - 1)])
+    nxt = np.minimum(j + 1, last[idx])
+    xy = coords[j] + np.clip(t, 0.0, 1.0)[:, None] * (coords[nxt] - coords[j])
+    return xy, idx, dist
+
+
+def sample_raster(path: str, xy: np.ndarray) -> np.ndarray:
+    """
+    Values of band 1 at many map coordinates (NaN outside or at nodata). Row/col come from the
+    inverse affine transform in one vectorized step, and only the raster blocks that contain
+    stations are read, each once.
+    """
+    out = np.full(len(xy), np.nan)
+    with rasterio.open(path) as src:
+        inv = ~src.transform
+        cols = np.floor(inv.a * xy[:, 0] + inv.b * xy[:, 1] + inv.c).astype(np.int64)
+        rows = np.floor(inv.d * xy[:, 0] + inv.e * xy[:, 1] + inv.f).astype(np.int64)
+        inside = (rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width)
+        bh, bw = src.block_shapes[0]
+        bh, bw = max(bh, 256), max(bw, 256)
+        sel = np.flatnonzero(inside)
+        block = (rows[sel] // bh) * ((src.width + bw - 1) // bw) + cols[sel] // bw
+        order = np.argsort(block, kind="stable")
+        sel, block = sel[order], block[order]
+        bounds = np.flatnonzero(np.diff(block)) + 1
+        for group in np.split(sel, bounds):
+            if group.size == 0:
+                continue
+            r0, c0 = rows[group[0]] // bh * bh, cols[group[0]] // bw * bw
+            win = Window(c0, r0, min(bw, src.width - c0), min(bh, src.height - r0))
+            data = src.read(1, window=win).astype(np.float64)
+            if src.nodata is not None:
+                data[data == src.nodata] = np.nan
+            out[group] = data[rows[group] - r0, cols[group] - c0]
+    return out
+
+
+def profile_routes(
+    lines: Sequence[LineString],
+    names: Sequence[str],
+    *,
+    dem_path: str,
+    slope_path: str,
+    pra_path: str,
+    step_m: float = SAMPLE_M
+) -> List[Dict[str, float]]:
+    """
+    Terrain and avalanche exposure per route (lines in the rasters' CRS): elevation gain/loss,
+    maximum and mean slope, and length through PRA release and runout cells.
+    All routes are densified and sampled together; segment lengths are classified at their midpoints.
+    """
+    with span("profile.densify", routes=len(lines)):
+        xy, idx, dist = densify_all(lines, step_m)
+        same = idx[1:] == idx[:-1]                 # consecutive stations on the same route = segments
+        seg_route = idx[:-1][same]
+        seg_len = np.diff(dist)[same]
+        mid = 0.5 * (xy[:-1][same] + xy[1:][same])
+    with span("profile.sample", stations=len(xy)):
+        elev = sample_raster(dem_path, xy)
+        slope = sample_raster(slope_path, xy)
+        pra = sample_raster(pra_path, mid)
+
+    n = len(lines)
+    dz = np.diff(elev)[same]
+    gain = np.bincount(seg_route, np.where(dz > 0, dz, 0.0), minlength=n)
+    loss = np.bincount(seg_route, np.where(dz < 0, -dz, 0.0), minlength=n)
+    release = np.bincount(seg_route, np.where(pra > RUNOUT_RANGE[1], seg_len, 0.0), minlength=n)
+    runout = np.bincount(seg_route, np.where((pra >= RUNOUT_RANGE[0]) & (pra <= RUNOUT_RANGE[1]), seg_len, 0.0), minlength=n)
+
+    starts = np.flatnonzero(np.concatenate([[True], idx[1:] != idx[:-1]]))
+    ends = np.concatenate([starts[1:], [len(idx)]]) - 1
+    with np.errstate(all="ignore"):
+        elev_min = np.fmin.reduceat(elev, starts)
+        elev_max = np.fmax.reduceat(elev, starts)
+        slope_max = np.fmax.reduceat(slope, starts)
+        slope_ok = np.isfinite(slope)
+        slope_mean = (np.add.reduceat(np.where(slope_ok, slope, 0.0), starts)
+                      / np.add.reduceat(slope_ok.astype(np.float64), starts))
+    lengths = np.bincount(seg_route, seg_len, minlength=n)
+
+    rows = []
+    for i in range(n):
+        length = float(lengths[i])
+        rows.append(dict(
+            route=names[i],
+            length_m=length,
+            elev_start_m=float(elev[starts[i]]),
+            elev_end_m=float(elev[ends[i]]),
+            elev_min_m=float(elev_min[i]),
+            elev_max_m=float(elev_max[i]),
+            gain_m=float(gain[i]),
+            loss_m=float(loss[i]),
+            max_slope_deg=float(slope_max[i]),
+            mean_slope_deg=float(slope_mean[i]),
+            release_m=float(release[i]),
+            runout_m=float(runout[i]),
+            release_pct=100.0 * float(release[i]) / length if length > 0 else 0.0,
+            runout_pct=100.0 * float(runout[i]) / length if length > 0 else 0.0,
+        ))
+    return rows
+
+
+def load_routes(paths: Sequence[str], target_crs) -> Tuple[List[LineString], List[str]]:
+    """
+    Routes from GeoJSON/GeoPackage files (one route per file, like the evaluator) or from
+    batch NDJSON logs (one WGS84 feature per line), reprojected to target_crs.
+    """
+    lines, names = [], []
+    for path in paths:
+        if path.endswith(".ndjson"):
+            feats = [json.loads(line) for line in open(path) if line.strip()]
+            feats = [f for f in feats if f.get("geometry")]
+            gdf = gpd.GeoDataFrame({"route": [f["properties"].get("tour", "") for f in feats]},
+                                   geometry=[shape(f["geometry"]) for f in feats], crs="EPSG:4326")
+            gdf = gdf.to_crs(target_crs)
+            lines.extend(gdf.geometry)
+            names.extend(gdf["route"])
+        else:
+            gdf = gpd.read_file(path).to_crs(target_crs)
+            lines.append(ensure_single_line(gdf))
+            names.append(os.path.splitext(os.path.basename(path))[0])
+    return lines, names
+
+
+def write_profiles(rows: List[Dict[str, float]], path: str = OUT_CSV) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+    return path
+
+
+def run_profiles(paths: Sequence[str], out_csv: str = OUT_CSV, step_m: float = SAMPLE_M) -> Optional[str]:
+    """Profile all routes in 'paths' against the configured DEM, slope and PRA/runout rasters."""
+    if not paths:
+        return None
+    with rasterio.open(config.INPUT_RASTERS["dem"]) as src:
+        crs = src.crs
+    lines, names = load_routes(paths, crs)
+    rows = profile_routes(
+        lines, names,
+        dem_path=config.INPUT_RASTERS["dem"],
+        slope_path=config.INPUT_RASTERS["slope"],
+        pra_path=config.INPUT_RASTERS["pra_runout_combined"],
+        step_m=step_m,
+    )
+    return write_profiles(rows, out_csv)
+
+
+if __name__ == "__main__":
+    from .evaluator import AUTO_DIR
+    from .pairing import list_auto_files
+
+    parser = argparse.ArgumentParser(description="Per-route terrain and avalanche exposure profiles.")
+    parser.add_argument("routes", nargs="*", help=f"route GeoJSON/GPKG files or batch NDJSON logs (default: {AUTO_DIR})")
+    parser.add_argument("--out", default=OUT_CSV)
+    parser.add_argument("--step", type=float, default=SAMPLE_M, help="sampling distance along the routes (m)")
+    args = parser.parse_args()
+
+    routes = args.routes or sorted(list_auto_files(AUTO_DIR).values())
+    print(json.dumps({"routes": len(routes), "csv": run_profiles(routes, args.out, args.step)}, indent=2))
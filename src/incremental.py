@@ -0,0 +1,118 @@
+import argparse
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.transform import rowcol
+from rasterio.windows import Window
+
+from .cost_cache import CostFieldCache, field_key
+from .cost_surface import config
+from .cost_surface.combine import clip_round
+from .pathfinding.dynamic import RepairStats, repair_field
+from .pathfinding.planes import load_planes, patch_planes
+from .pathfinding.walk import WALK_COEFFS, SLOPE_FACTOR, read_on_grid
+from .instrumentation import span
+
+Coords = Tuple[float, float]
+
+
+def apply_cost_edit(cost_surface_path: str, values: np.ndarray, window: Window):
+    """
+    Overwrite one window of the cost surface in place (the rest of the file is untouched).
+    Values are rounded and clipped to [MIN_COST, MAX_COST] like the full build; NaN marks nodata.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape != (int(window.height), int(window.width)):
+        raise ValueError(f"Edit values have shape {values.shape}, window is {int(window.height)}x{int(window.width)}")
+    nodata = np.isnan(values)
+    cost = clip_round(np.where(nodata, config.MIN_COST, values), min_cost=config.MIN_COST, max_cost=config.MAX_COST)
+    cost[nodata] = config.NODATA_VALUE
+    with rasterio.open(cost_surface_path, "r+") as dst:
+        dst.write(cost, 1, window=window)
+
+
+def reroute_after_edit(
+    cost_surface_path: str,
+    dem_path: str,
+    values: np.ndarray,
+    window: Window,
+    sources: Iterable[Coords],
+    *,
+    lambda_weight: float,
+    cache: CostFieldCache,
+    solver: str = "planes"
+) -> Dict[Coords, RepairStats]:
+    """
+    Apply a local cost edit and repair the cached cost fields of 'sources' instead of solving again.
+    Only fields of the edge-plane solvers ("planes" or "dial") are repaired: the repair uses the
+    same step costs, whereas r.walk fields come from GRASS and would end up half r.walk, half
+    approximation (they are left for a normal solve, as are sources without a cached field).
+    Dial fields are repaired with float step costs, within dial's quantisation error.
+    Repaired fields are stored under the solver's key of the edited cost surface, so the next
+    run_routing_for_tour(..., solver=solver, cache=cache) picks them up.
+    """
+    if solver not in ("planes", "dial"):
+        raise ValueError(f"Only 'planes' and 'dial' fields can be repaired, got solver '{solver}'")
+    coeffs = WALK_COEFFS + (SLOPE_FACTOR,)
+    with rasterio.open(cost_surface_path) as src:
+        profile = src.profile
+    transform = profile["transform"]
+
+    # Look up the fields before the edit changes the cost surface hash
+    fields = {}
+    for coords in dict.fromkeys(sources):
+        cell = rowcol(transform, *coords)
+        cached = cache.get(field_key(dem_path, cost_surface_path, lambda_weight, coeffs, cell, solver=solver))
+        if cached is None or cached[1].size == 0:
+            print(f"[incremental] No cached {solver} field for {coords}, it will be solved from scratch")
+            continue
+        fields[coords] = (cell, np.array(cached[0]), np.array(cached[1]))
+    # Pre-edit edge planes, if cached: patched around the window in a copy-on-write map (no new file)
+    planes = load_planes(dem_path, cost_surface_path, lambda_weight, build=False, mmap_mode="c") if fields else None
+
+    print(f"[incremental] Writing edited window {window} to {cost_surface_path}")
+    apply_cost_edit(cost_surface_path, values, window)
+    if not fields:
+        return {}
+
+    dem = read_on_grid(dem_path, profile)
+    friction = read_on_grid(cost_surface_path, profile)
+    if planes is not None:
+        with span("incremental.planes"):
+            planes = patch_planes(planes, dem, friction, window, (transform.a, transform.e), lambda_weight)
+    stats = {}
+    for coords, (cell, cum, direction) in fields.items():
+        with span("incremental.repair", source=str(coords)):
+            cum, direction, stats[coords] = repair_field(
+                cum, direction, dem, friction, window, (transform.a, transform.e), lambda_weight, planes=planes
+            )
+        cache.put(field_key(dem_path, cost_surface_path, lambda_weight, coeffs, cell, solver=solver), cum, direction)
+        print(f"[incremental] Repaired field from {coords}: {stats[coords].settled} cells re-settled, "
+              f"{stats[coords].changed} changed")
+    return stats
+
+
+if __name__ == "__main__":
+    from .main import SKITOURS
+
+    parser = argparse.ArgumentParser(description="Close or open a window of the cost surface and repair cached cost fields.")
+    parser.add_argument("--window", type=int, nargs=4, metavar=("ROW", "COL", "HEIGHT", "WIDTH"), required=True)
+    parser.add_argument("--value", type=float, default=config.BARRIER_VALUE,
+                        help=f"new cost inside the window (default: barrier {config.BARRIER_VALUE})")
+    parser.add_argument("--lambda-weight", type=float, default=0.7)
+    parser.add_argument("--solver", choices=("planes", "dial"), default="planes", help="solver whose cached fields are repaired")
+    args = parser.parse_args()
+
+    row, col, height, width = args.window
+    points = [p for t in SKITOURS.values() for p in (t["start"], t["end"])]
+    reroute_after_edit(
+        config.OUTPUT_COST,
+        config.INPUT_RASTERS["dem"],
+        np.full((height, width), args.value),
+        Window(col, row, width, height),
+        points,
+        lambda_weight=args.lambda_weight,
+        cache=CostFieldCache(),
+        solver=args.solver,
+    )
@@ -0,0 +1,243 @@
+"""
+Lightweight per-stage instrumentation.
+
+    with span("r.walk", tour=name):
+        ...
+
+    @traced("create_cost_surface")
+    def create_cost_surface(...): ...
+
+Spans record wall time, the CPU time of the calling thread, RSS at entry and exit plus
+the peak sampled in between (needs psutil). Child-process CPU (GRASS modules) and bytes
+read/written can only be measured for the whole process, so those fields are prefixed
+"process_": with spans open on several threads they include the others' work.
+Enable with ROUTING_TRACE=1 (or enable()); when disabled, span() returns a shared no-op
+context manager.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+    _proc = psutil.Process()
+except ImportError:
+    psutil = None
+    _proc = None
+
+TRACE_DIR = "output/trace"
+
+_enabled = os.environ.get("ROUTING_TRACE", "") not in ("", "0")
+_events: List[dict] = []
+_lock = threading.Lock()
+_t0 = time.perf_counter()
+_NULL = contextlib.nullcontext()
+RSS_SAMPLE_S = 0.01       # RSS sampling interval while spans are open
+_open: set = set()
+_wake = threading.Event()
+_sampler: Optional[threading.Thread] = None
+
+
+def enable(flag: bool = True):
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _events.clear()
+
+
+def events() -> List[dict]:
+    with _lock:
+        return list(_events)
+
+
+def _child_cpu_s() -> float:
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+def _rss() -> Optional[int]:
+    if _proc is None:
+        return None
+    try:
+        return _proc.memory_info().rss
+    except psutil.Error:
+        return None
+
+
+def _sample_rss():
+    """Background thread: raise the peak of every open span to the current RSS."""
+    while True:
+        _wake.wait()
+        rss = _rss()
+        with _lock:
+            if not _open:
+                _wake.clear()
+                continue
+            for s in _open if rss is not None else ():
+                s._peak = max(s._peak, rss)
+        time.sleep(RSS_SAMPLE_S)
+
+
+def _open_span(s: "_Span"):
+    global _sampler
+    with _lock:
+        _open.add(s)
+        if _sampler is None and _proc is not None:
+            _sampler = threading.Thread(target=_sample_rss, name="rss-sampler", daemon=True)
+            _sampler.start()
+    _wake.set()
+
+
+def _io_bytes() -> Optional[tuple]:
+    if _proc is None:
+        return None
+    try:
+        io = _proc.io_counters()   # not available on macOS
+    except (AttributeError, NotImplementedError, psutil.Error):
+        return None
+    return io.read_bytes, io.write_bytes
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "_wall", "_cpu", "_child_cpu", "_io", "_rss", "_peak")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self._io = _io_bytes()
+        self._rss = self._peak = _rss()
+        if self._rss is not None:
+            _open_span(self)
+        self._child_cpu = _child_cpu_s()
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        cpu = time.thread_time() - self._cpu
+        event = {
+            "name": self.name,
+            "start_s": self._wall - _t0,
+            "wall_s": end - self._wall,
+            "cpu_s": cpu,
+            "process_child_cpu_s": _child_cpu_s() - self._child_cpu,
+            "thread": threading.get_ident(),
+            "attrs": self.attrs,
+        }
+        if self._rss is not None:
+            rss = _rss()
+            with _lock:
+                _open.discard(self)
+            if rss is not None:
+                event["rss_mb"] = rss / 1e6
+                event["rss_delta_mb"] = (rss - self._rss) / 1e6
+                event["peak_rss_mb"] = max(self._peak, rss) / 1e6
+        io = _io_bytes()
+        if io is not None and self._io is not None:
+            event["process_read_bytes"] = io[0] - self._io[0]
+            event["process_write_bytes"] = io[1] - self._io[1]
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        with _lock:
+            _events.append(event)
+        return False
+
+
+def span(name: str, **attrs):
+    """Context manager timing one stage; a no-op when instrumentation is disabled."""
+    if not _enabled:
+        return _NULL
+    return _Span(name, attrs)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator version of span(); the span is named after the function by default."""
+    def decorator(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(label, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_chrome_trace(path: str) -> str:
+    """Write recorded spans in Chrome trace format (load in chrome://tracing or Perfetto)."""
+    pid = os.getpid()
+    trace = []
+    for e in events():
+        args = {k: v for k, v in e.items() if k not in ("name", "start_s", "wall_s", "thread", "attrs")}
+        args.update(e["attrs"])
+        trace.append({
+            "name": e["name"], "ph": "X", "pid": pid, "tid": e["thread"],
+            "ts": e["start_s"] * 1e6, "dur": e["wall_s"] * 1e6, "args": args,
+        })
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def summary() -> List[Dict[str, float]]:
+    """
+    Aggregate spans per name: count, total/max wall, thread CPU, largest RSS peak and growth,
+    and the process-wide child CPU and I/O.
+    """
+    rows: Dict[str, dict] = {}
+    for e in events():
+        r = rows.setdefault(e["name"], {"name": e["name"], "count": 0, "wall_s": 0.0, "max_wall_s": 0.0,
+                                        "cpu_s": 0.0, "peak_rss_mb": 0.0, "max_rss_delta_mb": 0.0,
+                                        "process_child_cpu_s": 0.0, "process_read_mb": 0.0,
+                                        "process_write_mb": 0.0})
+        r["count"] += 1
+        r["wall_s"] += e["wall_s"]
+        r["max_wall_s"] = max(r["max_wall_s"], e["wall_s"])
+        r["cpu_s"] += e["cpu_s"]
+        r["peak_rss_mb"] = max(r["peak_rss_mb"], e.get("peak_rss_mb", 0.0))
+        r["max_rss_delta_mb"] = max(r["max_rss_delta_mb"], e.get("rss_delta_mb", 0.0))
+        r["process_child_cpu_s"] += e["process_child_cpu_s"]
+        r["process_read_mb"] += e.get("process_read_bytes", 0) / 1e6
+        r["process_write_mb"] += e.get("process_write_bytes", 0) / 1e6
+    return sorted(rows.values(), key=lambda r: -r["wall_s"])
+
+
+def format_summary() -> str:
+    lines = [f"{'stage':<36}{'n':>5}{'wall s':>10}{'max s':>9}{'cpu s':>9}{'peak MB':>9}{'+rss MB':>9}"
+             f"{'proc child s':>13}{'proc rd MB':>11}{'proc wr MB':>11}"]
+    for r in summary():
+        lines.append(f"{r['name']:<36}{r['count']:>5}{r['wall_s']:>10.3f}{r['max_wall_s']:>9.3f}{r['cpu_s']:>9.3f}"
+                     f"{r['peak_rss_mb']:>9.1f}{r['max_rss_delta_mb']:>9.1f}{r['process_child_cpu_s']:>13.3f}"
+                     f"{r['process_read_mb']:>11.1f}{r['process_write_mb']:>11.1f}")
+    lines.append("cpu s: calling thread only; peak/+rss: process RSS while the span was open; proc: whole process")
+    return "\n".join(lines)
+
+
+def finish(basename: str, out_dir: str = TRACE_DIR) -> Optional[str]:
+    """If enabled: write <basename>.json (Chrome trace) and <basename>_summary.json, print the table."""
+    if not _enabled or not events():
+        return None
+    trace_path = export_chrome_trace(os.path.join(out_dir, f"{basename}.json"))
+    with open(os.path.join(out_dir, f"{basename}_summary.json"), "w") as f:
+        json.dump(summary(), f, indent=2)
+    print("\n=== Stage timings ===")
+    print(format_summary())
+    print(f"Trace written to {trace_path}")
+    return trace_path
@@ -1,9 +1,11 @@
 import os
-import geopandas as gpd
 
 from .cost_surface import config
 from .cost_surface.cost_surface import create_cost_surface
 from .routing import init_grass, run_routing_for_tour
+from .cost_cache import CostFieldCache
+from . import instrumentation
+from .instrumentation import span
 
 SKITOURS = {
     "Kyrkjetaket": {
@@ -32,73 +34,78 @@ SKITOURS = {
     } 
 }
 
-def _safe_slug(name: str) -> str:
-    s = "".join(ch if ch.isalnum() or ch in "_-" else "_" for ch in name.lower())
-    if s and s[0].isdigit():
-        s = "_" + s
-    return s
-
-
-# Load a native-CRS GeoJSON, reproject to EPSG:4326 (WGS84), save as .geojson
-def export_wgs84_geojson(native_geojson_path: str, out_dir: str, out_basename: str) -> str:
-    os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, f"{out_basename}.geojson")
-    gdf = gpd.read_file(native_geojson_path)
-    gdf_wgs84 = gdf.to_crs("EPSG:4326")
-    gdf_wgs84.to_file(out_path, driver="GeoJSON")
-    return out_path
-
-
-def main():
-    # 1) Build/refresh cost surface once
-    print("=== Building cost surface ===")
-    create_cost_surface(config.OUTPUT_COST, debug_mode=True)
-
-    # 2) Init GRASS once
+def route_tours(
+    tours: dict = SKITOURS,
+    *,
+    dem_path: str = config.INPUT_RASTERS["dem"],
+    cost_surface_path: str = config.OUTPUT_COST,
+    output_dir: str = "output",
+    lambda_weight: float = 0.7,          # movement vs friction
+    smooth_threshold: float = 7.5,       # more/less generalization (1: little generalization, 100: VERY much generalization)
+    corridor_mode: str = "near_optimal", # keep only cells within corridor_slack of the optimal cost
+    corridor_slack: float = 0.05,
+    path_method: str = "gradient",       # sub-pixel path instead of r.drain stair steps
+    cost_band=1                          # band (or scenario name) of a multi-band cost surface stack
+) -> dict:
+    """Route every tour on an existing cost surface; returns the output files per tour."""
     print("\n=== Initializing GRASS ===")
     init_grass()
 
-    # 3) Loop over tours and run routing
+    # Loop over tours and run routing (cost fields are reused across tours and runs)
     print("\n=== Routing tours ===")
     final_outputs = {}
+    cache = CostFieldCache()
+    gpkg_path = os.path.join(output_dir, "paths.gpkg")   # all tours in one GeoPackage
+    if os.path.exists(gpkg_path):
+        os.remove(gpkg_path)
 
-    for tour_name, pts in SKITOURS.items():
+    for tour_name, pts in tours.items():
         print(f"\n--- Tour: {tour_name} ---")
-        res = run_routing_for_tour(
-            tour_name,
-            start_coords=pts["start"],
-            end_coords=pts["end"],
-            dem_path=config.INPUT_RASTERS["dem"],
-            cost_surface_path=config.OUTPUT_COST,
-            lambda_weight=0.7,           # movement vs friction
-            smooth_threshold=7.5,       # more/less generalization (1: little generalization, 100: VERY much generalization)
-            output_dir="output"
-        )
+        with span("routing.tour", tour=tour_name):
+            res = run_routing_for_tour(
+                tour_name,
+                start_coords=tuple(pts["start"]),
+                end_coords=tuple(pts["end"]),
+                dem_path=dem_path,
+                cost_surface_path=cost_surface_path,
+                lambda_weight=lambda_weight,
+                smooth_threshold=smooth_threshold,
+                output_dir=output_dir,
+                corridor_mode=corridor_mode,
+                corridor_slack=corridor_slack,
+                path_method=path_method,
+                cache=cache,
+                gpkg_path=gpkg_path,
+                cost_band=cost_band
+            )
 
-        # 4) Convert native-CRS GeoJSON to WGS84
-        slug = _safe_slug(tour_name)
-        tour_out_dir = os.path.join("output", slug)
-        wgs84_geojson = export_wgs84_geojson(
-            native_geojson_path=res["path_geojson_native"],
-            out_dir=os.path.join("output", "path_geojson/wgs84"),
-            out_basename=f"{slug}_path_wgs84"
-        )
-
-        # Collect paths for summary
+        # Collect paths for summary (WGS84 GeoJSON is written in memory by the routing)
         final_outputs[tour_name] = {
-            "corridor_tif": res["corridor_tif"],
+            "corridor_tif": res.get("corridor_tif"),
             "path_shapefile": res["path_shapefile"],
             "path_geojson_native": res["path_geojson_native"],
-            "path_geojson_wgs84": wgs84_geojson,
+            "path_geojson_wgs84": res["path_geojson_wgs84"],
         }
+    return final_outputs
+
 
-    # 5) Print a mini summary
+def main():
+    # 1) Build/refresh cost surface once
+    print("=== Building cost surface ===")
+    create_cost_surface(config.OUTPUT_COST, debug_mode=True)
+
+    # 2) + 3) Init GRASS once and route all tours
+    final_outputs = route_tours(SKITOURS)
+
+    # 4) Print a mini summary
     print("\n=== Done. Outputs ===")
     for tour_name, paths in final_outputs.items():
         print(f"\n[{tour_name}]")
         for k, v in paths.items():
             print(f"  {k}: {v}")
 
+    instrumentation.finish("main")  # only when ROUTING_TRACE=1
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
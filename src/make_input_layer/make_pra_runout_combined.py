@@ -63,38 +63,50 @@ def runout_scaled_cauchy(arr, mask, out_min=1.0, out_max=7.2, a=0.30, b=1.6, c=0
     return out
 
 
-with rasterio.open(travel_angle_path) as ta_src, \
-     rasterio.open(pra_raw_path)      as pra_src, \
-     rasterio.open(pra_binary_path)   as bin_src:
+def make_pra_runout_combined(
+    travel_angle_path: str = travel_angle_path,
+    pra_raw_path: str = pra_raw_path,
+    pra_binary_path: str = pra_binary_path,
+    output_path: str = output_path
+) -> str:
+    """Combine PRA release (scaled to [7.2, 99]) and runout (scaled to [1, 7.2]) into one raster."""
+    with rasterio.open(travel_angle_path) as ta_src, \
+         rasterio.open(pra_raw_path)      as pra_src, \
+         rasterio.open(pra_binary_path)   as bin_src:
 
-    travel_angle = ta_src.read(1)
-    pra_raw      = pra_src.read(1)
-    pra_bin      = bin_src.read(1)
+        travel_angle = ta_src.read(1)
+        pra_raw      = pra_src.read(1)
+        pra_bin      = bin_src.read(1)
 
-    # Release where PRA_binary == 1 (treat everything else as NOT release)
-    is_release = (pra_bin == 1)
+        # Release where PRA_binary == 1 (treat everything else as NOT release)
+        is_release = (pra_bin == 1)
 
-    # Runout: not release AND travel_angle > 0
-    is_runout = (~is_release) & (travel_angle > 0)
+        # Runout: not release AND travel_angle > 0
+        is_runout = (~is_release) & (travel_angle > 0)
 
-    # Start with all NoData
-    out = np.full(travel_angle.shape, OUTPUT_NODATA, dtype=np.float32)
+        # Start with all NoData
+        out = np.full(travel_angle.shape, OUTPUT_NODATA, dtype=np.float32)
 
-    # 1) Write scaled PRA_raw on release cells -> [7.2, 99]
-    pra_scaled = rescale_on_mask_linear(pra_raw, is_release, RELEASE_MIN, RELEASE_MAX)
-    out[is_release] = pra_scaled[is_release]
+        # 1) Write scaled PRA_raw on release cells -> [7.2, 99]
+        pra_scaled = rescale_on_mask_linear(pra_raw, is_release, RELEASE_MIN, RELEASE_MAX)
+        out[is_release] = pra_scaled[is_release]
 
-    # 2) Write scaled travel_angle on runout cells -> [1, 7.2]
-    ta_scaled = runout_scaled_cauchy(travel_angle, is_runout, RUNOUT_MIN, RUNOUT_MAX)
-    out[is_runout] = ta_scaled[is_runout]
+        # 2) Write scaled travel_angle on runout cells -> [1, 7.2]
+        ta_scaled = runout_scaled_cauchy(travel_angle, is_runout, RUNOUT_MIN, RUNOUT_MAX)
+        out[is_runout] = ta_scaled[is_runout]
 
-    # 3) Elsewhere stays OUTPUT_NODATA (no release and travel_angle == 0)
+        # 3) Elsewhere stays OUTPUT_NODATA (no release and travel_angle == 0)
 
-    # Write output (copy georeferencing from PRA_raw)
-    meta = pra_src.meta.copy()
-    meta.update(dtype="float32", count=1, compress="lzw", nodata=OUTPUT_NODATA)
+        # Write output (copy georeferencing from PRA_raw)
+        meta = pra_src.meta.copy()
+        meta.update(dtype="float32", count=1, compress="lzw", nodata=OUTPUT_NODATA)
 
-    with rasterio.open(output_path, "w", **meta) as dst:
-        dst.write(out, 1)
+        with rasterio.open(output_path, "w", **meta) as dst:
+            dst.write(out, 1)
 
-print("Raster saved:", output_path)
+    print("Raster saved:", output_path)
+    return output_path
+
+
+if __name__ == "__main__":
+    make_pra_runout_combined()
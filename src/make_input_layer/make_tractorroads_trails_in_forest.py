@@ -10,24 +10,35 @@ output_path       = "data/tif/tractorroads_trails_in_forest.tif"
 OUTPUT_NODATA = -9999.0
 
 
-with rasterio.open(tractorroads_trails_path) as tt_src, \
-     rasterio.open(forest_path)      as for_src:
-    
-    tractorroads_trails = tt_src.read(1)
-    forest      = for_src.read(1)
-
-    # Start with all NoData
-    out = np.full(tractorroads_trails.shape, OUTPUT_NODATA, dtype=np.float32)
-    
-    # Get value of the tractor roads/trails where forest not NoData
-    mask = (forest == 1)
-    out[mask] = tractorroads_trails[mask]
-
-    # Write output (copy georeferencing from PRA_raw)
-    meta = tt_src.meta.copy()
-    meta.update(dtype="float32", count=1, compress="lzw", nodata=OUTPUT_NODATA)
-
-    with rasterio.open(output_path, "w", **meta) as dst:
-        dst.write(out, 1)
-
-print("Raster saved:", output_path)
+def make_tractorroads_trails_in_forest(
+    tractorroads_trails_path: str = tractorroads_trails_path,
+    forest_path: str = forest_path,
+    output_path: str = output_path
+) -> str:
+    """Keep tractor roads/trails only where they run through forest."""
+    with rasterio.open(tractorroads_trails_path) as tt_src, \
+         rasterio.open(forest_path)      as for_src:
+
+        tractorroads_trails = tt_src.read(1)
+        forest      = for_src.read(1)
+
+        # Start with all NoData
+        out = np.full(tractorroads_trails.shape, OUTPUT_NODATA, dtype=np.float32)
+
+        # Get value of the tractor roads/trails where forest not NoData
+        mask = (forest == 1)
+        out[mask] = tractorroads_trails[mask]
+
+        # Write output (copy georeferencing from PRA_raw)
+        meta = tt_src.meta.copy()
+        meta.update(dtype="float32", count=1, compress="lzw", nodata=OUTPUT_NODATA)
+
+        with rasterio.open(output_path, "w", **meta) as dst:
+            dst.write(out, 1)
+
+    print("Raster saved:", output_path)
+    return output_path
+
+
+if __name__ == "__main__":
+    make_tractorroads_trails_in_forest()
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+import shapely
+import geopandas as gpd
+from pyproj import CRS, Transformer
+from shapely.geometry import LineString
+
+WGS84 = "EPSG:4326"
+
+
+@lru_cache(maxsize=8)
+def _transformer(src_crs: str, dst_crs: str) -> Transformer:
+    return Transformer.from_crs(CRS.from_user_input(src_crs), CRS.from_user_input(dst_crs), always_xy=True)
+
+
+def smooth_path(line: LineString, threshold: float) -> LineString:
+    """Douglas-Peucker generalization, same threshold semantics as v.generalize method=douglas."""
+    if threshold <= 0:
+        return line
+    return line.simplify(threshold, preserve_topology=False)
+
+
+def to_wgs84(line: LineString, crs) -> LineString:
+    """Reproject a line to EPSG:4326 with one vectorized pyproj call."""
+    tf = _transformer(CRS.from_user_input(crs).to_wkt(), WGS84)
+    return shapely.transform(line, lambda xy: np.column_stack(tf.transform(xy[:, 0], xy[:, 1])))
+
+
+def _delete_tour(gpkg_path: str, layer: str, tour_name: str):
+    """Remove earlier rows of a tour from a GeoPackage layer (a GeoPackage is an SQLite database)."""
+    with sqlite3.connect(gpkg_path) as con:
+        if con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (layer,)).fetchone():
+            con.execute(f'DELETE FROM "{layer}" WHERE tour = ?', (tour_name,))
+    con.close()
+
+
+def write_path_outputs(
+    line: LineString,
+    crs,
+    *,
+    tour_name: str,
+    path_shp: Optional[str] = None,
+    path_geojson: Optional[str] = None,
+    path_geojson_wgs84: Optional[str] = None,
+    gpkg_path: Optional[str] = None
+) -> Dict[str, str]:
+    """
+    Write one in-memory path (native CRS) to every requested format.
+    With gpkg_path the tour is appended to the 'paths' (native) and 'paths_wgs84' layers,
+    replacing earlier rows of the same tour (so a re-run after a crash adds no duplicates).
+    Returns the written paths.
+    """
+    written = {}
+    native = gpd.GeoDataFrame({"tour": [tour_name]}, geometry=[line], crs=crs)
+    wgs84 = None
+    if path_geojson_wgs84 or gpkg_path:
+        wgs84 = gpd.GeoDataFrame({"tour": [tour_name]}, geometry=[to_wgs84(line, crs)], crs=WGS84)
+
+    for key, path, gdf, driver in (
+        ("path_shapefile", path_shp, native, "ESRI Shapefile"),
+        ("path_geojson_native", path_geojson, native, "GeoJSON"),
+        ("path_geojson_wgs84", path_geojson_wgs84, wgs84, "GeoJSON"),
+    ):
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            gdf.to_file(path, driver=driver)
+            written[key] = path
+
+    if gpkg_path:
+        os.makedirs(os.path.dirname(gpkg_path) or ".", exist_ok=True)
+        mode = "a" if os.path.exists(gpkg_path) else "w"
+        if mode == "a":
+            for layer in ("paths", "paths_wgs84"):
+                _delete_tour(gpkg_path, layer, tour_name)
+        native.to_file(gpkg_path, layer="paths", driver="GPKG", mode=mode)
+        wgs84.to_file(gpkg_path, layer="paths_wgs84", driver="GPKG", mode="a")
+        written["path_gpkg"] = gpkg_path
+    return written
+
+
+def write_route_set(
+    lines: List[LineString],
+    crs,
+    properties: Dict[str, list],
+    *,
+    path_geojson: Optional[str] = None,
+    path_geojson_wgs84: Optional[str] = None
+) -> Dict[str, str]:
+    """Write several routes (one feature each, with per-route properties) as native and/or WGS84 GeoJSON."""
+    written = {}
+    for key, path, to_crs in (("geojson_native", path_geojson, None), ("geojson_wgs84", path_geojson_wgs84, WGS84)):
+        if not path:
+            continue
+        geoms = lines if to_crs is None else [to_wgs84(line, crs) for line in lines]
+        gdf = gpd.GeoDataFrame(dict(properties), geometry=geoms, crs=crs if to_crs is None else to_crs)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        gdf.to_file(path, driver="GeoJSON")
+        written[key] = path
+    return written
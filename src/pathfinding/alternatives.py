@@ -0,0 +1,144 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy import ndimage
+
+from .drain import NEIGHBOURS, drain_path
+
+
+class Alternative(NamedTuple):
+    cells: np.ndarray        # (n, 2) (row, col) cells from start to end
+    cost: float              # cum_start + cum_end at the via cell (= cost of the whole route)
+    via: Tuple[int, int]     # cell the route is forced through
+    dissimilarity: float     # share of the route away from every better alternative (1.0 for the first)
+
+
+def _descent_parent(cum: np.ndarray) -> np.ndarray:
+    """Index (into NEIGHBOURS) of the lowest neighbour of every cell, -1 where no neighbour is lower."""
+    rows, cols = cum.shape
+    padded = np.pad(np.where(np.isfinite(cum), cum, np.inf), 1, constant_values=np.inf)
+    stack = np.stack([padded[1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols] for dr, dc in NEIGHBOURS])
+    best = np.argmin(stack, axis=0)
+    lower = np.take_along_axis(stack, best[None], axis=0)[0] < cum
+    return np.where(lower, best, -1)
+
+
+def _plateaus(cum_start: np.ndarray, cum_end: np.ndarray) -> np.ndarray:
+    """
+    Cells on a plateau: the step towards the start and the step towards the end are
+    exact opposites of each other's tree edges, i.e. both shortest-path trees share them.
+    """
+    rows, cols = cum_start.shape
+    ps, pe = _descent_parent(cum_start), _descent_parent(cum_end)
+    r, c = np.mgrid[:rows, :cols]
+    plateau = np.zeros(cum_start.shape, dtype=bool)
+    for k, (dr, dc) in enumerate(NEIGHBOURS):
+        # v -> u is a start-tree edge; it is shared if u's end-tree parent is v
+        opposite = NEIGHBOURS.index((-dr, -dc))
+        ur, uc = r + dr, c + dc
+        inside = (ur >= 0) & (ur < rows) & (uc >= 0) & (uc < cols)
+        shared = (ps == k) & inside
+        shared[shared] = pe[ur[shared], uc[shared]] == opposite
+        plateau |= shared
+    return plateau
+
+
+def _dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    if radius <= 0:
+        return mask
+    return ndimage.binary_dilation(mask, structure=np.ones((3, 3), bool), iterations=radius)
+
+
+def _route_through(
+    cum_start: np.ndarray,
+    cum_end: np.ndarray,
+    via: Tuple[int, int],
+    dir_start: Optional[np.ndarray],
+    dir_end: Optional[np.ndarray]
+) -> Tuple[np.ndarray, int]:
+    """Cells start -> via -> end, and the index where the via -> end half begins."""
+    to_start = drain_path(cum_start, via, dir_start)
+    to_end = drain_path(cum_end, via, dir_end)
+    return np.concatenate([to_start[::-1], to_end[1:]]), len(to_start)
+
+
+def alternative_routes(
+    cum_start: np.ndarray,
+    cum_end: np.ndarray,
+    k: int = 3,
+    *,
+    slack: float = 0.15,
+    min_dissimilarity: float = 0.3,
+    tolerance: int = 2,
+    dir_start: Optional[np.ndarray] = None,
+    dir_end: Optional[np.ndarray] = None,
+    max_candidates: int = 500
+) -> List[Alternative]:
+    """
+    Up to k meaningfully different routes from the two fields already used for the corridor
+    (via-node / plateau method, no extra cost-distance solves). Candidate via cells lie in the
+    band cum_start + cum_end <= (1 + slack) * optimum; cells on long plateaus (stretches both
+    shortest-path trees share) are tried first, then the remaining band cells by cost.
+    A route is kept when at least min_dissimilarity of its cells are more than 'tolerance'
+    cells away from every route kept before it. The first route is the optimum.
+    """
+    total = cum_start.astype(np.float64) + cum_end.astype(np.float64)
+    valid = np.isfinite(total)
+    if not valid.any():
+        raise ValueError("No cell is reachable from both start and end")
+    optimum = float(total[valid].min())
+    band = valid & (total <= optimum * (1.0 + slack))
+
+    # Work inside the band's bounding box (plus the tolerance margin)
+    rows = np.flatnonzero(band.any(axis=1))
+    cols = np.flatnonzero(band.any(axis=0))
+    r0, r1 = max(0, rows[0] - tolerance), min(total.shape[0], rows[-1] + tolerance + 1)
+    c0, c1 = max(0, cols[0] - tolerance), min(total.shape[1], cols[-1] + tolerance + 1)
+    win = (slice(r0, r1), slice(c0, c1))
+    band_w, total_w = band[win], total[win]
+
+    # Candidate order: one via cell (the cheapest) per plateau, longest plateaus first, then the rest by cost
+    labels, n = ndimage.label(_plateaus(cum_start[win], cum_end[win]) & band_w, structure=np.ones((3, 3)))
+    candidates = []
+    if n:
+        sizes = np.bincount(labels.ravel())[1:]
+        vias = ndimage.minimum_position(total_w, labels, index=np.arange(1, n + 1))
+        candidates = [vias[i] for i in np.argsort(-sizes, kind="stable") if sizes[i] > tolerance]
+    br, bc = np.nonzero(band_w)
+    by_cost = np.argsort(total_w[br, bc], kind="stable")
+    candidates = [tuple(np.unravel_index(np.argmin(np.where(band_w, total_w, np.inf)), total_w.shape))] + \
+        candidates + list(zip(br[by_cost], bc[by_cost]))
+
+    routes: List[Alternative] = []
+    masks: List[np.ndarray] = []
+    blocked = np.zeros(band_w.shape, dtype=bool)
+    for tried, (vr, vc) in enumerate(candidates):
+        if len(routes) >= k or tried >= max_candidates:
+            break
+        if blocked[vr, vc]:
+            continue
+        via = (int(vr) + r0, int(vc) + c0)
+        cells, split = _route_through(cum_start, cum_end, via, dir_start, dir_end)
+        lr, lc = cells[:, 0] - r0, cells[:, 1] - c0
+        inside = (lr >= 0) & (lr < band_w.shape[0]) & (lc >= 0) & (lc < band_w.shape[1])
+        # Reject detours that walk out to the via cell and back the same way
+        first = np.zeros(band_w.shape, dtype=bool)
+        first[lr[:split][inside[:split]], lc[:split][inside[:split]]] = True
+        back = inside.copy()
+        back[:split] = False
+        if np.count_nonzero(_dilate(first, tolerance)[lr[back], lc[back]]) > 2 * tolerance + 1:
+            blocked[vr, vc] = True
+            continue
+        dissimilarity = 1.0
+        for m in masks:
+            shared = np.zeros(len(cells), dtype=bool)
+            shared[inside] = m[lr[inside], lc[inside]]
+            dissimilarity = min(dissimilarity, 1.0 - shared.mean())
+        if dissimilarity < min_dissimilarity:
+            continue
+        path = np.zeros(band_w.shape, dtype=bool)
+        path[lr[inside], lc[inside]] = True
+        masks.append(_dilate(path, tolerance))
+        blocked |= masks[-1]
+        routes.append(Alternative(cells, float(total[via]), via, float(dissimilarity)))
+    return routes
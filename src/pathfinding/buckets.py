@@ -0,0 +1,184 @@
+import argparse
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .planes import neighbour_offsets
+
+MAX_LEVEL = 4095          # largest quantised step cost (12 bit): int32 distances hold paths of > 500k steps
+IMPASSABLE = np.iinfo(np.uint16).max
+CHUNK_CELLS = 1 << 22
+
+
+class QuantisedPlanes(NamedTuple):
+    steps: np.ndarray     # (K, rows * cols) uint16 step costs in units of 'unit', IMPASSABLE where no move
+    unit: float           # cost of one integer step unit
+    shape: Tuple[int, int]
+    width: int            # smallest finite step (the bucket width of dial_field)
+    max_step: int         # largest finite step
+
+
+class DialStats(NamedTuple):
+    settled: int          # cells given their final distance
+    buckets: int          # bucket ranges processed (vectorized iterations)
+    width: int            # bucket width in units (= smallest step, so a whole bucket settles at once)
+
+
+def quantise_planes(planes: np.ndarray, max_level: int = MAX_LEVEL) -> QuantisedPlanes:
+    """
+    Fixed-point edge costs: planes (planes.edge_planes / load_planes, inf = no move) scaled so the
+    largest finite step is max_level and rounded (at least 1). Rounding is unbiased, so the error
+    of a path cost stays far below one unit per step. Read in row chunks, so memory-mapped planes
+    are never loaded as float in full; the smallest and largest step are found in the same pass.
+    """
+    n_dir, rows, cols = planes.shape
+    step = max(1, CHUNK_CELLS // max(cols, 1))
+    top = 0.0
+    for r0 in range(0, rows, step):
+        chunk = np.asarray(planes[:, r0:r0 + step], dtype=np.float64)
+        finite = chunk[np.isfinite(chunk)]
+        if finite.size:
+            top = max(top, float(finite.max()))
+    unit = top / max_level if top > 0 else 1.0
+    out = np.empty((n_dir, rows * cols), dtype=np.uint16)
+    width, max_step = IMPASSABLE, 0
+    for r0 in range(0, rows, step):
+        chunk = np.asarray(planes[:, r0:r0 + step], dtype=np.float64).reshape(n_dir, -1)
+        finite = np.isfinite(chunk)
+        q = np.where(finite, np.maximum(np.rint(chunk / unit), 1), IMPASSABLE)
+        out[:, r0 * cols:r0 * cols + chunk.shape[1]] = q
+        if finite.any():
+            width = min(width, int(q[finite].min()))
+            max_step = max(max_step, int(q[finite].max()))
+    if max_step == 0:   # no move at all
+        width = max_step = 1
+    return QuantisedPlanes(out, unit, (rows, cols), width, max_step)
+
+
+def dial_field(
+    qplanes: QuantisedPlanes,
+    source: Tuple[int, int],
+    *,
+    target: Optional[Tuple[int, int]] = None
+) -> Tuple[np.ndarray, np.ndarray, DialStats]:
+    """
+    Cost field from 'source' by Dial's bucket queue over integer step costs: cells are filed in
+    buckets of width w = smallest step, held in a circular array of max_step / w + 1 slots (O(1)
+    insert and extract-min). Every cell in the lowest bucket is final - any move adds at least
+    w - so a whole bucket is settled and its moves relaxed as one NumPy batch. Distances are int32
+    and predecessors uint8 (5 bytes per cell on top of the planes). With 'target' the search stops
+    once the target is settled. Returns float32 cum (NaN = unreachable), the r.walk-style direction
+    towards the predecessor (as planes.cost_field) and DialStats.
+    """
+    from .dynamic import direction_angle
+    steps, unit, (rows, cols), width, max_step = qplanes
+    n_dir = steps.shape[0]
+    offsets = neighbour_offsets(16 if n_dir == 16 else 8)
+    flat_off = [dr * cols + dc for dr, dc in offsets]
+    n_slots = max_step // width + 2
+
+    dist = np.full(rows * cols, np.iinfo(np.int32).max, dtype=np.int32)
+    pred = np.full(rows * cols, 255, dtype=np.uint8)
+    src = int(source[0]) * cols + int(source[1])
+    stop = int(target[0]) * cols + int(target[1]) if target is not None else None
+    dist[src] = 0
+    slots = [[] for _ in range(n_slots)]
+    slots[0].append(np.array([src]))
+    pending, bucket, settled, processed = 1, 0, 0, 0
+    while pending:
+        slot = slots[bucket % n_slots]
+        if slot:
+            cells = np.unique(np.concatenate(slot))
+            pending -= len(slot)
+            slot.clear()
+            cells = cells[dist[cells] // width == bucket]   # drop entries that were improved since
+            if cells.size:
+                settled += cells.size
+                processed += 1
+                d = dist[cells].astype(np.int64)
+                for k in range(n_dir):
+                    w = steps[k, cells]
+                    ok = w != IMPASSABLE
+                    nbr, cand = cells[ok] + flat_off[k], d[ok] + w[ok]
+                    better = cand < dist[nbr]
+                    nbr, cand = nbr[better], cand[better]
+                    if not nbr.size:
+                        continue
+                    dist[nbr], pred[nbr] = cand, k
+                    slot_of = cand // width
+                    order = np.argsort(slot_of, kind="stable")
+                    ids, starts = np.unique(slot_of[order], return_index=True)
+                    for b, part in zip(ids.tolist(), np.split(nbr[order], starts[1:])):
+                        slots[b % n_slots].append(part)
+                    pending += len(ids)
+                if stop is not None and dist[stop] // width <= bucket:
+                    break
+        bucket += 1
+
+    reached = pred != 255
+    off = np.array(offsets)
+    direction = np.full(rows * cols, np.nan, dtype=np.float32)
+    direction[reached] = direction_angle(-off[pred[reached], 0], -off[pred[reached], 1])
+    cum = dist.astype(np.float32) * np.float32(unit)
+    cum[dist == np.iinfo(np.int32).max] = np.nan
+    if stop is not None:   # early exit: only cells up to the target bucket are final
+        cum[dist // width > bucket] = np.nan
+    return cum.reshape(rows, cols), direction.reshape(rows, cols), DialStats(settled, processed, width)
+
+
+def compare_fields(cum: np.ndarray, reference: np.ndarray) -> dict:
+    """Relative difference of two cost fields over the cells reachable in both."""
+    both = np.isfinite(cum) & np.isfinite(reference) & (reference > 0)
+    rel = np.abs(cum[both].astype(np.float64) - reference[both]) / reference[both]
+    return {
+        "cells": int(both.sum()),
+        "reachability_mismatch": int((np.isfinite(cum) != np.isfinite(reference)).sum()),
+        "max_rel_diff": float(rel.max()) if rel.size else 0.0,
+        "mean_rel_diff": float(rel.mean()) if rel.size else 0.0,
+    }
+
+
+def validate(
+    dem_path: str,
+    cost_surface_path: str,
+    points: Sequence[Tuple[float, float]],
+    lambda_weight: float = 0.7
+) -> dict:
+    """
+    Dial fields from each point against r.walk (through routing.FieldSource) when GRASS is
+    available, else against the float Dijkstra over the same planes (planes.cost_field).
+    r.walk handles borders and friction slightly differently, so expect small differences there.
+    """
+    from rasterio.transform import rowcol
+    from ..routing import FieldSource, init_grass
+    from .planes import cost_field, load_planes
+    try:
+        init_grass()
+        reference = FieldSource(dem_path, cost_surface_path, lambda_weight, solver="r.walk")
+    except ImportError as e:
+        print(f"[dial] GRASS not available ({e}), validating against Dijkstra on the edge planes")
+        reference = None
+    dial = FieldSource(dem_path, cost_surface_path, lambda_weight, solver="dial")
+    report = {}
+    for coords in points:
+        cum, _ = dial.get("dial", coords, "validate")
+        if reference is not None:
+            ref, _ = reference.get("ref", coords, "validate")
+        else:
+            planes = load_planes(dem_path, cost_surface_path, lambda_weight)
+            ref, _ = cost_field(planes, rowcol(dial.transform, *coords))
+        report[str(tuple(coords))] = compare_fields(cum, ref)
+        print(f"[dial] {coords}: {report[str(tuple(coords))]}")
+    return report
+
+
+if __name__ == "__main__":
+    from ..cost_surface import config
+    from ..main import SKITOURS
+
+    parser = argparse.ArgumentParser(description="Validate the bucket-queue (Dial) solver against r.walk.")
+    parser.add_argument("--dem", default=config.INPUT_RASTERS["dem"])
+    parser.add_argument("--cost-surface", default=config.OUTPUT_COST)
+    parser.add_argument("--lambda-weight", type=float, default=0.7)
+    args = parser.parse_args()
+    validate(args.dem, args.cost_surface, [t["start"] for t in SKITOURS.values()], args.lambda_weight)
@@ -0,0 +1,61 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+# 8-neighbour offsets (row, col)
+NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def _direction_step(angle_deg: float) -> Tuple[int, int]:
+    """r.walk/r.cost direction (degrees CCW from East) -> (row, col) offset."""
+    rad = np.deg2rad(angle_deg)
+    return -int(round(np.sin(rad))), int(round(np.cos(rad)))
+
+
+def drain_path(
+    cum: np.ndarray,
+    start_cell: Tuple[int, int],
+    direction: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Follow a cumulative cost field downhill from start_cell to its source (cost 0), like r.drain.
+    Uses the direction raster when given; steps that do not decrease the cost
+    fall back to the lowest of the 8 neighbours.
+    Returns an (n, 2) array of (row, col) cells, start_cell first.
+    """
+    rows, cols = cum.shape
+    r, c = int(start_cell[0]), int(start_cell[1])
+    if not (0 <= r < rows and 0 <= c < cols) or not np.isfinite(cum[r, c]):
+        raise ValueError(f"Start cell {start_cell} is outside the raster or has no cost")
+
+    cells = [(r, c)]
+    for _ in range(cum.size):
+        current = cum[r, c]
+        if current <= 0:
+            break
+        step = None
+        if direction is not None and np.isfinite(direction[r, c]):
+            dr, dc = _direction_step(direction[r, c])
+            nr, nc = r + dr, c + dc
+            if (dr or dc) and 0 <= nr < rows and 0 <= nc < cols and cum[nr, nc] < current:
+                step = (nr, nc)
+        if step is None:
+            best = current
+            for dr, dc in NEIGHBOURS:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < rows and 0 <= nc < cols and cum[nr, nc] < best:
+                    best, step = cum[nr, nc], (nr, nc)
+        if step is None:
+            break  # local minimum (source cell or isolated region)
+        r, c = step
+        cells.append(step)
+    return np.array(cells, dtype=np.int64)
+
+
+def cells_to_coords(cells: np.ndarray, transform) -> np.ndarray:
+    """(row, col) cell indices -> (x, y) cell-centre coordinates for an affine transform."""
+    cols = cells[:, 1] + 0.5
+    rows = cells[:, 0] + 0.5
+    xs = transform.c + cols * transform.a + rows * transform.b
+    ys = transform.f + cols * transform.d + rows * transform.e
+    return np.column_stack([xs, ys])
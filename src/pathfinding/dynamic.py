@@ -0,0 +1,152 @@
+import heapq
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from rasterio.windows import Window
+
+from .drain import NEIGHBOURS
+from .planes import opposite
+from .walk import WALK_COEFFS, SLOPE_FACTOR, walk_step_cost
+
+_OFFSETS = np.array(NEIGHBOURS)
+_OPPOSITE = opposite(NEIGHBOURS)
+
+
+class RepairStats(NamedTuple):
+    invalidated: int     # cells whose shortest path ran through the edited window
+    settled: int         # cells popped from the queue during the repair
+    changed: int         # cells whose cost changed
+
+
+def direction_angle(dr: np.ndarray, dc: np.ndarray) -> np.ndarray:
+    """(row, col) step towards the predecessor -> r.walk direction (degrees CCW from East, 45..360)."""
+    angle = np.degrees(np.arctan2(-np.asarray(dr, dtype=np.float64), dc))
+    return np.where(angle <= 0, angle + 360.0, angle)
+
+
+def _parent_step(direction: np.ndarray, r: np.ndarray, c: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    rad = np.deg2rad(direction[r, c])
+    valid = np.isfinite(rad)
+    rad = np.where(valid, rad, 0.0)
+    # cells without a direction get (0, 0), which is never a neighbour offset
+    return (np.where(valid, -np.rint(np.sin(rad)), 0).astype(np.int64),
+            np.where(valid, np.rint(np.cos(rad)), 0).astype(np.int64))
+
+
+def _descendants(direction: np.ndarray, seeds: np.ndarray) -> np.ndarray:
+    """Mask of the seed cells and every cell whose predecessor chain runs through them."""
+    rows, cols = direction.shape
+    mask = np.zeros(direction.shape, dtype=bool)
+    mask.flat[seeds] = True
+    frontier = seeds
+    while frontier.size:
+        fr, fc = np.divmod(frontier, cols)
+        found = []
+        for dr, dc in NEIGHBOURS:
+            vr, vc = fr + dr, fc + dc
+            inside = (vr >= 0) & (vr < rows) & (vc >= 0) & (vc < cols)
+            vr, vc = vr[inside], vc[inside]
+            pr, pc = _parent_step(direction, vr, vc)
+            child = (pr == -dr) & (pc == -dc) & ~mask[vr, vc]
+            found.append(vr[child] * cols + vc[child])
+        frontier = np.unique(np.concatenate(found))
+        mask.flat[frontier] = True
+    return mask
+
+
+def repair_field(
+    cum: np.ndarray,
+    direction: np.ndarray,
+    dem: np.ndarray,
+    friction: np.ndarray,
+    window: Window,
+    cellsize: Sequence[float],
+    lambda_weight: float,
+    walk_coeffs: Sequence[float] = WALK_COEFFS,
+    slope_factor: float = SLOPE_FACTOR,
+    planes: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray, RepairStats]:
+    """
+    Repair a cumulative cost + direction field after the friction inside 'window' changed
+    (dynamic shortest paths): cells whose predecessor chain runs through the window are
+    invalidated, re-seeded from their consistent neighbours and re-settled with Dijkstra,
+    which also spreads any cost decrease outwards. Work scales with the affected region.
+    'friction' is the edited cost surface. 'planes', if given, are its 8 edge planes (e.g. the
+    cached pre-edit planes patched with planes.patch_planes) and step costs are looked up;
+    otherwise they are computed only for the cells the repair touches.
+    Returns repaired copies and RepairStats.
+    """
+    rows, cols = cum.shape
+    if planes is None:
+        hx, hy = (float(abs(v)) for v in cellsize)
+        cell_len = 0.5 * (hx + hy)
+        step_len = np.hypot(_OFFSETS[:, 0] * hy, _OFFSETS[:, 1] * hx)
+
+        def cost_into(k, nr, nc, ar, ac):
+            return walk_step_cost(dem[ar, ac] - dem[nr, nc], step_len[k], friction[nr, nc], friction[ar, ac],
+                                  cell_len, lambda_weight, walk_coeffs, slope_factor)
+
+        def cost_from(r, c, nr, nc, inside):
+            return walk_step_cost(dem[nr, nc] - dem[r, c], step_len[inside], friction[r, c], friction[nr, nc],
+                                  cell_len, lambda_weight, walk_coeffs, slope_factor)
+    else:
+        if planes.shape[0] != len(NEIGHBOURS):
+            raise ValueError(f"repair_field needs 8-neighbour edge planes, got {planes.shape[0]}")
+
+        def cost_into(k, nr, nc, ar, ac):
+            return planes[_OPPOSITE[k], nr, nc]    # move neighbour -> cell
+
+        def cost_from(r, c, nr, nc, inside):
+            return planes[:, r, c][inside]
+    old = np.asarray(cum, dtype=np.float64)
+    cum = np.where(np.isnan(old), np.inf, old)    # r.walk nulls = unreachable
+    direction = np.array(direction, dtype=np.float32)
+
+    r0, c0 = int(window.row_off), int(window.col_off)
+    r1, c1 = min(rows, r0 + int(window.height)), min(cols, c0 + int(window.width))
+    wr, wc = np.mgrid[max(r0, 0):r1, max(c0, 0):c1]
+    seeds = (wr * cols + wc).ravel()
+    seeds = seeds[cum.flat[seeds] != 0]    # source cells keep cost 0
+
+    affected = _descendants(direction, seeds)
+    affected.flat[seeds] = True
+    cum[affected] = np.inf
+
+    # Seed invalidated cells from their consistent neighbours (move neighbour -> cell)
+    ar, ac = np.nonzero(affected)
+    best = np.full(ar.shape, np.inf)
+    best_k = np.full(ar.shape, -1)
+    for k in range(len(NEIGHBOURS)):
+        nr, nc = ar + _OFFSETS[k, 0], ac + _OFFSETS[k, 1]
+        inside = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+        nr, nc = np.where(inside, nr, ar), np.where(inside, nc, ac)
+        cost = cost_into(k, nr, nc, ar, ac)
+        cand = np.where(inside & np.isfinite(cost), cum[nr, nc] + cost, np.inf)
+        better = cand < best
+        best[better], best_k[better] = cand[better], k
+    cum[ar, ac] = best
+    reached = np.isfinite(best)
+    direction[ar, ac] = np.where(reached, direction_angle(_OFFSETS[best_k, 0], _OFFSETS[best_k, 1]), np.nan)
+
+    heap = [(float(v), int(i)) for v, i in zip(best[reached], (ar * cols + ac)[reached])]
+    heapq.heapify(heap)
+    settled = 0
+    while heap:
+        d, i = heapq.heappop(heap)
+        if d > cum.flat[i]:
+            continue
+        settled += 1
+        r, c = divmod(i, cols)
+        nr, nc = r + _OFFSETS[:, 0], c + _OFFSETS[:, 1]
+        inside = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+        nr, nc = nr[inside], nc[inside]
+        cand = d + cost_from(r, c, nr, nc, inside)
+        better = np.isfinite(cand) & (cand < cum[nr, nc] - 1e-9)
+        for vr, vc, v, k in zip(nr[better], nc[better], cand[better], np.flatnonzero(inside)[better]):
+            cum[vr, vc] = v
+            direction[vr, vc] = direction_angle(-_OFFSETS[k, 0], -_OFFSETS[k, 1])
+            heapq.heappush(heap, (float(v), int(vr * cols + vc)))
+
+    cum[np.isinf(cum)] = np.nan
+    changed = int(np.count_nonzero(~(np.isclose(cum, old) | (np.isnan(cum) & np.isnan(old)))))
+    return cum.astype(np.float32), direction, RepairStats(int(affected.sum()), settled, changed)
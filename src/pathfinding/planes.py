@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .drain import NEIGHBOURS
+from .walk import WALK_COEFFS, SLOPE_FACTOR, read_on_grid, walk_step_cost
+
+DEFAULT_PLANE_DIR = "output/cache/edge_planes"
+DEFAULT_PLANE_MAX_BYTES = 8 * 1024 ** 3   # 8 GB, least recently used plane files are evicted beyond this
+
+# 16-neighbourhood = 8 neighbours + knight's moves (like r.walk -k)
+KNIGHT_MOVES = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+
+
+def neighbour_offsets(neighbours: int = 8) -> List[Tuple[int, int]]:
+    if neighbours not in (8, 16):
+        raise ValueError(f"neighbours must be 8 or 16, got {neighbours}")
+    return NEIGHBOURS + (KNIGHT_MOVES if neighbours == 16 else [])
+
+
+def opposite(offsets: Sequence[Tuple[int, int]]) -> np.ndarray:
+    """Index of the reverse move of every offset (for backward solves: cost into a cell)."""
+    return np.array([list(offsets).index((-dr, -dc)) for dr, dc in offsets])
+
+
+def edge_planes(
+    dem: np.ndarray,
+    friction: np.ndarray,
+    cellsize: Sequence[float],
+    lambda_weight: float,
+    *,
+    neighbours: int = 8,
+    walk_coeffs: Sequence[float] = WALK_COEFFS,
+    slope_factor: float = SLOPE_FACTOR,
+    dtype=np.float32,
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    r.walk cost of every move, one plane per direction: planes[k, r, c] is the cost of stepping
+    from (r, c) to (r, c) + offsets[k] (walking time from the DEM plus lambda * mean friction).
+    Moves off the raster or touching NaN are inf. The cost of the move *into* (r, c) from
+    direction k is planes[opposite[k], r - dr, c - dc], so forward and backward solves share them.
+    Computed per direction on the overlapping slices, in float32 unless dtype is float64.
+    """
+    offsets = neighbour_offsets(neighbours)
+    rows, cols = dem.shape
+    hx, hy = (float(abs(v)) for v in cellsize)
+    cell_len = 0.5 * (hx + hy)
+    work = np.float64 if np.dtype(dtype) == np.float64 else np.float32
+    dem = np.asarray(dem, dtype=work)
+    friction = np.asarray(friction, dtype=work)
+    if out is None:
+        out = np.empty((len(offsets), rows, cols), dtype=dtype)
+    for k, (dr, dc) in enumerate(offsets):
+        frm = (slice(max(0, -dr), rows - max(0, dr)), slice(max(0, -dc), cols - max(0, dc)))
+        to = (slice(max(0, dr), rows + min(0, dr)), slice(max(0, dc), cols + min(0, dc)))
+        step = walk_step_cost(dem[to] - dem[frm], float(np.hypot(dr * hy, dc * hx)), friction[frm], friction[to],
+                              cell_len, lambda_weight, walk_coeffs, slope_factor)
+        step[~np.isfinite(step)] = np.inf
+        out[k] = np.inf
+        out[k][frm] = step
+    return out
+
+
+def cost_field(
+    planes: np.ndarray,
+    source: Tuple[int, int],
+    *,
+    reverse: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Dijkstra cost field over edge planes, with lookups only (no step costs computed), run by
+    scipy.sparse.csgraph on a CSR graph built from the finite planes (about 12 bytes per move
+    plus scipy's float64 copy of the weights).
+    Forward: cost of travelling from 'source' to every cell, like r.walk from a start point.
+    reverse=True: cost of travelling from every cell to 'source' (moves taken against their
+    direction), for backward solves on the anisotropic graph.
+    Returns float32 cum (NaN = unreachable) and the r.walk-style direction of each cell's step
+    towards its predecessor (NaN at the source and unreachable cells).
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+    from .dynamic import direction_angle   # dynamic builds on this module
+    n_dir, rows, cols = planes.shape
+    n = rows * cols
+    flat_off = np.array([dr * cols + dc for dr, dc in neighbour_offsets(16 if n_dir == 16 else 8)], dtype=np.int64)
+    # CSR rows are the 'from' cells, with their moves in direction order
+    weights = np.asarray(planes).reshape(n_dir, n).T
+    ok = np.isfinite(weights)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(ok.sum(axis=1), out=indptr[1:])
+    indices = (np.arange(n, dtype=np.int64)[:, None] + flat_off)[ok]
+    graph = csr_matrix((weights[ok], indices, indptr), shape=(n, n))
+    del weights, ok, indices
+    if reverse:
+        graph = graph.T.tocsr()
+    src = int(source[0]) * cols + int(source[1])
+    dist, pred = dijkstra(graph, directed=True, indices=src, return_predecessors=True)
+
+    reached = pred >= 0
+    cells = np.flatnonzero(reached)
+    direction = np.full(n, np.nan, dtype=np.float32)
+    direction[cells] = direction_angle(pred[cells] // cols - cells // cols, pred[cells] % cols - cells % cols)
+    dist[np.isinf(dist)] = np.nan
+    return dist.astype(np.float32).reshape(rows, cols), direction.reshape(rows, cols)
+
+
+def plane_key(dem_path: str, cost_surface_path: str, lambda_weight: float, *, neighbours: int = 8,
+              dtype: str = "float32", cost_band: int = 1,
+              walk_coeffs: Sequence[float] = WALK_COEFFS, slope_factor: float = SLOPE_FACTOR) -> str:
+    from ..cost_cache import file_hash
+    payload = {
+        "dem": file_hash(dem_path),
+        "cost": file_hash(cost_surface_path),
+        "band": int(cost_band),
+        "lambda": float(lambda_weight),
+        "walk_coeffs": [float(v) for v in walk_coeffs] + [float(slope_factor)],
+        "neighbours": int(neighbours),
+        "dtype": str(dtype),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _evict_planes(plane_dir: str, max_bytes: int, keep: str):
+    """Delete the least recently used plane files (by mtime, touched on every load) beyond max_bytes."""
+    files = [os.path.join(plane_dir, f) for f in os.listdir(plane_dir) if f.endswith(".npy") and ".tmp" not in f]
+    files.sort(key=os.path.getmtime)
+    total = sum(os.path.getsize(f) for f in files)
+    for path in files:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        total -= os.path.getsize(path)
+        os.remove(path)
+        print(f"[planes] Evicted {path}")
+
+
+def load_planes(
+    dem_path: str,
+    cost_surface_path: str,
+    lambda_weight: float,
+    *,
+    neighbours: int = 8,
+    dtype: str = "float32",
+    cost_band: int = 1,
+    plane_dir: str = DEFAULT_PLANE_DIR,
+    max_bytes: int = DEFAULT_PLANE_MAX_BYTES,
+    build: bool = True,
+    mmap_mode: str = "r"
+) -> Optional[np.ndarray]:
+    """
+    Edge planes for a DEM / cost surface pair, built once and kept as a .npy file keyed by the
+    input hashes, lambda and coefficients; returned memory-mapped (read-only), so every later
+    solve with the same inputs - any tour, forward or backward - only reads them.
+    dtype "float16" halves the size (about 3 significant digits per step).
+    The directory is an LRU cache bounded by max_bytes. build=False returns None on a miss;
+    mmap_mode="c" gives a copy-on-write map that can be patched in memory (see patch_planes).
+    """
+    key = plane_key(dem_path, cost_surface_path, lambda_weight, neighbours=neighbours, dtype=dtype, cost_band=cost_band)
+    path = os.path.join(plane_dir, f"{key}_{neighbours}.npy")
+    if not os.path.exists(path):
+        if not build:
+            return None
+        import rasterio
+        with rasterio.open(cost_surface_path) as src:
+            profile = src.profile
+        dem = read_on_grid(dem_path, profile)
+        friction = read_on_grid(cost_surface_path, profile, band=cost_band)
+        os.makedirs(plane_dir, exist_ok=True)
+        tmp = path + ".tmp.npy"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype,
+                                        shape=(len(neighbour_offsets(neighbours)),) + dem.shape)
+        cellsize = (profile["transform"].a, profile["transform"].e)
+        edge_planes(dem, friction, cellsize, lambda_weight, neighbours=neighbours, out=out)
+        out.flush()
+        del out
+        os.replace(tmp, path)
+        print(f"[planes] {neighbours} edge planes ({dtype}) written to {path}")
+        _evict_planes(plane_dir, max_bytes, keep=path)
+    else:
+        os.utime(path, (time.time(), time.time()))   # mark as recently used
+    return np.load(path, mmap_mode=mmap_mode)
+
+
+def patch_planes(
+    planes: np.ndarray,
+    dem: np.ndarray,
+    friction: np.ndarray,
+    window,
+    cellsize: Sequence[float],
+    lambda_weight: float,
+    *,
+    walk_coeffs: Sequence[float] = WALK_COEFFS,
+    slope_factor: float = SLOPE_FACTOR
+) -> np.ndarray:
+    """
+    Recompute, in place, the planes of every move touching a cell of 'window' (friction edited
+    there): the cells of the window dilated by the neighbourhood reach. Work and memory scale
+    with the window; use on a writable or copy-on-write (mmap_mode="c") map.
+    """
+    n_dir, rows, cols = planes.shape
+    reach = 2 if n_dir == 16 else 1
+    r0, c0 = int(window.row_off), int(window.col_off)
+    r1, c1 = r0 + int(window.height), c0 + int(window.width)
+    # cells whose moves change, and the block holding all their neighbours
+    pr0, pc0, pr1, pc1 = max(0, r0 - reach), max(0, c0 - reach), min(rows, r1 + reach), min(cols, c1 + reach)
+    br0, bc0, br1, bc1 = max(0, pr0 - reach), max(0, pc0 - reach), min(rows, pr1 + reach), min(cols, pc1 + reach)
+    block = edge_planes(dem[br0:br1, bc0:bc1], friction[br0:br1, bc0:bc1], cellsize, lambda_weight,
+                        neighbours=n_dir, walk_coeffs=walk_coeffs, slope_factor=slope_factor, dtype=planes.dtype)
+    planes[:, pr0:pr1, pc0:pc1] = block[:, pr0 - br0:pr1 - br0, pc0 - bc0:pc1 - bc0]
+    return planes
@@ -0,0 +1,195 @@
+import heapq
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..tile_store import Tile, TileCache, TileKey, TileStore
+from .drain import NEIGHBOURS
+from .planes import edge_planes
+from .walk import WALK_COEFFS, SLOPE_FACTOR
+
+_OFFSETS = np.array(NEIGHBOURS)
+
+
+class TiledStats(NamedTuple):
+    settled: int          # cells given their final cost
+    tiles_touched: int    # tiles holding cost values (memory of the search)
+    tile_loads: int       # tile reads (LRU misses)
+    tile_hits: int
+    peak_tiles: int       # most tiles held in the LRU cache at once (tiles on the search front are never evicted)
+    batches: int          # buckets settled (vectorized iterations)
+
+
+class _StepTile(NamedTuple):
+    steps: np.ndarray     # (8, h, w) float32 cost of the move from each cell to neighbour k (inf if impossible)
+    row_off: int
+    col_off: int
+    min_step: float       # smallest finite step of the tile (inf if none)
+
+
+def _step_tile(tiles: Dict[str, Tile], cellsize: Sequence[float], lambda_weight: float,
+               walk_coeffs: Sequence[float], slope_factor: float) -> _StepTile:
+    """Edge planes (step costs to all 8 neighbours) of a tile, computed once when the tile is loaded."""
+    dem, fric = tiles["dem"], tiles["cost"]
+    steps = edge_planes(dem.data, fric.data, cellsize, lambda_weight, walk_coeffs=walk_coeffs,
+                        slope_factor=slope_factor)   # float32 keeps a 1024 tile at ~35 MB
+    finite = steps[np.isfinite(steps)]
+    return _StepTile(steps, dem.row_off, dem.col_off, float(finite.min()) if finite.size else np.inf)
+
+
+def tiled_route(
+    store: TileStore,
+    start: Tuple[int, int],
+    end: Tuple[int, int],
+    lambda_weight: float,
+    *,
+    max_tiles: int = 16,
+    walk_coeffs: Sequence[float] = WALK_COEFFS,
+    slope_factor: float = SLOPE_FACTOR
+) -> Tuple[np.ndarray, float, TiledStats]:
+    """
+    Least-cost path between two cells of a tiled store (layers 'dem' and 'cost') with the r.walk
+    step cost, stopping when the end cell is settled. Like buckets.dial_field, cells are filed in
+    buckets of width w = smallest step of every tile loaded so far; the lowest bucket is final
+    (any move adds at least w) and is settled and relaxed as NumPy batches, one per tile it
+    touches. A tile is loaded when the first cell is queued in it (edge planes to the 8
+    neighbours are computed once per load, and its smallest step may narrow the buckets); because
+    each tile file carries a halo, all neighbours of a settled cell come from that cell's own tile.
+    A tile with cells still queued is never evicted, so the cache holds max_tiles or the tiles of
+    the front, whichever is more. Costs and predecessors are kept per touched tile, so memory
+    follows the searched area instead of the region size. Expect roughly dial_field speed plus the
+    tile loads (a few µs per settled cell), i.e. seconds per million cells searched.
+    Returns the (row, col) cells from start to end, the cost and TiledStats.
+    """
+    ts, width = store.tile_size, store.width
+    tile_cols = -(-width // ts)
+    cellsize = (store.transform.a, store.transform.e)
+    queued: Dict[TileKey, int] = {}   # bucket entries per tile (stale ones included)
+    cache = TileCache(store, ("dem", "cost"), max_tiles,
+                      prepare=lambda t: _step_tile(t, cellsize, lambda_weight, walk_coeffs, slope_factor),
+                      pinned=lambda k: queued.get(k, 0) > 0)
+    min_step: Dict[TileKey, float] = {}   # of every tile loaded so far
+
+    cum: Dict[TileKey, np.ndarray] = {}
+    parent: Dict[TileKey, np.ndarray] = {}
+
+    def load(key: TileKey) -> Optional[_StepTile]:
+        tile = cache.get(key)
+        if tile is not None:
+            min_step.setdefault(key, tile.min_step)
+        return tile
+
+    def by_tile(ids: np.ndarray) -> Iterator[Tuple[TileKey, np.ndarray, np.ndarray, np.ndarray]]:
+        """(tile key, positions in ids, global rows, global cols) per tile of the flat cell ids."""
+        r, c = ids // width, ids % width
+        tid = (r // ts) * tile_cols + c // ts
+        order = np.argsort(tid, kind="stable")
+        keys, starts = np.unique(tid[order], return_index=True)
+        for t, part in zip(keys.tolist(), np.split(order, starts[1:])):
+            key = divmod(t, tile_cols)
+            if key not in cum:
+                cum[key] = np.full((ts, ts), np.inf)
+                parent[key] = np.full((ts, ts), -1, dtype=np.int8)
+            yield key, part, r[part], c[part]
+
+    buckets: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+    order: List[int] = []   # heap of bucket numbers
+
+    def push(ids: np.ndarray, d: np.ndarray, bw: float):
+        b = np.floor(d / bw).astype(np.int64)
+        srt = np.argsort(b, kind="stable")
+        nums, starts = np.unique(b[srt], return_index=True)
+        for num, part in zip(nums.tolist(), np.split(srt, starts[1:])):
+            if num not in buckets:
+                buckets[num] = []
+                heapq.heappush(order, num)
+            buckets[num].append((ids[part], d[part]))
+
+    src = int(start[0]) * width + int(start[1])
+    stop = int(end[0]) * width + int(end[1])
+    key = (int(start[0]) // ts, int(start[1]) // ts)
+    for key, _, r, c in by_tile(np.array([src])):
+        cum[key][r - key[0] * ts, c - key[1] * ts] = 0.0
+    queued[key] = 1
+    load(key)
+    bw = min(min_step.values(), default=np.inf)
+    bw = bw if np.isfinite(bw) and bw > 0 else 1.0
+    push(np.array([src]), np.zeros(1), bw)
+    settled = batches = 0
+    found = None
+    while order:
+        entries = buckets.pop(heapq.heappop(order))
+        ids = np.concatenate([e[0] for e in entries])
+        d = np.concatenate([e[1] for e in entries])
+        current = np.empty_like(d)
+        for key, part, r, c in by_tile(ids):
+            queued[key] -= part.size
+            current[part] = cum[key][r - key[0] * ts, c - key[1] * ts]
+        live = current == d   # drop entries that were improved since
+        ids, d = ids[live], d[live]
+        if not ids.size:
+            continue
+        settled += ids.size
+        batches += 1
+        hit = np.flatnonzero(ids == stop)
+        if hit.size:
+            found = float(d[hit[0]])
+            break
+
+        nbrs, cands, moves = [], [], []
+        for key, part, r, c in by_tile(ids):
+            tile = load(key)
+            if tile is None:
+                continue
+            sub = tile.steps[:, r - tile.row_off, c - tile.col_off]
+            for k, (dr, dc) in enumerate(NEIGHBOURS):
+                ok = np.isfinite(sub[k])
+                nbrs.append(ids[part][ok] + dr * width + dc)
+                cands.append(d[part][ok] + sub[k][ok])
+                moves.append(np.full(int(ok.sum()), k, dtype=np.int8))
+        if not nbrs:
+            continue
+        nbr, cand, move = np.concatenate(nbrs), np.concatenate(cands), np.concatenate(moves)
+        best = np.lexsort((cand, nbr))   # cheapest candidate per neighbour
+        first = np.ones(best.size, dtype=bool)
+        first[1:] = nbr[best][1:] != nbr[best][:-1]
+        best = best[first]
+        nbr, cand, move = nbr[best], cand[best], move[best]
+
+        better_ids, better_d = [], []
+        for key, part, r, c in by_tile(nbr):
+            lr, lc = r - key[0] * ts, c - key[1] * ts
+            ok = cand[part] < cum[key][lr, lc]
+            if not ok.any():
+                continue
+            lr, lc, sel = lr[ok], lc[ok], part[ok]
+            cum[key][lr, lc] = cand[sel]
+            parent[key][lr, lc] = move[sel]
+            queued[key] = queued.get(key, 0) + sel.size
+            if key not in min_step:
+                load(key)
+            better_ids.append(nbr[sel])
+            better_d.append(cand[sel])
+        narrow = min(min_step.values(), default=np.inf)
+        if narrow < bw:   # a new tile has a shorter step: refile the queue in narrower buckets
+            bw = narrow
+            pending = [e for num in order for e in buckets.pop(num)]
+            order.clear()
+            if pending:
+                push(np.concatenate([e[0] for e in pending]), np.concatenate([e[1] for e in pending]), bw)
+        if better_ids:
+            push(np.concatenate(better_ids), np.concatenate(better_d), bw)
+
+    stats = TiledStats(settled, len(cum), cache.misses, cache.hits, cache.peak, batches)
+    if found is None:
+        raise ValueError(f"End cell {end} is not reachable from {start}")
+
+    # Walk the predecessors back from the end
+    cells = [tuple(end)]
+    r, c = end
+    while (r, c) != tuple(start):
+        key = (r // ts, c // ts)
+        k = parent[key][r - key[0] * ts, c - key[1] * ts]
+        r, c = r - _OFFSETS[k, 0], c - _OFFSETS[k, 1]
+        cells.append((r, c))
+    return np.array(cells[::-1]), float(found), stats
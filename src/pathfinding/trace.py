@@ -0,0 +1,137 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .drain import NEIGHBOURS
+
+
+def _fill_nodata(cum: np.ndarray) -> np.ndarray:
+    """NaN/inf cells get a cost above every reachable cell, so the gradient points away from them."""
+    cum = np.asarray(cum, dtype=np.float64)
+    finite = np.isfinite(cum)
+    if finite.all():
+        return cum
+    high = (cum[finite].max() if finite.any() else 0.0) * 1.5 + 1.0
+    return np.where(finite, cum, high)
+
+
+def _gather(cum: np.ndarray, r: np.ndarray, c: np.ndarray) -> np.ndarray:
+    rows, cols = cum.shape
+    return cum[np.clip(r, 0, rows - 1), np.clip(c, 0, cols - 1)]
+
+
+def _corner_gradients(cum: np.ndarray, r: np.ndarray, c: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Central-difference gradient (d/drow, d/dcol) at integer cells, one-sided at the edges."""
+    rows, cols = cum.shape
+    rp, rm = np.minimum(r + 1, rows - 1), np.maximum(r - 1, 0)
+    cp, cm = np.minimum(c + 1, cols - 1), np.maximum(c - 1, 0)
+    gr = (cum[rp, c] - cum[rm, c]) / np.maximum(rp - rm, 1)
+    gc = (cum[r, cp] - cum[r, cm]) / np.maximum(cp - cm, 1)
+    return gr, gc
+
+
+def _bilinear(cum: np.ndarray, y: np.ndarray, x: np.ndarray):
+    """Bilinearly interpolated cost and gradient at fractional cell-centre positions (y=row, x=col)."""
+    rows, cols = cum.shape
+    y = np.clip(y, 0, rows - 1)
+    x = np.clip(x, 0, cols - 1)
+    r0 = np.minimum(np.floor(y).astype(np.int64), rows - 2 if rows > 1 else 0)
+    c0 = np.minimum(np.floor(x).astype(np.int64), cols - 2 if cols > 1 else 0)
+    r1 = np.minimum(r0 + 1, rows - 1)
+    c1 = np.minimum(c0 + 1, cols - 1)
+    fy, fx = y - r0, x - c0
+    w00, w01 = (1 - fy) * (1 - fx), (1 - fy) * fx
+    w10, w11 = fy * (1 - fx), fy * fx
+
+    value = w00 * cum[r0, c0] + w01 * cum[r0, c1] + w10 * cum[r1, c0] + w11 * cum[r1, c1]
+    gr = np.zeros_like(value)
+    gc = np.zeros_like(value)
+    for w, rr, cc in ((w00, r0, c0), (w01, r0, c1), (w10, r1, c0), (w11, r1, c1)):
+        a, b = _corner_gradients(cum, rr, cc)
+        gr += w * a
+        gc += w * b
+    return value, gr, gc
+
+
+def trace_paths(
+    cum: np.ndarray,
+    targets: Sequence[Tuple[float, float]],
+    *,
+    step: float = 0.5,
+    max_steps: int = None
+) -> List[np.ndarray]:
+    """
+    Trace least-cost paths from many targets down a cumulative cost field at once.
+    Every active path takes a step of 'step' cells against the bilinearly interpolated
+    gradient; where that does not lower the cost (flats, saddles, barriers) it takes a
+    discrete step to the lowest 8-neighbour instead, so every path reaches the source.
+    targets are (row, col) cell indices; returns one (n, 2) array of fractional
+    (row, col) positions per target, target first, ending on the source cell.
+    """
+    field = _fill_nodata(cum)
+    rows, cols = field.shape
+    pos = np.asarray(targets, dtype=np.float64).reshape(-1, 2).copy()
+    n = len(pos)
+    if max_steps is None:
+        max_steps = int(8 * (rows + cols) / step)
+
+    tracks = [[p.copy()] for p in pos]
+    active = np.ones(n, dtype=bool)
+    current, _, _ = _bilinear(field, pos[:, 0], pos[:, 1])
+    offsets = np.array(NEIGHBOURS)
+
+    for _ in range(max_steps):
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        p = pos[idx]
+
+        # Finished when the nearest cell is the source (cost 0)
+        cell = np.rint(p).astype(np.int64)
+        at_source = _gather(field, cell[:, 0], cell[:, 1]) <= 0
+        for k in idx[at_source]:
+            tracks[k].append(np.rint(pos[k]))
+        active[idx[at_source]] = False
+        idx, p, cell = idx[~at_source], p[~at_source], cell[~at_source]
+        if idx.size == 0:
+            break
+
+        # Sub-pixel gradient step
+        _, gr, gc = _bilinear(field, p[:, 0], p[:, 1])
+        norm = np.hypot(gr, gc)
+        ok = norm > 1e-12
+        cand = p.copy()
+        cand[ok, 0] -= step * gr[ok] / norm[ok]
+        cand[ok, 1] -= step * gc[ok] / norm[ok]
+        cand[:, 0] = np.clip(cand[:, 0], 0, rows - 1)
+        cand[:, 1] = np.clip(cand[:, 1], 0, cols - 1)
+        value, _, _ = _bilinear(field, cand[:, 0], cand[:, 1])
+        improved = ok & (value < current[idx] - 1e-9)
+
+        # Fallback: discrete steepest-descent step from the nearest cell
+        stuck = ~improved
+        if np.any(stuck):
+            sc = cell[stuck]
+            nb_r = sc[:, 0:1] + offsets[:, 0]
+            nb_c = sc[:, 1:2] + offsets[:, 1]
+            inside = (nb_r >= 0) & (nb_r < rows) & (nb_c >= 0) & (nb_c < cols)
+            nb_val = np.where(inside, _gather(field, nb_r, nb_c), np.inf)
+            best = np.argmin(nb_val, axis=1)
+            best_val = nb_val[np.arange(len(best)), best]
+            here = _gather(field, sc[:, 0], sc[:, 1])
+            moved = best_val < np.minimum(here, current[idx[stuck]])
+            cand_stuck = np.column_stack([nb_r[np.arange(len(best)), best], nb_c[np.arange(len(best)), best]]).astype(np.float64)
+            cand[stuck] = np.where(moved[:, None], cand_stuck, p[stuck])
+            value[stuck] = np.where(moved, best_val, current[idx[stuck]])
+            # No lower neighbour at all: local minimum, stop this path
+            dead = idx[stuck][~moved]
+            active[dead] = False
+
+        pos[idx] = cand
+        current[idx] = value
+        for k, q in zip(idx, cand):
+            if active[k]:
+                tracks[k].append(q.copy())
+
+    return [np.array(t) for t in tracks]
+
@@ -0,0 +1,90 @@
+from typing import Sequence, Union
+
+import numpy as np
+import rasterio
+from rasterio.warp import Resampling, reproject
+
+# --- r.walk coefficients (GRASS defaults, passed explicitly so cached fields stay valid) ---
+WALK_COEFFS = (0.72, 6.0, 1.9998, -1.9998)
+SLOPE_FACTOR = -0.2125
+
+
+def band_index(path: str, band: Union[int, str]) -> int:
+    """1-based band number from a number or a band description (scenario name of a cost surface stack)."""
+    with rasterio.open(path) as src:
+        if isinstance(band, str) and not band.isdigit():
+            if band not in src.descriptions:
+                raise ValueError(f"No band named '{band}' in {path} (bands: {src.descriptions})")
+            return src.descriptions.index(band) + 1
+        if not 1 <= int(band) <= src.count:
+            raise ValueError(f"Band {band} out of range, {path} has {src.count} band(s)")
+        return int(band)
+
+
+def read_on_grid(path: str, profile: dict, resampling: Resampling = Resampling.bilinear, band: int = 1) -> np.ndarray:
+    """
+    Read one band (default 1) of a raster on the grid of 'profile' (float64, nodata as NaN).
+    Rasters already on that grid are read as-is; others are resampled like GRASS does on import + g.region.
+    """
+    with rasterio.open(path) as src:
+        same_grid = (src.crs == profile["crs"] and src.transform == profile["transform"]
+                     and (src.height, src.width) == (profile["height"], profile["width"]))
+        if same_grid:
+            arr = src.read(band).astype(np.float64)
+            if src.nodata is not None:
+                arr[arr == src.nodata] = np.nan
+            return arr
+        arr = np.full((profile["height"], profile["width"]), np.nan, dtype=np.float64)
+        reproject(
+            source=rasterio.band(src, band),
+            destination=arr,
+            src_nodata=src.nodata,
+            dst_transform=profile["transform"],
+            dst_crs=profile["crs"],
+            dst_nodata=np.nan,
+            resampling=resampling,
+        )
+    return arr
+
+
+def isotropic_walk_cost(
+    dem: np.ndarray,
+    friction: np.ndarray,
+    cellsize: Sequence[float],
+    lambda_weight: float,
+    walk_coeffs: Sequence[float] = WALK_COEFFS
+) -> np.ndarray:
+    """
+    Direction-independent cost per metre for the eikonal solver, modelled on r.walk:
+    a + b * tan(slope) seconds of walking (every slope is charged as a climb, as on the way up a tour)
+    plus lambda * friction per cell travelled. NaN in either input makes the cell impassable (inf).
+    """
+    hx, hy = (float(abs(v)) for v in cellsize)
+    a, b = walk_coeffs[0], walk_coeffs[1]
+    d_row, d_col = np.gradient(dem, hy, hx)
+    cost = a + b * np.hypot(d_row, d_col) + lambda_weight * friction / (0.5 * (hx + hy))
+    cost[~np.isfinite(cost)] = np.inf
+    return cost
+
+
+def walk_step_cost(
+    dh: np.ndarray,
+    dist: np.ndarray,
+    fric_from: np.ndarray,
+    fric_to: np.ndarray,
+    cellsize: float,
+    lambda_weight: float,
+    walk_coeffs: Sequence[float] = WALK_COEFFS,
+    slope_factor: float = SLOPE_FACTOR
+) -> np.ndarray:
+    """
+    Cost of one move between neighbouring cells with the r.walk formula:
+    a * dist + (b * dh uphill | c * dh moderate downhill | d * dh steep downhill)
+    plus lambda * mean friction of both cells per cell length travelled.
+    dh is the elevation change of the move and dist its horizontal length in metres.
+    """
+    a, b, c, d = walk_coeffs
+    kind = np.asarray(dh).dtype.type    # keep float32 inputs in float32
+    grade = dh / dist
+    climb = np.where(dh > 0, kind(b), np.where(grade > slope_factor, kind(c), kind(d))) * dh
+    return a * dist + climb + lambda_weight * 0.5 * (fric_from + fric_to) * dist / cellsize
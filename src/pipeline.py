@@ -0,0 +1,310 @@
+import argparse
+import fnmatch
+import glob
+import hashlib
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import ModuleType
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set
+
+from .cost_cache import file_hash
+from . import instrumentation
+from .instrumentation import span
+
+STATE_PATH = "output/pipeline/state.json"
+
+
+class Stage(NamedTuple):
+    name: str
+    func: Callable[..., Any]                 # called as func(**params)
+    inputs: Sequence[str]                    # files or glob patterns read by the stage
+    outputs: Sequence[str]                   # files written by the stage
+    params: Dict[str, Any] = {}              # keyword arguments, part of the signature
+    config: Dict[str, Any] = {}              # settings the stage reads itself (e.g. config.py values)
+    code: Sequence[str] = ()                 # extra modules hashed with the stage (imported inside functions)
+    default: bool = True                     # part of a run without targets (else only when named)
+
+
+def _expand(pattern: str) -> List[str]:
+    return sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+
+
+def _matches(pattern: str, path: str) -> bool:
+    return os.path.normpath(path) == os.path.normpath(pattern) or fnmatch.fnmatch(path, pattern)
+
+
+def upstream(stages: Sequence[Stage]) -> Dict[str, Set[str]]:
+    """Stage name -> names of the stages producing any of its inputs."""
+    deps = {s.name: set() for s in stages}
+    for s in stages:
+        for other in stages:
+            if other is not s and any(_matches(i, o) for i in s.inputs for o in other.outputs):
+                deps[s.name].add(other.name)
+    return deps
+
+
+def _source_modules(func: Callable, extra: Sequence[str] = ()) -> List[ModuleType]:
+    """
+    The module defining func plus every module of the same top-level package it reaches through
+    module-level imports (transitively), and the modules named in 'extra' (for imports made
+    inside functions).
+    """
+    root = (getattr(func, "__module__", "") or "").split(".")[0]
+    todo = [sys.modules.get(getattr(func, "__module__", ""))] + [importlib.import_module(m) for m in extra]
+    seen: Dict[str, ModuleType] = {}
+    while todo:
+        module = todo.pop()
+        if module is None or module.__name__ in seen or module.__name__.split(".")[0] != root:
+            continue
+        seen[module.__name__] = module
+        for value in list(vars(module).values()):
+            if isinstance(value, ModuleType):
+                todo.append(value)
+            elif isinstance(getattr(value, "__module__", None), str):
+                todo.append(sys.modules.get(value.__module__))
+    return [seen[name] for name in sorted(seen)]
+
+
+def _code_hash(func: Callable, extra: Sequence[str] = ()) -> str:
+    """Hash of the source files of every package module the stage uses (see _source_modules)."""
+    files = {}
+    for module in _source_modules(func, extra):
+        path = getattr(module, "__file__", None)
+        if path and os.path.exists(path):
+            files[module.__name__] = file_hash(path)
+    if not files:
+        return f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+    return hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+
+
+def signature(stage: Stage) -> str:
+    """Hash of the input file contents, params, config and the stage's source modules."""
+    inputs = {}
+    for pattern in stage.inputs:
+        paths = _expand(pattern)
+        for p in paths:
+            if not os.path.exists(p):
+                raise FileNotFoundError(f"[{stage.name}] Missing input: {p}")
+        inputs[pattern] = {p: file_hash(p) for p in paths}
+    payload = {
+        "inputs": inputs,
+        "params": stage.params,
+        "config": stage.config,
+        "code": _code_hash(stage.func, stage.code),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order (derived from matching outputs to inputs), in parallel
+    where independent. A stage is skipped when its signature matches the last successful run
+    and its outputs are unchanged on disk; since signatures hash the input contents, a stage
+    that reruns but writes identical files does not invalidate anything downstream.
+    """
+
+    def __init__(self, stages: Sequence[Stage], state_path: str = STATE_PATH):
+        names = [s.name for s in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names: {names}")
+        self.stages = {s.name: s for s in stages}
+        self.deps = upstream(stages)
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        try:
+            with open(state_path) as f:
+                self.state: Dict[str, dict] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.state = {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def _closure(self, targets: Optional[Sequence[str]]) -> List[str]:
+        """Targets (default: the default stages) plus everything upstream of them, in declaration order."""
+        if not targets:
+            targets = [n for n, s in self.stages.items() if s.default]
+        unknown = set(targets) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stages: {sorted(unknown)} (available: {list(self.stages)})")
+        keep, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in keep:
+                keep.add(name)
+                todo.extend(self.deps[name])
+        return [n for n in self.stages if n in keep]
+
+    def is_current(self, stage: Stage, sig: str) -> bool:
+        prev = self.state.get(stage.name)
+        if not prev or prev.get("signature") != sig:
+            return False
+        recorded = prev.get("outputs", {})
+        return all(os.path.exists(p) and recorded.get(p) == file_hash(p) for p in stage.outputs)
+
+    def _run_stage(self, stage: Stage, force: bool, dry_run: bool) -> str:
+        sig = signature(stage)
+        if not force and self.is_current(stage, sig):
+            print(f"[pipeline] {stage.name}: up to date")
+            return "skipped"
+        if dry_run:
+            print(f"[pipeline] {stage.name}: would run")
+            return "stale"
+        print(f"[pipeline] {stage.name}: running")
+        t0 = time.perf_counter()
+        with span("pipeline.stage", stage=stage.name):
+            stage.func(**stage.params)
+        seconds = time.perf_counter() - t0
+        missing = [p for p in stage.outputs if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"[{stage.name}] Stage did not write: {missing}")
+        with self._lock:
+            self.state[stage.name] = {
+                "signature": sig,
+                "outputs": {p: file_hash(p) for p in stage.outputs},
+                "seconds": round(seconds, 3),
+                "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            self._save_state()
+        print(f"[pipeline] {stage.name}: done in {seconds:.1f} s")
+        return "ran"
+
+    def run(
+        self,
+        targets: Optional[Sequence[str]] = None,
+        *,
+        force: Sequence[str] = (),
+        jobs: int = 2,
+        dry_run: bool = False
+    ) -> Dict[str, str]:
+        """
+        Bring 'targets' (default: all stages with default=True) up to date. 'force' names stages to rerun anyway.
+        Returns stage -> "ran" | "skipped" | "stale" (dry run) | "failed" | "blocked".
+        A dry run cannot see past a stale stage, so its downstream stages are reported as stale too.
+        """
+        order = self._closure(targets)
+        status: Dict[str, str] = {}
+        pending = list(order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="pipeline") as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.deps[name] & set(order)
+                    if any(status.get(d) in ("failed", "blocked") for d in deps):
+                        status[name] = "blocked"
+                        pending.remove(name)
+                        print(f"[pipeline] {name}: blocked by a failed upstream stage")
+                    elif dry_run and any(status.get(d) == "stale" for d in deps):
+                        status[name] = "stale"
+                        pending.remove(name)
+                        print(f"[pipeline] {name}: would run (upstream is stale)")
+                    elif all(d in status for d in deps):
+                        pending.remove(name)
+                        running[pool.submit(self._run_stage, self.stages[name], name in force, dry_run)] = name
+                if not running:
+                    if pending:
+                        raise ValueError(f"Dependency cycle between stages: {pending}")
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        status[name] = future.result()
+                    except Exception as e:
+                        status[name] = "failed"
+                        print(f"[pipeline] {name} failed: {e}")
+        return status
+
+    def timings(self) -> Dict[str, float]:
+        """Seconds of the last successful run of every stage."""
+        return {n: self.state[n]["seconds"] for n in self.stages if n in self.state}
+
+
+def default_stages() -> List[Stage]:
+    """Input layers -> cost surface -> routing -> evaluation, with the repo's default paths and settings."""
+    from .cost_surface import config
+    from .cost_surface.cost_surface import create_cost_surface, create_cost_surface_stack
+    from .evaluation import evaluator, profile
+    from .main import SKITOURS, route_tours
+    from .make_input_layer import make_pra_runout_combined as pra
+    from .make_input_layer import make_tractorroads_trails_in_forest as trails
+    from .routing import _safe_name
+
+    cost_config = {
+        name: getattr(config, name)
+        for name in ("INPUT_RASTERS", "MASK_RASTERS", "REF_RASTER", "WEIGHTS_TERRAIN", "TRANSFORM_PARAMS",
+                     "MIN_COST", "MAX_COST", "BARRIER_VALUE", "ROADS_MIN_VALUE", "REDUCTION_MAX_SLOPE",
+                     "REDUCTION_MAX_PRA", "NODATA_VALUE")
+    }
+    routes = [os.path.join("output", "path_geojson", "wgs84", f"{_safe_name(t.lower())}_path_wgs84.geojson")
+              for t in SKITOURS]
+
+    return [
+        Stage("pra_runout_combined", pra.make_pra_runout_combined,
+              inputs=[pra.travel_angle_path, pra.pra_raw_path, pra.pra_binary_path],
+              outputs=[config.INPUT_RASTERS["pra_runout_combined"]],
+              params={"output_path": config.INPUT_RASTERS["pra_runout_combined"]},
+              config={"runout": [pra.RUNOUT_MIN, pra.RUNOUT_MAX], "release": [pra.RELEASE_MIN, pra.RELEASE_MAX]}),
+        Stage("tractorroads_trails_in_forest", trails.make_tractorroads_trails_in_forest,
+              inputs=[trails.tractorroads_trails_path, trails.forest_path],
+              outputs=[config.MASK_RASTERS["tractorroads_trails"]],
+              params={"output_path": config.MASK_RASTERS["tractorroads_trails"]}),
+        Stage("cost_surface", create_cost_surface,
+              inputs=list(config.INPUT_RASTERS.values()) + [p for p in config.MASK_RASTERS.values() if p],
+              outputs=[config.OUTPUT_COST],
+              params={"output_path": config.OUTPUT_COST, "debug_mode": False},
+              config=cost_config),
+        Stage("cost_surface_scenarios", create_cost_surface_stack,
+              inputs=list(config.INPUT_RASTERS.values()) + [p for p in config.MASK_RASTERS.values() if p],
+              outputs=[config.OUTPUT_COST_SCENARIOS],
+              params={"output_path": config.OUTPUT_COST_SCENARIOS},
+              config={**cost_config, "SCENARIOS": config.SCENARIOS},
+              default=False),   # nothing downstream reads the stack; run with `python -m src.pipeline cost_surface_scenarios`
+        Stage("routing", route_tours,
+              inputs=[config.INPUT_RASTERS["dem"], config.OUTPUT_COST],
+              outputs=routes,
+              params={"tours": SKITOURS},
+              code=[f"{__package__}.pathfinding.dynamic"]),   # imported inside planes.cost_field
+        Stage("evaluation", evaluator.main,
+              inputs=[os.path.join(evaluator.AUTO_DIR, "*.geojson"), os.path.join(evaluator.EXPERT_DIR, "*.geojson"),
+                      config.INPUT_RASTERS["dem"], config.INPUT_RASTERS["slope"],
+                      config.INPUT_RASTERS["pra_runout_combined"]],
+              outputs=[evaluator.OUT_CSV, profile.OUT_CSV],
+              config={"buffer_m": evaluator.BUFFER_M, "sample_m": evaluator.SAMPLE_M,
+                      "norm_scale_m": evaluator.NORM_SCALE_M, "force_crs": evaluator.FORCE_CRS}),
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the input layer -> cost surface -> routing -> evaluation pipeline, skipping up-to-date stages.")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all except cost_surface_scenarios)")
+    parser.add_argument("--force", nargs="*", default=None, metavar="STAGE", help="rerun these stages even if up to date (no names: all)")
+    parser.add_argument("--jobs", type=int, default=2, help="stages run in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages are stale")
+    parser.add_argument("--state", default=STATE_PATH)
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(default_stages(), args.state)
+    force = [] if args.force is None else (args.force or list(pipeline.stages))   # --force without names: all
+    status = pipeline.run(args.targets, force=force, jobs=args.jobs, dry_run=args.dry_run)
+
+    print("\n=== Pipeline ===")
+    timings = pipeline.timings()
+    for name, st in status.items():
+        secs = f"{timings[name]:8.1f} s" if st == "ran" and name in timings else ""
+        print(f"  {name:<32} {st:<8} {secs}")
+    instrumentation.finish("pipeline")  # only when ROUTING_TRACE=1
+    return 1 if any(st in ("failed", "blocked") for st in status.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+from rasterio.transform import rowcol
+from shapely.geometry import LineString
+
+from . import routing
+from .routing import (
+    _require_grass,
+    _safe_name,
+    _import_points,
+    _import_rasters,
+    _walk,
+    _drain,
+    _read_grass_array,
+    _read_grass_line,
+)
+from .pathfinding.drain import cells_to_coords
+from .pathfinding.trace import trace_paths
+from .path_export import smooth_path, write_path_outputs
+
+Coords = Tuple[float, float]
+
+
+# Read cumulative cost at many coordinates in one r.what call (NaN where unreachable/null)
+def _costs_at(cum: str, coords: List[Coords]) -> np.ndarray:
+    coord_str = ",".join(f"{x},{y}" for x, y in coords)
+    out = routing.gs.read_command("r.what", map=cum, coordinates=coord_str, separator="pipe")
+    values = []
+    for line in out.strip().splitlines():
+        v = line.split("|")[-1].strip()
+        values.append(float("nan") if v in ("", "*") else float(v))
+    return np.array(values, dtype=np.float64)
+
+
+class RouteMatrix:
+    """
+    Many-to-many routing: one r.walk per unique source, costs to all targets read from that field.
+    Paths are drained lazily (and cached) only for the pairs asked for via path().
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, Coords],
+        targets: Dict[str, Coords],
+        *,
+        dem_path: str,
+        cost_surface_path: str,
+        lambda_weight: float,
+        smooth_threshold: float,
+        output_dir: str = "output/matrix"
+    ):
+        self.source_names = list(sources)
+        self.target_names = list(targets)
+        self.sources = dict(sources)
+        self.targets = dict(targets)
+        self.dem_path = dem_path
+        self.cost_surface_path = cost_surface_path
+        self.lambda_weight = lambda_weight
+        self.smooth_threshold = smooth_threshold
+        self.output_dir = output_dir
+
+        self.costs = np.full((len(self.source_names), len(self.target_names)), np.nan)
+        self._fields: Dict[Coords, Tuple[str, str]] = {}   # source coords -> (cum raster, direction raster)
+        self._paths: Dict[Tuple[str, str], LineString] = {}
+        self._solved = False
+
+    def solve(self) -> np.ndarray:
+        """Run one cost-distance solve per unique source coordinate and fill the N x M cost matrix."""
+        _require_grass()
+        _import_rasters(self.dem_path, self.cost_surface_path, "dem_matrix", "cost_matrix")
+        target_coords = [self.targets[t] for t in self.target_names]
+
+        for i, name in enumerate(self.source_names):
+            coords = self.sources[name]
+            if coords not in self._fields:
+                slug = f"matrix_src{len(self._fields)}"
+                start_vec, cum, direction = f"start_{slug}", f"cum_{slug}", f"dir_{slug}"
+                print(f"[matrix] Running r.walk from '{name}' ({len(self._fields) + 1} unique sources)...")
+                _import_points(start_vec, coords)
+                _walk("dem_matrix", "cost_matrix", start_vec, cum, self.lambda_weight, outdir=direction)
+                self._fields[coords] = (cum, direction)
+            cum, _ = self._fields[coords]
+            self.costs[i, :] = _costs_at(cum, target_coords)
+
+        self._solved = True
+        return self.costs
+
+    def _crs(self):
+        import rasterio
+        with rasterio.open(self.cost_surface_path) as src:
+            return src.crs
+
+    def _transform(self):
+        import rasterio
+        with rasterio.open(self.cost_surface_path) as src:
+            return src.transform
+
+    def _export(self, source: str, target: str, line: LineString, crs) -> LineString:
+        slug = _safe_name(f"{source}_{target}".lower())
+        write_path_outputs(
+            line, crs,
+            tour_name=f"{source} -> {target}",
+            path_geojson=os.path.join(self.output_dir, f"{slug}_path.geojson")
+        )
+        self._paths[(source, target)] = line
+        return line
+
+    def cost(self, source: str, target: str) -> float:
+        if not self._solved:
+            self.solve()
+        return float(self.costs[self.source_names.index(source), self.target_names.index(target)])
+
+    def path(self, source: str, target: str) -> LineString:
+        """Drain, smooth and export the path for one pair (native CRS GeoJSON); cached per pair."""
+        key = (source, target)
+        if key in self._paths:
+            return self._paths[key]
+        if not self._solved:
+            self.solve()
+
+        cum, direction = self._fields[self.sources[source]]
+        slug = _safe_name(f"{source}_{target}".lower())
+        path_vec = f"path_matrix_{slug}"
+        _drain(cum, direction, self.targets[target], f"drain_matrix_{slug}", path_vec)
+        line = smooth_path(_read_grass_line(path_vec), self.smooth_threshold)
+        return self._export(source, target, line, self._crs())
+
+    def paths(self, source: str, targets: List[str] = None) -> Dict[str, LineString]:
+        """
+        Trace sub-pixel paths from one source to many targets in a single batch
+        (gradient descent on the source's cost field, no r.drain); cached per pair.
+        """
+        if not self._solved:
+            self.solve()
+        targets = self.target_names if targets is None else list(targets)
+        todo = [t for t in targets if (source, t) not in self._paths]
+        if todo:
+            cum, _ = self._fields[self.sources[source]]
+            transform, crs = self._transform(), self._crs()
+            cells = [rowcol(transform, *self.targets[t]) for t in todo]
+            print(f"[matrix] Tracing {len(todo)} paths from '{source}'...")
+            for t, track in zip(todo, trace_paths(_read_grass_array(cum), cells)):
+                line = smooth_path(LineString(cells_to_coords(track, transform)), self.smooth_threshold)
+                self._export(source, t, line, crs)
+        return {t: self._paths[(source, t)] for t in targets}
+
+
+def route_matrix(
+    sources: Dict[str, Coords],
+    targets: Dict[str, Coords],
+    **kwargs
+) -> RouteMatrix:
+    """Build and solve a RouteMatrix; see RouteMatrix for keyword arguments."""
+    matrix = RouteMatrix(sources, targets, **kwargs)
+    matrix.solve()
+    return matrix
+
+
+if __name__ == "__main__":
+    from .cost_surface import config
+    from .main import SKITOURS
+    from .routing import init_grass
+
+    init_grass()
+    starts = {f"start_{i}": c for i, c in enumerate(dict.fromkeys(t["start"] for t in SKITOURS.values()))}
+    summits = {name: t["end"] for name, t in SKITOURS.items()}
+    m = route_matrix(
+        starts,
+        summits,
+        dem_path=config.INPUT_RASTERS["dem"],
+        cost_surface_path=config.OUTPUT_COST,
+        lambda_weight=0.7,
+        smooth_threshold=7.5,
+    )
+    for i, s in enumerate(m.source_names):
+        for j, t in enumerate(m.target_names):
+            print(f"{s} -> {t}: {m.costs[i, j]:.1f}")
@@ -1,7 +1,27 @@
 import os
 import sys
 import subprocess
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional, Union
+
+import numpy as np
+import rasterio
+from rasterio.transform import rowcol
+from shapely import wkt
+from shapely.geometry import LineString
+from shapely.ops import linemerge
+
+from .corridor import near_optimal_corridor, write_corridor, write_corridor_polygon
+from .cost_cache import CostFieldCache, field_key
+from .pathfinding.drain import drain_path, cells_to_coords
+from .pathfinding.trace import trace_paths
+from .pathfinding.eikonal import fast_sweep
+from .pathfinding.alternatives import alternative_routes
+from .pathfinding.buckets import dial_field, quantise_planes
+from .pathfinding.planes import cost_field, load_planes
+from .pathfinding.tiled import tiled_route
+from .pathfinding.walk import WALK_COEFFS, SLOPE_FACTOR, band_index, read_on_grid, isotropic_walk_cost
+from .path_export import smooth_path, write_path_outputs, write_route_set
+from .instrumentation import span, traced
 
 # --- GRASS paths ---
 GISBASE = "/Applications/GRASS-8.4.app/Contents/Resources"
@@ -9,21 +29,41 @@ GRASS_DB = os.path.expanduser("~/grassdata")
 GRASS_LOCATION = "routing_algorithm"
 GRASS_MAPSET = "PERMANENT"
 
-os.environ['GISBASE'] = GISBASE
-os.environ['PATH'] += os.pathsep + os.path.join(GISBASE, 'bin')
-os.environ['PATH'] += os.pathsep + os.path.join(GISBASE, 'scripts')
-sys.path.append(os.path.join(GISBASE, 'etc', 'python'))
+# --- cost-distance solver: GRASS r.walk (8/16-neighbour graph), NumPy fast-sweeping eikonal,
+# Dijkstra over precomputed r.walk edge planes or Dial's bucket queue over the quantised planes ---
+SOLVERS = ("r.walk", "eikonal", "planes", "dial")
+
+# --- path extraction: r.drain (8-connected, stair-stepped) or sub-pixel gradient descent ---
+PATH_METHODS = ("r.drain", "gradient")
 
-import grass.script as gs
-import grass.script.setup as gsetup
+# GRASS modules, imported by init_grass() so that importing this module does not need GRASS
+gs = None
+garray = None
 
-# Initialize a GRASS session once per run
+
+# Initialize a GRASS session once per run (sets up the GRASS environment on first use)
 def init_grass():
+    global gs, garray
+    if gs is None:
+        os.environ['GISBASE'] = GISBASE
+        os.environ['PATH'] += os.pathsep + os.path.join(GISBASE, 'bin')
+        os.environ['PATH'] += os.pathsep + os.path.join(GISBASE, 'scripts')
+        sys.path.append(os.path.join(GISBASE, 'etc', 'python'))
+        import grass.script as grass_script
+        from grass.script import array as grass_array
+        gs, garray = grass_script, grass_array
+    import grass.script.setup as gsetup
     gsetup.init(GRASS_DB, GRASS_LOCATION, GRASS_MAPSET)
     print(f"GRASS initialized: location={GRASS_LOCATION}, mapset={GRASS_MAPSET}")
 
 
+def _require_grass():
+    if gs is None:
+        init_grass()
+
+
 # Import a single (x,y) point as a GRASS vector
+@traced("v.in.ascii")
 def _import_points(name: str, coords: Tuple[float, float]):
     x, y = coords
     coords_str = f"{x},{y}\n"
@@ -51,6 +91,358 @@ def _safe_name(base: str) -> str:
     return out
 
 
+# Import DEM + cost surface and align the GRASS region with the cost surface
+@traced("r.in.gdal")
+def _import_rasters(dem_path: str, cost_surface_path: str, dem_name: str, cost_name: str, cost_band: int = 1):
+    gs.run_command("r.in.gdal", input=dem_path, output=dem_name, overwrite=True)
+    gs.run_command("r.in.gdal", input=cost_surface_path, output=cost_name, band=cost_band, overwrite=True)
+    gs.run_command("g.region", raster=cost_name)  # keep GRASS grid aligned with the cost surface
+
+
+# Cumulative cost (and optionally direction) from a start vector with r.walk
+@traced("r.walk")
+def _walk(dem_name: str, cost_name: str, start_vec: str, output: str, lambda_weight: float, outdir: Optional[str] = None):
+    kwargs = {"outdir": outdir} if outdir else {}
+    gs.run_command(
+        "r.walk",
+        elevation=dem_name,
+        friction=cost_name,
+        start_points=start_vec,
+        output=output,
+        lambda_=lambda_weight,
+        walk_coeff=",".join(str(v) for v in WALK_COEFFS),
+        slope_factor=SLOPE_FACTOR,
+        overwrite=True,
+        **kwargs
+    )
+
+
+# Least-cost path from end_coords back to the source of 'cum' with r.drain
+@traced("r.drain")
+def _drain(cum: str, direction: str, end_coords: Tuple[float, float], drain_rast: str, path_vec: str):
+    end_x, end_y = end_coords
+    end_coord_str = f"{end_x},{end_y}"
+    gs.run_command(
+        "r.drain",
+        input=cum,
+        direction=direction,
+        output=drain_rast,
+        drain=path_vec,          # vector output
+        start_coordinates=end_coord_str,
+        overwrite=True
+    )
+
+
+# Read a GRASS line vector (e.g. the r.drain output) into a single LineString
+@traced("v.out.ascii")
+def _read_grass_line(path_vec: str) -> LineString:
+    out = gs.read_command("v.out.ascii", input=path_vec, type="line", format="wkt")
+    lines = [wkt.loads(row) for row in out.strip().splitlines() if row.strip()]
+    merged = linemerge(lines) if len(lines) > 1 else lines[0]
+    if merged.geom_type != "LineString":
+        merged = LineString([pt for ln in merged.geoms for pt in ln.coords])
+    return merged
+
+
+# Read a GRASS raster (current region) into a float64 array, nulls as NaN
+@traced("r.out.bin")
+def _read_grass_array(name: str) -> np.ndarray:
+    arr = np.array(garray.array(mapname=name, null=-1), dtype=np.float64)  # costs are >= 0, so -1 marks null
+    arr[arr < 0] = np.nan
+    return arr
+
+# Sub-pixel least-cost path (end -> start) traced down a cumulative cost array, in map coordinates
+def _trace_line(cum: np.ndarray, end_coords: Tuple[float, float], transform) -> LineString:
+    track = trace_paths(cum, [rowcol(transform, *end_coords)])[0]
+    return LineString(cells_to_coords(track, transform))
+
+# k diverse alternatives from the start/end fields, smoothed and written as one GeoJSON per CRS
+def _write_alternatives(
+    tour_name: str,
+    cum_start: np.ndarray,
+    cum_end: np.ndarray,
+    profile: dict,
+    outputs: Dict[str, str],
+    *,
+    k: int,
+    slack: float,
+    min_dissimilarity: float,
+    smooth_threshold: float,
+    dir_start: Optional[np.ndarray] = None
+):
+    print(f"[{tour_name}] Finding {k} alternative routes...")
+    with span("alternatives", k=k):
+        routes = alternative_routes(cum_start, cum_end, k, slack=slack,
+                                    min_dissimilarity=min_dissimilarity, dir_start=dir_start)
+    lines = [smooth_path(LineString(cells_to_coords(r.cells, profile["transform"])), smooth_threshold) for r in routes]
+    print(f"[{tour_name}] {len(routes)} alternatives (costs: {', '.join(f'{r.cost:.0f}' for r in routes)})")
+    write_route_set(
+        lines, profile["crs"],
+        {
+            "tour": [tour_name] * len(routes),
+            "rank": list(range(1, len(routes) + 1)),
+            "cost": [r.cost for r in routes],
+            "dissimilarity": [r.dissimilarity for r in routes],
+        },
+        path_geojson=outputs["alternatives_geojson_native"],
+        path_geojson_wgs84=outputs["alternatives_geojson_wgs84"],
+    )
+
+
+class FieldSource:
+    """
+    Cumulative cost (+ direction) fields as arrays for one DEM / cost surface pair, taken from
+    the disk cache if given, else solved with r.walk in GRASS, the NumPy eikonal solver or
+    Dijkstra over the edge planes of the DEM / cost surface pair (solver "planes": the r.walk step
+    costs are computed once per inputs and lambda, memory-mapped from disk and only looked up;
+    solver "dial": the same planes quantised to integers and solved with a bucket queue).
+    Rasters are imported into GRASS (or read / planes loaded) once, on the first miss,
+    so one instance can serve many tours. Eikonal fields have no direction raster (stored empty).
+    cost_band selects a band (number or scenario name) of a multi-band cost surface stack.
+    """
+
+    def __init__(
+        self,
+        dem_path: str,
+        cost_surface_path: str,
+        lambda_weight: float,
+        *,
+        solver: str = "r.walk",
+        cache: Optional[CostFieldCache] = None,
+        grass_prefix: str = "fields",
+        cost_band: Union[int, str] = 1
+    ):
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVERS}")
+        self.dem_path = dem_path
+        self.cost_surface_path = cost_surface_path
+        self.lambda_weight = lambda_weight
+        self.solver = solver
+        self.cache = cache
+        self.prefix = grass_prefix
+        self.cost_band = band_index(cost_surface_path, cost_band)
+        with rasterio.open(cost_surface_path) as src:
+            self.profile = src.profile
+        self.transform = self.profile["transform"]
+        self.cellsize = (self.transform.a, self.transform.e)
+        self._imported = False
+        self._local_cost = None
+        self._planes = None
+        self._qplanes = None
+        self._uncached = False
+
+    def _eikonal(self, tour_name: str, label: str, cell: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        if self._local_cost is None:
+            with span("eikonal.setup"):
+                dem = read_on_grid(self.dem_path, self.profile)
+                friction = read_on_grid(self.cost_surface_path, self.profile, band=self.cost_band)
+                self._local_cost = isotropic_walk_cost(dem, friction, self.cellsize, self.lambda_weight)
+        print(f"[{tour_name}] Running eikonal fast sweeping ({label} -> all)...")
+        with span("eikonal", label=label):
+            cum, stats = fast_sweep(self._local_cost, [cell], self.cellsize)
+        cum = cum.astype(np.float32)
+        cum[np.isinf(cum)] = np.nan   # unreachable, like r.walk nulls
+        self._uncached = not stats.converged   # routed on, but not stored for later runs
+        return cum, np.empty(0, dtype=np.float32)
+
+    def _load_planes(self) -> np.ndarray:
+        if self._planes is None:
+            with span("planes.load"):
+                self._planes = load_planes(self.dem_path, self.cost_surface_path, self.lambda_weight,
+                                           cost_band=self.cost_band)
+        return self._planes
+
+    def _planes_field(self, tour_name: str, label: str, cell: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        self._load_planes()
+        print(f"[{tour_name}] Running Dijkstra on edge planes ({label} -> all)...")
+        with span("planes.solve", label=label):
+            return cost_field(self._planes, cell)
+
+    def _dial(self, tour_name: str, label: str, cell: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        if self._qplanes is None:
+            with span("dial.quantise"):
+                self._qplanes = quantise_planes(self._load_planes())
+        print(f"[{tour_name}] Running bucket-queue solver ({label} -> all)...")
+        with span("dial.solve", label=label):
+            cum, direction, stats = dial_field(self._qplanes, cell)
+        print(f"[{tour_name}] {stats.settled} cells settled in {stats.buckets} buckets")
+        return cum, direction
+
+    def _r_walk(self, tour_name: str, label: str, coords: Tuple[float, float]) -> Tuple[np.ndarray, np.ndarray]:
+        _require_grass()
+        dem_name, cost_name = f"dem_{self.prefix}", f"cost_{self.prefix}"
+        if not self._imported:
+            print(f"[{tour_name}] Importing rasters...")
+            _import_rasters(self.dem_path, self.cost_surface_path, dem_name, cost_name, self.cost_band)
+            self._imported = True
+        vec, cum, direction = f"{label}_{self.prefix}", f"cum_{label}_{self.prefix}", f"dir_{label}_{self.prefix}"
+        _import_points(vec, coords)
+        print(f"[{tour_name}] Running r.walk ({label} -> all)...")
+        _walk(dem_name, cost_name, vec, cum, self.lambda_weight, outdir=direction)
+        return _read_grass_array(cum).astype(np.float32), _read_grass_array(direction).astype(np.float32)
+
+    def get(self, label: str, coords: Tuple[float, float], tour_name: str = "") -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(cum, direction or None) of the field from 'coords'; label only names GRASS layers and log lines."""
+        cell = rowcol(self.transform, *coords)
+        if not (0 <= cell[0] < self.profile["height"] and 0 <= cell[1] < self.profile["width"]):
+            raise ValueError(f"Point {coords} is outside the cost surface")
+        extra = {"solver": self.solver} if self.solver != "r.walk" else {}
+        if self.cost_band != 1:
+            extra["band"] = self.cost_band
+        key = field_key(self.dem_path, self.cost_surface_path, self.lambda_weight,
+                        WALK_COEFFS + (SLOPE_FACTOR,), cell, **extra)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            print(f"[{tour_name}] Cost field ({label}) loaded from cache")
+        else:
+            if self.solver == "eikonal":
+                cached = self._eikonal(tour_name, label, cell)
+            elif self.solver == "planes":
+                cached = self._planes_field(tour_name, label, cell)
+            elif self.solver == "dial":
+                cached = self._dial(tour_name, label, cell)
+            else:
+                cached = self._r_walk(tour_name, label, coords)
+            if self.cache is not None and not self._uncached:
+                self.cache.put(key, *cached)
+            self._uncached = False
+        cum, direction = cached
+        return cum, (direction if direction.size else None)
+
+
+# Optimal path from the start field to end_coords (drained or traced in NumPy), smoothed
+def _array_path(
+    tour_name: str,
+    cum: np.ndarray,
+    direction: Optional[np.ndarray],
+    end_coords: Tuple[float, float],
+    transform,
+    path_method: str,
+    smooth_threshold: float
+) -> LineString:
+    if path_method == "gradient":
+        print(f"[{tour_name}] Tracing optimal path (sub-pixel gradient)...")
+        with span("trace"):
+            return smooth_path(_trace_line(cum, end_coords, transform), smooth_threshold)
+    print(f"[{tour_name}] Draining optimal path...")
+    with span("drain"):
+        cells = drain_path(cum, rowcol(transform, *end_coords), direction)
+        return smooth_path(LineString(cells_to_coords(cells, transform)), smooth_threshold)
+
+
+def route_line(
+    tour_name: str,
+    start_coords: Tuple[float, float],
+    end_coords: Tuple[float, float],
+    fields: FieldSource,
+    *,
+    smooth_threshold: float,
+    path_method: str = "gradient"
+) -> Tuple[LineString, float]:
+    """
+    Optimal path (native CRS) and its cost for one tour, without writing any files.
+    Used for batch runs, where routes are streamed to a single output instead.
+    """
+    if path_method not in PATH_METHODS:
+        raise ValueError(f"Unknown path_method '{path_method}', expected one of {PATH_METHODS}")
+    cum, direction = fields.get("start", start_coords, tour_name)
+    r, c = rowcol(fields.transform, *end_coords)
+    if not (0 <= r < cum.shape[0] and 0 <= c < cum.shape[1]) or not np.isfinite(cum[r, c]):
+        raise ValueError(f"End point {end_coords} is outside the cost surface or not reachable")
+    line = _array_path(tour_name, cum, direction, end_coords, fields.transform, path_method, smooth_threshold)
+    return line, float(cum[r, c])
+
+
+def route_line_tiled(
+    tour_name: str,
+    start_coords: Tuple[float, float],
+    end_coords: Tuple[float, float],
+    store,
+    *,
+    lambda_weight: float,
+    smooth_threshold: float,
+    max_tiles: int = 16
+) -> Tuple[LineString, float]:
+    """
+    Optimal path and cost on a tiled store (see create_cost_surface_tiles), loading only the
+    tiles the search reaches. For regions too large for one raster; no GRASS needed.
+    """
+    start, end = store.cell_of(*start_coords), store.cell_of(*end_coords)
+    print(f"[{tour_name}] Tiled Dijkstra (start -> end)...")
+    with span("tiled_route"):
+        cells, cost, stats = tiled_route(store, start, end, lambda_weight, max_tiles=max_tiles)
+    print(f"[{tour_name}] {stats.settled} cells settled, {stats.tiles_touched} tiles touched, "
+          f"{stats.tile_loads} tile loads (peak {stats.peak_tiles} cached)")
+    return smooth_path(LineString(cells_to_coords(cells, store.transform)), smooth_threshold), cost
+
+
+def _run_routing_arrays(
+    tour_name: str,
+    slug: str,
+    start_coords: Tuple[float, float],
+    end_coords: Tuple[float, float],
+    *,
+    dem_path: str,
+    cost_surface_path: str,
+    lambda_weight: float,
+    smooth_threshold: float,
+    solver: str,
+    path_method: str,
+    corridor_mode: str,
+    corridor_slack: float,
+    corridor_dtype: Optional[str],
+    corridor_polygon: bool,
+    alternatives: int,
+    alternatives_slack: float,
+    min_dissimilarity: float,
+    outputs: Dict[str, str],
+    gpkg_path: Optional[str],
+    cache: Optional[CostFieldCache],
+    cost_band: Union[int, str] = 1
+) -> Dict[str, str]:
+    """
+    Routing on in-memory cost fields (see FieldSource); the path is drained or traced in NumPy.
+    """
+    fields = FieldSource(dem_path, cost_surface_path, lambda_weight, solver=solver, cache=cache,
+                         grass_prefix=slug, cost_band=cost_band)
+    profile, transform = fields.profile, fields.transform
+
+    cum_start, dir_start = fields.get("start", start_coords, tour_name)
+    line = _array_path(tour_name, cum_start, dir_start, end_coords, transform, path_method, smooth_threshold)
+    with span("path.write"):
+        outputs.update(write_path_outputs(
+            line, profile["crs"],
+            tour_name=tour_name,
+            path_shp=outputs["path_shapefile"],
+            path_geojson=outputs["path_geojson_native"],
+            path_geojson_wgs84=outputs["path_geojson_wgs84"],
+            gpkg_path=gpkg_path
+        ))
+
+    if corridor_mode != "none" or alternatives > 1:
+        cum_end, _ = fields.get("end", end_coords, tour_name)
+    if alternatives > 1:
+        _write_alternatives(
+            tour_name, cum_start, cum_end, profile, outputs,
+            k=alternatives, slack=alternatives_slack, min_dissimilarity=min_dissimilarity,
+            smooth_threshold=smooth_threshold, dir_start=dir_start
+        )
+
+    if corridor_mode != "none":
+        print(f"[{tour_name}] Computing corridor ({corridor_mode})...")
+        with span("corridor", mode=corridor_mode):
+            if corridor_mode == "full":
+                prof = profile.copy()
+                prof.update(dtype="float32", count=1, nodata=None)
+                with rasterio.open(outputs["corridor_tif"], "w", **prof) as dst:
+                    dst.write((cum_start + cum_end).astype(np.float32), 1)
+            else:
+                corridor = near_optimal_corridor(cum_start, cum_end, slack=corridor_slack, dtype=corridor_dtype)
+                write_corridor(corridor, outputs["corridor_tif"], profile)
+                if corridor_polygon:
+                    write_corridor_polygon(corridor, outputs["corridor_geojson"], profile)
+    return outputs
+
 
 def run_routing_for_tour(
     tour_name: str,
@@ -61,12 +453,51 @@ def run_routing_for_tour(
     cost_surface_path: str,
     lambda_weight: float,
     smooth_threshold: float,
-    output_dir: str = "output"
+    output_dir: str = "output",
+    corridor_mode: str = "full",
+    corridor_slack: float = 0.05,
+    corridor_dtype: Optional[str] = "uint8",
+    corridor_polygon: bool = False,
+    path_method: str = "r.drain",
+    solver: str = "r.walk",
+    alternatives: int = 1,
+    alternatives_slack: float = 0.15,
+    min_dissimilarity: float = 0.3,
+    cache: Optional[CostFieldCache] = None,
+    gpkg_path: Optional[str] = None,
+    cost_band: Union[int, str] = 1
 ) -> Dict[str, str]:
     """
     Run the full GRASS routing for a single tour and export outputs.
+    corridor_mode="full" exports cum_start + cum_end for the whole raster,
+    corridor_mode="near_optimal" keeps only cells within corridor_slack of the optimal cost
+    (cropped, excess cost quantised to corridor_dtype), optionally also as a polygon;
+    corridor_mode="none" skips the corridor (and the second r.walk).
+    With a cache, cost fields are reused across runs and the path is drained in NumPy.
+    path_method="gradient" traces a sub-pixel path down the cumulative cost instead of
+    following the 8-connected direction raster (no stair steps, so little smoothing is needed).
+    solver="eikonal" replaces r.walk by a NumPy fast-sweeping eikonal solve on the cost surface
+    plus a DEM slope penalty (isotropic, no 8-neighbour metrication artefacts; no GRASS needed);
+    solver="planes" solves the r.walk graph with scipy's Dijkstra on step costs looked up from cached
+    edge planes, solver="dial" does the same with fixed-point step costs and a NumPy bucket queue
+    (5 bytes per cell on top of the planes instead of a CSR graph; costs within a fraction of a per mille).
+    alternatives=k > 1 also writes up to k diverse routes (via-node/plateau method on the
+    start/end fields, within alternatives_slack of the optimum, each differing from the better
+    ones in at least min_dissimilarity of its length) as one GeoJSON per CRS in output_dir/alternatives.
+    cost_band picks the band (number or scenario name) of a multi-band cost surface stack.
+    The path is smoothed (Douglas-Peucker) and reprojected in memory and written as
+    Shapefile + GeoJSON (native and WGS84), and appended to gpkg_path if given.
     Returns a dict with output file paths.
     """
+    if corridor_mode not in ("full", "near_optimal", "none"):
+        raise ValueError(f"Unknown corridor_mode '{corridor_mode}', expected 'full', 'near_optimal' or 'none'")
+    if path_method not in PATH_METHODS:
+        raise ValueError(f"Unknown path_method '{path_method}', expected one of {PATH_METHODS}")
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVERS}")
+    if alternatives > 1 and corridor_mode == "none" and cache is None and solver == "r.walk":
+        raise ValueError("alternatives need the end -> all field; use a corridor_mode other than 'none' or a cache")
+
     slug = _safe_name(tour_name.lower())
     dem_name = f"dem_{slug}"
     cost_name = f"cost_{slug}"
@@ -79,7 +510,6 @@ def run_routing_for_tour(
     corridor_rast = f"corridor_{slug}"
     drain_rast = f"drain_{slug}"
     optimal_path = f"path_{slug}"
-    smooth_path = f"path_smooth_{slug}"
 
     # Ensure output dirs
     os.makedirs(output_dir, exist_ok=True)
@@ -94,94 +524,130 @@ def run_routing_for_tour(
     corridor_tif = os.path.join(corridor_dir, f"{slug}_corridor.tif")
     path_geojson = os.path.join(geojson_native_dir, f"{slug}_path.geojson")
     path_shp = os.path.join(shp_dir, f"{slug}_path.shp")
+    path_geojson_wgs84 = os.path.join(geojson_wgs84_dir, f"{slug}_path_wgs84.geojson")
+    corridor_geojson = os.path.join(corridor_dir, f"{slug}_corridor.geojson")
+
+    outputs = {
+        "path_shapefile": path_shp,
+        "path_geojson_native": path_geojson,
+        "path_geojson_wgs84": path_geojson_wgs84
+    }
+    if corridor_mode != "none":
+        outputs["corridor_tif"] = corridor_tif
+    if corridor_mode == "near_optimal" and corridor_polygon:
+        outputs["corridor_geojson"] = corridor_geojson
+    if alternatives > 1:
+        # own directory: path_geojson/wgs84 is where the evaluation pairs optimal paths with expert routes
+        alternatives_dir = os.path.join(output_dir, "alternatives")
+        os.makedirs(alternatives_dir, exist_ok=True)
+        outputs["alternatives_geojson_native"] = os.path.join(alternatives_dir, f"{slug}_alternatives.geojson")
+        outputs["alternatives_geojson_wgs84"] = os.path.join(alternatives_dir, f"{slug}_alternatives_wgs84.geojson")
+
+    if cache is not None or solver != "r.walk":
+        return _run_routing_arrays(
+            tour_name, slug, start_coords, end_coords,
+            dem_path=dem_path,
+            cost_surface_path=cost_surface_path,
+            lambda_weight=lambda_weight,
+            smooth_threshold=smooth_threshold,
+            solver=solver,
+            path_method=path_method,
+            corridor_mode=corridor_mode,
+            corridor_slack=corridor_slack,
+            corridor_dtype=corridor_dtype,
+            corridor_polygon=corridor_polygon,
+            alternatives=alternatives,
+            alternatives_slack=alternatives_slack,
+            min_dissimilarity=min_dissimilarity,
+            outputs=outputs,
+            gpkg_path=gpkg_path,
+            cache=cache,
+            cost_band=cost_band
+        )
+
+    _require_grass()
 
     # 1) Import rasters (DEM + cost) and points
     print(f"[{tour_name}] Importing rasters...")
-    gs.run_command("r.in.gdal", input=dem_path, output=dem_name, overwrite=True)
-    gs.run_command("r.in.gdal", input=cost_surface_path, output=cost_name, overwrite=True)
+    with rasterio.open(cost_surface_path) as src:
+        profile = src.profile
+    _import_rasters(dem_path, cost_surface_path, dem_name, cost_name, band_index(cost_surface_path, cost_band))
 
     print(f"[{tour_name}] Importing start/end points...")
     _import_points(start_vec, start_coords)
-    _import_points(end_vec, end_coords)
+    if corridor_mode != "none":
+        _import_points(end_vec, end_coords)
 
     # 2) Cumulative costs (both directions) and direction raster from start
     print(f"[{tour_name}] Running r.walk (start -> all)...")
-    gs.run_command(
-        "r.walk",
-        elevation=dem_name,
-        friction=cost_name,
-        start_points=start_vec,
-        output=cum_start,
-        outdir=direction_rast,
-        lambda_=lambda_weight,
-        overwrite=True
-    )
+    # (the direction raster is only needed by r.drain)
+    _walk(dem_name, cost_name, start_vec, cum_start, lambda_weight,
+          outdir=direction_rast if path_method == "r.drain" else None)
 
-    print(f"[{tour_name}] Running r.walk (end -> all)...")
-    gs.run_command(
-        "r.walk",
-        elevation=dem_name,
-        friction=cost_name,
-        start_points=end_vec,
-        output=cum_end,
-        lambda_=lambda_weight,
-        overwrite=True
-    )
+    if corridor_mode != "none":
+        print(f"[{tour_name}] Running r.walk (end -> all)...")
+        _walk(dem_name, cost_name, end_vec, cum_end, lambda_weight)
 
-    # 3) Corridor
-    print(f"[{tour_name}] Computing corridor...")
-    gs.mapcalc(f"{corridor_rast} = {cum_start} + {cum_end}", overwrite=True)
+    # 3) Corridor (the near-optimal band and the alternatives work on the fields as arrays)
+    cum_start_arr = cum_end_arr = None
+    if corridor_mode == "near_optimal" or alternatives > 1:
+        cum_start_arr = _read_grass_array(cum_start)
+        cum_end_arr = _read_grass_array(cum_end)
+    if corridor_mode != "none":
+        print(f"[{tour_name}] Computing corridor ({corridor_mode})...")
+    if corridor_mode == "full":
+        with span("r.mapcalc"):
+            gs.mapcalc(f"{corridor_rast} = {cum_start} + {cum_end}", overwrite=True)
+    elif corridor_mode == "near_optimal":
+        with span("corridor", mode=corridor_mode):
+            corridor = near_optimal_corridor(cum_start_arr, cum_end_arr, slack=corridor_slack, dtype=corridor_dtype)
 
-    # 4) Extract optimal path using r.drain, then smooth
-    print(f"[{tour_name}] Extracting optimal path with r.drain...")
-    end_x, end_y = end_coords
-    end_coord_str = f"{end_x},{end_y}"
-    gs.run_command(
-        "r.drain",
-        input=cum_start,
-        direction=direction_rast,
-        output=drain_rast,
-        drain=optimal_path,          # vector output
-        start_coordinates=end_coord_str,
-        overwrite=True
-    )
+    # 4) Extract optimal path (r.drain or sub-pixel trace), then smooth in memory
+    if path_method == "gradient":
+        print(f"[{tour_name}] Tracing optimal path (sub-pixel gradient)...")
+        if cum_start_arr is None:
+            cum_start_arr = _read_grass_array(cum_start)
+        with span("trace"):
+            line = _trace_line(cum_start_arr, end_coords, profile["transform"])
+    else:
+        print(f"[{tour_name}] Extracting optimal path with r.drain...")
+        _drain(cum_start, direction_rast, end_coords, drain_rast, optimal_path)
+        line = _read_grass_line(optimal_path)
 
-    print(f"[{tour_name}] Smoothing path with v.generalize (Douglas-Peucker)...")
-    gs.run_command(
-        "v.generalize",
-        input=optimal_path,
-        output=smooth_path,
-        method="douglas",
-        threshold=smooth_threshold,
-        overwrite=True
-    )
+    print(f"[{tour_name}] Smoothing path (Douglas-Peucker)...")
+    with span("smooth"):
+        line = smooth_path(line, smooth_threshold)
 
-    # 5) Export: corridor GeoTIFF + path as Shapefile (native CRS) + GeoJSON (native CRS)
+    # 5) Export: corridor GeoTIFF + path as Shapefile (native CRS) + GeoJSON (native CRS + WGS84)
     print(f"[{tour_name}] Exporting corridor and vector path...")
-    gs.run_command(
-        "r.out.gdal",
-        input=corridor_rast,
-        output=corridor_tif,
-        format="GTiff",
-        overwrite=True
-    )
-    gs.run_command(
-        "v.out.ogr",
-        input=smooth_path,
-        output=path_shp,
-        format="ESRI_Shapefile",
-        overwrite=True
-    )
-    gs.run_command(
-        "v.out.ogr",
-        input=smooth_path,
-        output=path_geojson,
-        format="GeoJSON",
-        overwrite=True
-    )
+    if corridor_mode == "full":
+        with span("r.out.gdal"):
+            gs.run_command(
+                "r.out.gdal",
+                input=corridor_rast,
+                output=corridor_tif,
+                format="GTiff",
+                overwrite=True
+            )
+    elif corridor_mode == "near_optimal":
+        with span("corridor.write"):
+            write_corridor(corridor, corridor_tif, profile)
+            if corridor_polygon:
+                write_corridor_polygon(corridor, corridor_geojson, profile)
+    with span("path.write"):
+        outputs.update(write_path_outputs(
+            line, profile["crs"],
+            tour_name=tour_name,
+            path_shp=path_shp,
+            path_geojson=path_geojson,
+            path_geojson_wgs84=path_geojson_wgs84,
+            gpkg_path=gpkg_path
+        ))
+    if alternatives > 1:
+        _write_alternatives(
+            tour_name, cum_start_arr, cum_end_arr, profile, outputs,
+            k=alternatives, slack=alternatives_slack, min_dissimilarity=min_dissimilarity,
+            smooth_threshold=smooth_threshold
+        )
 
-    return {
-        "corridor_tif": corridor_tif,
-        "path_shapefile": path_shp,
-        "path_geojson_native": path_geojson  # Create a WGS84-GeoJSON in main.py
-    }
\ No newline at end of file
+    return outputs
@@ -0,0 +1,307 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import rasterio
+from pyproj import Transformer
+from rasterio.transform import rowcol
+from shapely.geometry import LineString, mapping
+
+from .cost_cache import CostFieldCache, field_key
+from .pathfinding.drain import drain_path, cells_to_coords
+from .pathfinding.trace import trace_paths
+from .path_export import smooth_path, to_wgs84
+from .routing import (
+    WALK_COEFFS,
+    SLOPE_FACTOR,
+    PATH_METHODS,
+    init_grass,
+    _import_points,
+    _import_rasters,
+    _read_grass_array,
+    _walk,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class ServiceMetrics:
+    """Thread-safe request counters and latency window for the /metrics endpoint."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.field_hits = 0
+        self.field_misses = 0
+        self._latencies = deque(maxlen=window)   # (finished_at, seconds)
+
+    def record(self, seconds: float, ok: bool = True):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            self._latencies.append((time.time(), seconds))
+
+    def record_field(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.field_hits += 1
+            else:
+                self.field_misses += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            now = time.time()
+            lat = np.array([s for _, s in self._latencies]) * 1000.0
+            last_minute = sum(1 for t, _ in self._latencies if now - t <= 60.0)
+            uptime = now - self.started
+            out = {
+                "uptime_s": uptime,
+                "requests": self.requests,
+                "errors": self.errors,
+                "field_hits": self.field_hits,
+                "field_misses": self.field_misses,
+                "throughput_rps": self.requests / uptime if uptime > 0 else 0.0,
+                "throughput_last_60s_rps": last_minute / 60.0,
+            }
+        if lat.size:
+            out.update(
+                latency_p50_ms=float(np.percentile(lat, 50)),
+                latency_p95_ms=float(np.percentile(lat, 95)),
+                latency_max_ms=float(lat.max()),
+            )
+        return out
+
+
+class RoutingService:
+    """
+    Keeps the DEM and cost surface loaded in GRASS and the cost fields of popular
+    start points in memory (LRU), so a route request is usually only a drain.
+    GRASS calls are serialised; draining and reprojection run concurrently.
+    """
+
+    def __init__(
+        self,
+        dem_path: str,
+        cost_surface_path: str,
+        *,
+        lambda_weight: float = 0.7,
+        smooth_threshold: float = 7.5,
+        hot_fields: int = 8,
+        path_method: str = "r.drain",
+        cache: Optional[CostFieldCache] = None
+    ):
+        if path_method not in PATH_METHODS:
+            raise ValueError(f"Unknown path_method '{path_method}', expected one of {PATH_METHODS}")
+        self.dem_path = dem_path
+        self.cost_surface_path = cost_surface_path
+        self.lambda_weight = lambda_weight
+        self.smooth_threshold = smooth_threshold
+        self.hot_fields = hot_fields
+        self.path_method = path_method
+        self.cache = cache
+        self.metrics = ServiceMetrics()
+
+        with rasterio.open(cost_surface_path) as src:
+            self.transform = src.transform
+            self.crs = src.crs
+            self.shape = (src.height, src.width)
+        self._from_wgs84 = Transformer.from_crs("EPSG:4326", self.crs, always_xy=True)
+
+        self._fields: "OrderedDict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._fields_lock = threading.Lock()
+        self._grass_lock = threading.Lock()
+
+        init_grass()
+        print("[service] Loading DEM and cost surface into GRASS...")
+        _import_rasters(dem_path, cost_surface_path, "dem_service", "cost_service")
+
+    def to_native(self, coords: Tuple[float, float]) -> Tuple[float, float]:
+        return self._from_wgs84.transform(*coords)
+
+    def _cell(self, coords: Tuple[float, float]) -> Tuple[int, int]:
+        r, c = rowcol(self.transform, *coords)
+        if not (0 <= r < self.shape[0] and 0 <= c < self.shape[1]):
+            raise ValueError(f"Point {coords} is outside the cost surface")
+        return int(r), int(c)
+
+    def _field(self, cell: Tuple[int, int], coords: Tuple[float, float]) -> Tuple[np.ndarray, np.ndarray]:
+        with self._fields_lock:
+            if cell in self._fields:
+                self._fields.move_to_end(cell)
+                self.metrics.record_field(hit=True)
+                return self._fields[cell]
+
+        with self._grass_lock:
+            # Another thread may have solved the same start while we waited
+            with self._fields_lock:
+                if cell in self._fields:
+                    self.metrics.record_field(hit=True)
+                    return self._fields[cell]
+            key = None
+            fields = None
+            if self.cache is not None:
+                key = field_key(self.dem_path, self.cost_surface_path, self.lambda_weight,
+                                WALK_COEFFS + (SLOPE_FACTOR,), cell)
+                fields = self.cache.get(key)
+            self.metrics.record_field(hit=fields is not None)
+            if fields is None:
+                # One fixed set of GRASS maps, overwritten per start (serialised by _grass_lock),
+                # so the mapset does not grow with the number of distinct starts
+                _import_points("start_service", coords)
+                _walk("dem_service", "cost_service", "start_service", "cum_service",
+                      self.lambda_weight, outdir="dir_service")
+                fields = (_read_grass_array("cum_service").astype(np.float32),
+                          _read_grass_array("dir_service").astype(np.float32))
+                if self.cache is not None:
+                    self.cache.put(key, *fields)
+
+        with self._fields_lock:
+            self._fields[cell] = fields
+            self._fields.move_to_end(cell)
+            while len(self._fields) > self.hot_fields:
+                self._fields.popitem(last=False)
+        return fields
+
+    def route(self, start: Tuple[float, float], end: Tuple[float, float]) -> dict:
+        """Route between two native-CRS points; returns a GeoJSON Feature in WGS84."""
+        start_cell = self._cell(start)
+        end_cell = self._cell(end)
+        cum, direction = self._field(start_cell, start)
+        if not np.isfinite(cum[end_cell]):
+            raise ValueError(f"End point {end} is not reachable from {start}")
+
+        if self.path_method == "gradient":
+            cells = trace_paths(cum, [end_cell])[0]
+        else:
+            cells = drain_path(cum, end_cell, direction)
+        line = smooth_path(LineString(cells_to_coords(cells, self.transform)), self.smooth_threshold)
+        return {
+            "type": "Feature",
+            "geometry": mapping(to_wgs84(line, self.crs)),
+            "properties": {"cost": float(cum[end_cell]), "length_m": float(line.length)},
+        }
+
+
+def _parse_point(value: str) -> Tuple[float, float]:
+    x, y = (float(v) for v in value.split(","))
+    return x, y
+
+
+def _parse_coords(value) -> Tuple[float, float]:
+    """[x, y] from a JSON body; ValueError / TypeError for anything else."""
+    x, y = (float(v) for v in value)
+    return x, y
+
+
+def make_handler(service: RoutingService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self, params: dict):
+            t0 = time.perf_counter()
+            try:
+                start, end = params["start"], params["end"]
+                if str(params.get("crs", "")).upper() in ("4326", "EPSG:4326", "WGS84"):
+                    start, end = service.to_native(start), service.to_native(end)
+                feature = service.route(start, end)
+            except (KeyError, ValueError) as e:
+                service.metrics.record(time.perf_counter() - t0, ok=False)
+                self._send_json(400, {"error": str(e)})
+                return
+            except Exception as e:
+                service.metrics.record(time.perf_counter() - t0, ok=False)
+                self._send_json(500, {"error": str(e)})
+                return
+            elapsed = time.perf_counter() - t0
+            service.metrics.record(elapsed)
+            feature["properties"]["latency_ms"] = elapsed * 1000.0
+            self._send_json(200, feature)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/route":
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                try:
+                    params = {"start": _parse_point(q["start"]), "end": _parse_point(q["end"]), "crs": q.get("crs", "")}
+                except (KeyError, ValueError):
+                    self._send_json(400, {"error": "expected ?start=x,y&end=x,y[&crs=EPSG:4326]"})
+                    return
+                self._route(params)
+            elif url.path == "/metrics":
+                self._send_json(200, service.metrics.snapshot())
+            elif url.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": f"unknown path {url.path}"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/route":
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                params = {"start": _parse_coords(body["start"]), "end": _parse_coords(body["end"]),
+                          "crs": body.get("crs", "")}
+            except (KeyError, ValueError, TypeError):
+                self._send_json(400, {"error": 'expected JSON {"start": [x, y], "end": [x, y], "crs": optional}'})
+                return
+            self._route(params)
+
+        def log_message(self, format, *args):
+            pass  # request latencies are collected in ServiceMetrics instead
+
+    return Handler
+
+
+def serve(service: RoutingService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Serve route requests on host:port until interrupted (one thread per request)."""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"[service] Listening on http://{host}:{port} (GET/POST /route, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    from .cost_surface import config
+
+    parser = argparse.ArgumentParser(description="Local routing service with warm rasters and cost fields.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--lambda-weight", type=float, default=0.7)
+    parser.add_argument("--smooth-threshold", type=float, default=7.5)
+    parser.add_argument("--hot-fields", type=int, default=8, help="cost fields kept in memory (LRU)")
+    parser.add_argument("--path-method", choices=PATH_METHODS, default="r.drain",
+                        help="'gradient' traces sub-pixel paths instead of following the direction raster")
+    parser.add_argument("--no-disk-cache", action="store_true", help="do not use the on-disk cost field cache")
+    args = parser.parse_args()
+
+    svc = RoutingService(
+        config.INPUT_RASTERS["dem"],
+        config.OUTPUT_COST,
+        lambda_weight=args.lambda_weight,
+        smooth_threshold=args.smooth_threshold,
+        hot_fields=args.hot_fields,
+        path_method=args.path_method,
+        cache=None if args.no_disk_cache else CostFieldCache(),
+    )
+    serve(svc, args.host, args.port)
@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.transform import Affine, rowcol
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import Resampling
+from rasterio.windows import Window, bounds as window_bounds, transform as window_transform
+
+from .instrumentation import span
+
+DEFAULT_TILE_ROOT = "output/tiles"
+DEFAULT_TILE_SIZE = 1024
+DEFAULT_HALO = 8          # >= 1 so every 8-neighbour of a tile's core cells is in the tile file
+
+_INDEX_FILE = "index.json"
+
+TileKey = Tuple[int, int]
+
+
+class Tile(NamedTuple):
+    data: np.ndarray      # float64, nodata as NaN, core + halo (clipped at the region border)
+    row_off: int          # global row / col of data[0, 0]
+    col_off: int
+
+
+class TileStore:
+    """
+    Fixed-size tiles of one or more layers on a common grid, each stored as a GeoTIFF with an
+    overlap halo, plus index.json (grid, tile size, halo and the bounds of every tile).
+    Tile (i, j) covers rows i*tile_size .. (i+1)*tile_size and the same for columns; a cell
+    belongs to exactly one tile core, its neighbours up to 'halo' cells away are in the same file.
+    """
+
+    def __init__(self, root: str = DEFAULT_TILE_ROOT):
+        self.root = root
+        with open(os.path.join(root, _INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.transform = Affine(*self.index["transform"])
+        self.crs = CRS.from_wkt(self.index["crs"])
+        self.width, self.height = self.index["width"], self.index["height"]
+        self.tile_size, self.halo = self.index["tile_size"], self.index["halo"]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(
+        cls,
+        root: str,
+        profile: dict,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        halo: int = DEFAULT_HALO
+    ) -> "TileStore":
+        """Empty store on the grid of 'profile' (index only, layers are added with write_tile)."""
+        if halo < 1:
+            raise ValueError("halo must be at least 1 cell")
+        os.makedirs(root, exist_ok=True)
+        rows, cols = -(-profile["height"] // tile_size), -(-profile["width"] // tile_size)
+        tiles = {}
+        for i in range(rows):
+            for j in range(cols):
+                win = Window(j * tile_size, i * tile_size,
+                             min(tile_size, profile["width"] - j * tile_size),
+                             min(tile_size, profile["height"] - i * tile_size))
+                tiles[f"{i}_{j}"] = {"bounds": list(window_bounds(win, profile["transform"]))}
+        index = {
+            "crs": CRS.from_user_input(profile["crs"]).to_wkt(),
+            "transform": list(profile["transform"])[:6],
+            "width": profile["width"],
+            "height": profile["height"],
+            "tile_size": tile_size,
+            "halo": halo,
+            "tile_rows": rows,
+            "tile_cols": cols,
+            "layers": {},
+            "tiles": tiles,
+        }
+        with open(os.path.join(root, _INDEX_FILE), "w") as f:
+            json.dump(index, f, indent=1)
+        return cls(root)
+
+    # --- grid / spatial index ---
+    def keys(self) -> List[TileKey]:
+        return [tuple(int(v) for v in k.split("_")) for k in self.index["tiles"]]
+
+    def tile_of(self, row: int, col: int) -> TileKey:
+        return row // self.tile_size, col // self.tile_size
+
+    def cell_of(self, x: float, y: float) -> Tuple[int, int]:
+        r, c = rowcol(self.transform, x, y)
+        if not (0 <= r < self.height and 0 <= c < self.width):
+            raise ValueError(f"Point {(x, y)} is outside the tiled region")
+        return int(r), int(c)
+
+    def tiles_in_bounds(self, left: float, bottom: float, right: float, top: float) -> List[TileKey]:
+        """Keys of the tiles intersecting a bounding box (in the store CRS)."""
+        r0, c0 = rowcol(self.transform, left, top)
+        r1, c1 = rowcol(self.transform, right, bottom)
+        last_r, last_c = self.index["tile_rows"] - 1, self.index["tile_cols"] - 1
+        return [(i, j)
+                for i in range(max(0, r0 // self.tile_size), min(last_r, r1 // self.tile_size) + 1)
+                for j in range(max(0, c0 // self.tile_size), min(last_c, c1 // self.tile_size) + 1)]
+
+    def window(self, key: TileKey, halo: bool = True) -> Window:
+        """Window of a tile in region coordinates, with or without the halo (clipped at the border)."""
+        i, j = key
+        h = self.halo if halo else 0
+        r0, c0 = max(0, i * self.tile_size - h), max(0, j * self.tile_size - h)
+        r1 = min(self.height, (i + 1) * self.tile_size + h)
+        c1 = min(self.width, (j + 1) * self.tile_size + h)
+        return Window(c0, r0, c1 - c0, r1 - r0)
+
+    def path(self, layer: str, key: TileKey) -> str:
+        return os.path.join(self.root, layer, f"{key[0]}_{key[1]}.tif")
+
+    def profile(self) -> dict:
+        return dict(driver="GTiff", crs=self.crs, transform=self.transform, width=self.width, height=self.height)
+
+    # --- writing ---
+    def write_tile(self, layer: str, key: TileKey, data: np.ndarray, nodata=None):
+        """Write one tile (core + halo, shaped like window(key)) of a layer."""
+        win = self.window(key)
+        if data.shape != (int(win.height), int(win.width)):
+            raise ValueError(f"Tile {key} of '{layer}' has shape {data.shape}, expected {(int(win.height), int(win.width))}")
+        os.makedirs(os.path.join(self.root, layer), exist_ok=True)
+        prof = dict(driver="GTiff", dtype=data.dtype.name, count=1, width=int(win.width), height=int(win.height),
+                    crs=self.crs, transform=window_transform(win, self.transform), nodata=nodata,
+                    compress="lzw", tiled=True, blockxsize=256, blockysize=256)
+        if win.width < 256 or win.height < 256:
+            prof.update(tiled=False, blockxsize=None, blockysize=None)
+            prof = {k: v for k, v in prof.items() if v is not None}
+        with rasterio.open(self.path(layer, key), "w", **prof) as dst:
+            dst.write(data, 1)
+        with self._lock:
+            self.index["layers"][layer] = {"dtype": data.dtype.name, "nodata": nodata}
+
+    def save_index(self):
+        with self._lock, open(os.path.join(self.root, _INDEX_FILE), "w") as f:
+            json.dump(self.index, f, indent=1)
+
+    def build_layer(
+        self,
+        layer: str,
+        compute: Callable[[Window], np.ndarray],
+        *,
+        nodata=None,
+        workers: Optional[int] = None
+    ):
+        """compute(window with halo) -> tile array, for every tile on a thread pool; then update the index."""
+        workers = workers or min(8, os.cpu_count() or 1)
+
+        def one(key: TileKey):
+            with span("tiles.build", layer=layer, tile=f"{key[0]}_{key[1]}"):
+                self.write_tile(layer, key, compute(self.window(key)), nodata)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, self.keys()))
+        self.save_index()
+        print(f"[tiles] Layer '{layer}': {len(self.keys())} tiles written to {os.path.join(self.root, layer)}")
+
+    def tile_raster(self, src_path: str, layer: str, *, workers: Optional[int] = None,
+                    resampling: Resampling = Resampling.bilinear):
+        """Cut a monolithic raster into tiles of 'layer' (resampled onto the store grid if needed)."""
+        with rasterio.open(src_path) as src:
+            same_grid = (src.crs == self.crs and src.transform == self.transform
+                         and (src.height, src.width) == (self.height, self.width))
+            nodata, dtype = src.nodata, src.dtypes[0]
+        local = threading.local()
+        handles = []
+
+        def compute(win: Window) -> np.ndarray:
+            if not hasattr(local, "src"):
+                local.src = rasterio.open(src_path)
+                if not same_grid:
+                    local.src = WarpedVRT(local.src, crs=self.crs, transform=self.transform, width=self.width,
+                                          height=self.height, resampling=resampling)
+                handles.append(local.src)
+            return local.src.read(1, window=win).astype(dtype, copy=False)
+
+        try:
+            self.build_layer(layer, compute, nodata=nodata, workers=workers)
+        finally:
+            for h in handles:
+                h.close()
+
+    # --- reading ---
+    def read_tile(self, layer: str, key: TileKey) -> Optional[Tile]:
+        """One tile as float64 with NaN for nodata, or None if the tile does not exist."""
+        path = self.path(layer, key)
+        if not os.path.exists(path):
+            return None
+        with rasterio.open(path) as src:
+            data = src.read(1).astype(np.float64)
+            if src.nodata is not None:
+                data[data == src.nodata] = np.nan
+        win = self.window(key)
+        return Tile(data, int(win.row_off), int(win.col_off))
+
+
+class TileCache:
+    """
+    LRU cache of tiles read from a TileStore, optionally transformed once per load
+    (prepare(tiles by layer) -> any object, e.g. precomputed step costs).
+    Holds at most max_tiles entries, except that tiles for which pinned(key) is true are never
+    evicted (the cache grows past max_tiles instead); tracks hits, misses and the peak number held.
+    """
+
+    def __init__(self, store: TileStore, layers: Tuple[str, ...], max_tiles: int = 64,
+                 prepare: Optional[Callable[[Dict[str, Tile]], object]] = None,
+                 pinned: Optional[Callable[[TileKey], bool]] = None):
+        self.store = store
+        self.layers = layers
+        self.max_tiles = max(1, int(max_tiles))
+        self.prepare = prepare
+        self.pinned = pinned
+        self._tiles: "OrderedDict[TileKey, object]" = OrderedDict()
+        self.hits = self.misses = self.peak = 0
+
+    def get(self, key: TileKey):
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return self._tiles[key]
+        self.misses += 1
+        with span("tiles.load", tile=f"{key[0]}_{key[1]}"):
+            tiles = {layer: self.store.read_tile(layer, key) for layer in self.layers}
+            if any(t is None for t in tiles.values()):
+                entry = None
+            else:
+                entry = self.prepare(tiles) if self.prepare else tiles
+        self._tiles[key] = entry
+        excess = len(self._tiles) - self.max_tiles
+        if excess > 0:   # least recently used first, skipping pinned tiles and the one just loaded
+            evict = [k for k in self._tiles if k != key and not (self.pinned and self.pinned(k))]
+            for k in evict[:excess]:
+                del self._tiles[k]
+        self.peak = max(self.peak, len(self._tiles))
+        return entry
+
+    def __iter__(self) -> Iterator[TileKey]:
+        return iter(self._tiles)